@@ -0,0 +1,205 @@
+"""IVF approximate nearest-neighbour index for the local vector backend.
+
+Vectors are clustered with spherical k-means into ``nlist`` cells; a query
+scores only the rows of its ``nprobe`` nearest cells. Higher ``nprobe`` trades
+latency for recall. New rows are assigned to their nearest cell as they are
+inserted, so the index stays current without retraining.
+
+``python -m logician.ann`` prints recall@k and latency against exact search for
+a range of ``nprobe`` values on synthetic clustered data.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+import argparse
+import time
+import numpy as np
+
+
+DEFAULT_NLIST = 256
+DEFAULT_NPROBE = 8
+_TRAIN_SAMPLES_PER_LIST = 64
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of an external float32 matrix.
+
+    The index stores only centroids and per-row cell assignments; vectors stay
+    in the owning ``LocalCollection``.
+    """
+
+    def __init__(self, dim: int, nlist: int = DEFAULT_NLIST, nprobe: int = DEFAULT_NPROBE, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: List[List[np.ndarray]] = []
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray, niter: int = 10):
+        """Fit centroids on (a sample of) unit-normalised ``vectors``."""
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+        nlist = max(1, min(self.nlist, n))
+        sample_size = min(n, nlist * _TRAIN_SAMPLES_PER_LIST)
+        sample = np.asarray(vectors[rng.choice(n, sample_size, replace=False)], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(niter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        self.nlist = nlist
+        self.centroids = centroids.astype(np.float32)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists = [[] for _ in range(nlist)]
+
+    def add(self, rows: Sequence[int], vectors: np.ndarray):
+        """Assign ``rows`` (with their unit vectors) to cells; re-adding a row moves it."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        labels = np.argmax(np.asarray(vectors, dtype=np.float32) @ self.centroids.T, axis=1).astype(np.int32)
+        top = int(rows.max()) + 1
+        if top > len(self._assign):
+            grown = np.full(max(top, 2 * len(self._assign)), -1, dtype=np.int32)
+            grown[:len(self._assign)] = self._assign
+            self._assign = grown
+        self._assign[rows] = labels
+        order = np.argsort(labels, kind="stable")
+        cells, starts = np.unique(labels[order], return_index=True)
+        for cell, chunk in zip(cells, np.split(rows[order], starts[1:])):
+            self._lists[cell].append(chunk)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cell_scores = self.centroids @ query
+        probes = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+        parts = []
+        for cell in probes:
+            chunks = self._lists[cell]
+            if len(chunks) > 1:
+                # Compact on read and drop rows that have since moved to another cell.
+                merged = np.unique(np.concatenate(chunks))
+                merged = merged[self._assign[merged] == cell]
+                self._lists[cell] = chunks = [merged]
+            if chunks:
+                chunk = chunks[0]
+                parts.append(chunk[self._assign[chunk] == cell])
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(parts)
+
+    def search(self, score_rows: Callable[[np.ndarray, np.ndarray], np.ndarray], query: np.ndarray,
+               top_k: int, nprobe: Optional[int] = None, mask: Optional[np.ndarray] = None):
+        """Return ``(rows, scores)`` of the approximate top-k rows.
+
+        ``score_rows(rows, query)`` scores candidate rows, so the owner decides
+        whether that reads float32 vectors or quantized codes. Rows where
+        ``mask`` is False are skipped before scoring.
+        """
+        cand = self.candidates(query, nprobe)
+        if mask is not None:
+            cand = cand[mask[cand]]
+        if len(cand) == 0:
+            return cand, np.zeros(0, dtype=np.float32)
+        idx, scores = top_k_rows(score_rows(cand, query), top_k)
+        return cand[idx], scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            "centroids": self.centroids,
+            "assign": self._assign,
+            "params": np.array([self.nlist, self.nprobe, self.seed], dtype=np.int64),
+        }
+
+    @classmethod
+    def from_state(cls, state, size: int) -> "IVFIndex":
+        nlist, nprobe, seed = (int(x) for x in state["params"])
+        index = cls(state["centroids"].shape[1], nlist=nlist, nprobe=nprobe, seed=seed)
+        index.centroids = np.asarray(state["centroids"], dtype=np.float32)
+        assign = np.asarray(state["assign"], dtype=np.int32)[:size]
+        index._assign = assign.copy()
+        index._lists = [[] for _ in range(nlist)]
+        valid = np.nonzero(assign >= 0)[0]
+        order = valid[np.argsort(assign[valid], kind="stable")]
+        cells, starts = np.unique(assign[order], return_index=True)
+        for cell, chunk in zip(cells, np.split(order, starts[1:])):
+            index._lists[cell].append(chunk)
+        return index
+
+
+def top_k_rows(scores: np.ndarray, top_k: int):
+    """Indices and values of the ``top_k`` highest ``scores``, best first."""
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), scores[:0]
+    idx = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+
+def evaluate_recall(collection, queries: np.ndarray, k: int = 10,
+                    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)) -> List[Dict[str, float]]:
+    """Recall@k and mean latency of ``collection``'s ANN search against exact search."""
+    exact_ids, exact_ms = [], 0.0
+    for q in queries:
+        start = time.perf_counter()
+        exact_ids.append({h["id"] for h in collection.search(q, k, exact=True)})
+        exact_ms += (time.perf_counter() - start) * 1000
+    results = [{"nprobe": 0, "recall": 1.0, "ms_per_query": exact_ms / len(queries)}]
+    for nprobe in nprobes:
+        found, elapsed = 0, 0.0
+        for q, truth in zip(queries, exact_ids):
+            start = time.perf_counter()
+            hits = collection.search(q, k, nprobe=nprobe)
+            elapsed += time.perf_counter() - start
+            found += len(truth & {h["id"] for h in hits})
+        results.append({
+            "nprobe": nprobe,
+            "recall": found / (k * len(queries)),
+            "ms_per_query": elapsed * 1000 / len(queries),
+        })
+    return results
+
+
+def clustered_vectors(n: int, dim: int, clusters: int = 1000, spread: float = 0.8, seed: int = 0) -> np.ndarray:
+    """Synthetic embeddings grouped around ``clusters`` centres, like repetitive logs."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centres[labels] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def main(argv=None):
+    from .local_index import LocalCollection
+
+    parser = argparse.ArgumentParser(prog="python -m logician.ann", description="IVF recall@k benchmark")
+    parser.add_argument("--n", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--nlist", type=int, default=DEFAULT_NLIST)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    vectors = clustered_vectors(args.n + args.queries, args.dim)
+    coll = LocalCollection(args.dim)
+    coll.upsert(list(range(args.n)), vectors[:args.n], [{}] * args.n)
+    start = time.perf_counter()
+    coll.build_ann(nlist=args.nlist)
+    print(f"built IVF nlist={args.nlist} over {args.n} vectors in {time.perf_counter() - start:.2f}s")
+    print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+    for row in evaluate_recall(coll, vectors[args.n:], k=args.k):
+        label = "exact" if row["nprobe"] == 0 else row["nprobe"]
+        print(f"{label:>8} {row['recall']:>10.3f} {row['ms_per_query']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Semantic cache of generated answers.
+
+Entries are keyed by the unit-normalised query embedding: a new query whose
+cosine similarity to a cached one is at least ``threshold`` (and that targets
+the same collection with the same filters and ``exact_terms``) gets the stored
+answer without retrieval or generation. The numbers in a query are matched
+exactly because embeddings blur them: "500s" and "404s" must not share answers.
+
+Entries expire after ``ttl`` seconds and are dropped when their collection is
+re-ingested (see ``QdrantWrapper.invalidate``). That invalidation only sees
+ingests made in the same process: a ``logician serve`` does not notice a
+separate ``logician ingest`` or follow process, so there ``ttl`` alone bounds
+how stale an answer can be. The cache is off unless ``RAG_ANSWER_CACHE_TTL``
+is set.
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+# Range bounds in filter keys are rounded to this many seconds, so "in the
+# last hour" asked a few seconds apart maps to the same key.
+_RANGE_GRANULARITY = 60
+_NUMBER = re.compile(r"\d+")
+
+
+def exact_terms(text: str) -> Tuple[str, ...]:
+    """Tokens of ``text`` that cached queries must share exactly: its numbers."""
+    return tuple(_NUMBER.findall(text or ""))
+
+
+def filters_key(filters: Optional[Dict]) -> str:
+    if not filters:
+        return ""
+    rounded = {}
+    for field, condition in filters.items():
+        if isinstance(condition, dict):
+            condition = {k: int(v // _RANGE_GRANULARITY) for k, v in condition.items()}
+        elif isinstance(condition, (list, tuple, set)):
+            condition = sorted(condition, key=str)
+        rounded[field] = condition
+    return json.dumps(rounded, sort_keys=True, default=str)
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._answers: List[str] = []
+        self._keys: List[tuple] = []
+        self._created: List[float] = []
+        self._costs: List[float] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def get(self, vector, collection: str, filters: Optional[Dict] = None, generation=0,
+            terms: Tuple[str, ...] = ()) -> Optional[str]:
+        """The cached answer for the closest matching query, or None."""
+        start = time.perf_counter()
+        query = _unit(vector)
+        key = (collection, filters_key(filters), generation, tuple(terms))
+        with self._lock:
+            self._expire()
+            answer, cost = None, 0.0
+            if self._answers and self._vectors.shape[1] == len(query):
+                scores = self._vectors[:len(self._answers)] @ query
+                for row in np.argsort(-scores):
+                    if scores[row] < self.threshold:
+                        break
+                    if self._keys[row] == key:
+                        answer, cost = self._answers[row], self._costs[row]
+                        break
+            elapsed = time.perf_counter() - start
+            self.lookup_seconds += elapsed
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_seconds += max(0.0, cost - elapsed)
+            return answer
+
+    def put(self, vector, answer: str, collection: str, filters: Optional[Dict] = None,
+            generation=0, cost: float = 0.0, terms: Tuple[str, ...] = ()):
+        """Store ``answer``; ``cost`` is the seconds it took, counted as saved on each hit."""
+        query = _unit(vector)
+        with self._lock:
+            self._expire()
+            if len(self._answers) >= self.max_entries:
+                self._drop([0])
+            n = len(self._answers)
+            if self._vectors is None or self._vectors.shape[1] != len(query):
+                self._vectors = np.zeros((max(16, self.max_entries), len(query)), dtype=np.float32)
+                self._answers, self._keys, self._created, self._costs = [], [], [], []
+                n = 0
+            elif n >= len(self._vectors):
+                self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+            self._vectors[n] = query
+            self._answers.append(answer)
+            self._keys.append((collection, filters_key(filters), generation, tuple(terms)))
+            self._created.append(time.monotonic())
+            self._costs.append(cost)
+
+    def invalidate(self, collection: Optional[str] = None):
+        """Drop every entry, or only those for ``collection``."""
+        with self._lock:
+            self._drop([i for i, key in enumerate(self._keys) if collection is None or key[0] == collection])
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._answers),
+            "saved_seconds": self.saved_seconds,
+            "avg_lookup_ms": self.lookup_seconds * 1000 / lookups if lookups else 0.0,
+        }
+
+    def _expire(self):
+        if self.ttl and self._created:
+            cutoff = time.monotonic() - self.ttl
+            # Entries are appended in creation order, so expired ones are a prefix.
+            count = next((i for i, t in enumerate(self._created) if t >= cutoff), len(self._created))
+            if count:
+                self._drop(range(count))
+
+    def _drop(self, rows):
+        rows = set(rows)
+        if not rows:
+            return
+        keep = [i for i in range(len(self._answers)) if i not in rows]
+        self._vectors[:len(keep)] = self._vectors[keep]
+        self._answers = [self._answers[i] for i in keep]
+        self._keys = [self._keys[i] for i in keep]
+        self._created = [self._created[i] for i in keep]
+        self._costs = [self._costs[i] for i in keep]
+
+
+def from_env() -> Optional[SemanticAnswerCache]:
+    """Cache configured by ``RAG_ANSWER_CACHE_TTL`` (unset or 0 disables it),
+    ``RAG_ANSWER_CACHE_THRESHOLD`` and ``RAG_ANSWER_CACHE_SIZE``."""
+    ttl = float(os.getenv("RAG_ANSWER_CACHE_TTL") or 0)
+    if ttl <= 0:
+        return None
+    return SemanticAnswerCache(threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", DEFAULT_THRESHOLD)),
+                               ttl=ttl, max_entries=int(os.getenv("RAG_ANSWER_CACHE_SIZE", DEFAULT_MAX_ENTRIES)))
+
+
+def _unit(vector) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
@@ -0,0 +1,198 @@
+"""Asyncio RAG orchestrator.
+
+Same flow as ``RagOrchestrator`` but every step awaits instead of blocking a
+thread, so one event loop can keep hundreds of queries in flight. Searches over
+several collections run concurrently and are merged by score.
+"""
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import time
+from . import http_client
+from .embedder import aget_embedding
+from .metrics import fallback, span
+from .rag import HYBRID_FETCH_FACTOR, RagOrchestrator, chunk_text, hit_score, placeholder_answer
+from .rerank import boost
+
+
+DEFAULT_MAX_CONCURRENCY = 256
+
+
+def _merge(results, top_k: int) -> List:
+    if len(results) == 1:
+        return list(results[0] or [])[:top_k]
+    hits = [h for r in results for h in (r or [])]
+    hits.sort(key=hit_score, reverse=True)
+    return hits[:top_k]
+
+
+class AsyncRagOrchestrator(RagOrchestrator):
+    """``RagOrchestrator`` with ``aretrieve``/``acall_llm``/``aanswer`` coroutines.
+
+    Uses an ``httpx.AsyncClient`` and ``AsyncQdrantClient`` when installed, and
+    worker threads otherwise. ``max_concurrency`` bounds in-flight queries.
+    """
+
+    def __init__(self, collection: str = "log_entries", collections: Optional[List[str]] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        super().__init__(collection=collection, collections=collections)
+        self.max_concurrency = max_concurrency
+        self._http = None
+        self._semaphore = None
+
+    def _client(self):
+        if self._http is None:
+            self._http = http_client.new_async_client()
+        return self._http
+
+    async def aretrieve(self, query: str, top_k: int = 3, filters: Optional[Dict] = None, vec=None):
+        hybrid = self.lexical_weight > 0
+        fetch = top_k * HYBRID_FETCH_FACTOR if hybrid else top_k
+        collections = self.search_collections(filters)
+        lexical = None
+        if hybrid:
+            # BM25 runs in worker threads while the query is embedded and searched.
+            lexical = asyncio.gather(
+                *(self._shard(c, asyncio.to_thread(self.lexical_retrieve, query, fetch, c, filters), len(collections))
+                  for c in collections)
+            )
+        if vec is None:
+            with span("embed"):
+                vec = await aget_embedding(query, client=self._client(), as_array=True)
+        kwargs = {"filters": filters} if filters else {}
+        if self.reranker is not None:
+            kwargs.update(with_vectors=True, rescore=False)
+            fetch = max(self.reranker.fetch, top_k)
+        with span("search"):
+            results = await asyncio.gather(
+                *(self._shard(c, self.qdrant.asearch(c, vec, top_k=fetch, **kwargs), len(collections))
+                  for c in collections)
+            )
+        if self.reranker is None and self.partition:
+            dense = boost([h for r in results for h in (r or [])], fetch, **self.boosts)
+        else:
+            dense = _merge(results, fetch)
+        if self.reranker is not None:
+            lexical_hits = _merge(await lexical, top_k * HYBRID_FETCH_FACTOR) if lexical is not None else []
+            return self.rerank(query, vec, dense, lexical_hits, top_k)
+        if lexical is None:
+            return dense
+        return self.fuse(dense, _merge(await lexical, fetch), top_k)
+
+    async def _shard(self, name: str, search, shards: int):
+        # With several shards, one that fails or misses ``shard_timeout_ms`` contributes no hits.
+        if shards == 1:
+            return await search
+        try:
+            return await asyncio.wait_for(search, self.shard_timeout_ms / 1000.0)
+        except asyncio.TimeoutError:
+            fallback("shard", f"{name}: no answer within {self.shard_timeout_ms:g} ms")
+        except Exception as exc:
+            fallback("shard", f"{name}: {exc}")
+        return []
+
+    async def acall_llm(self, prompt: str) -> str:
+        if self.llm_endpoint:
+            try:
+                with span("llm"):
+                    data = await http_client.apost(
+                        self._client(),
+                        f"{self.llm_endpoint.rstrip('/')}/api/generate",
+                        {"prompt": prompt},
+                        "generate",
+                        self.llm_api_key,
+                    )
+                return data.get("text", "")
+            except Exception as exc:
+                fallback("llm", exc)
+        # fallback
+        return placeholder_answer(prompt)
+
+    async def astream_llm(self, prompt: str, status: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Async-iterator version of ``stream_llm``.
+
+        Without httpx the whole answer from ``acall_llm`` is yielded as one chunk.
+        """
+        client = self._client()
+        if not self.llm_endpoint or client is None:
+            yield await self.acall_llm(prompt)
+            if status is not None:
+                status["complete"] = True
+            return
+        started = False
+        try:
+            with span("llm"):
+                async for line in http_client.astream_lines(
+                    client,
+                    f"{self.llm_endpoint.rstrip('/')}/api/generate",
+                    {"prompt": prompt, "stream": True},
+                    "generate",
+                    self.llm_api_key,
+                ):
+                    chunk = json.loads(line)
+                    token = chunk_text(chunk)
+                    if token:
+                        started = True
+                        yield token
+                    if chunk.get("done"):
+                        break
+            if status is not None:
+                status["complete"] = True
+            return
+        except Exception as exc:
+            fallback("llm", exc)
+            if started:
+                return
+        yield placeholder_answer(prompt)
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _aprompt_for(self, query: str, text: str, filters: Optional[Dict], vec=None) -> str:
+        """Async ``_prompt_for``."""
+        hits = await self.aretrieve(text, top_k=self.context_candidates(), filters=filters, vec=vec)
+        return self.build_prompt(query, hits)
+
+    async def aanswer(self, query: str, filters: Optional[Dict] = None) -> str:
+        async with self._slots():
+            text, filters = self.search_terms(query, filters)
+            if self.answer_cache is None:
+                return await self.acall_llm(await self._aprompt_for(query, text, filters))
+            started = time.perf_counter()
+            with span("embed"):
+                vec = await aget_embedding(text, client=self._client(), as_array=True)
+            key, cached = self.cache_lookup(vec, filters, text)
+            if cached is not None:
+                return cached
+            result = await self.acall_llm(await self._aprompt_for(query, text, filters, vec))
+            self.cache_store(key, result, started)
+            return result
+
+    async def astream_answer(self, query: str, filters: Optional[Dict] = None) -> AsyncIterator[str]:
+        # Holds a slot for the whole stream, like ``aanswer`` does for its call.
+        async with self._slots():
+            text, filters = self.search_terms(query, filters)
+            key = vec = None
+            if self.answer_cache is not None:
+                started = time.perf_counter()
+                with span("embed"):
+                    vec = await aget_embedding(text, client=self._client(), as_array=True)
+                key, cached = self.cache_lookup(vec, filters, text)
+                if cached is not None:
+                    yield cached
+                    return
+            tokens = []
+            status: Dict = {}
+            async for token in self.astream_llm(await self._aprompt_for(query, text, filters, vec), status):
+                tokens.append(token)
+                yield token
+            if key is not None and status.get("complete"):
+                self.cache_store(key, "".join(tokens), started)
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        await self.qdrant.aclose()
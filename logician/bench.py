@@ -0,0 +1,337 @@
+"""Latency and throughput benchmarks.
+
+``python -m logician.bench`` starts a local stand-in for the embeddings and
+generate endpoints (``StandInServer``, answering after a configurable delay
+with local hashing embeddings and canned text), then measures:
+
+* ``embedding``: ``get_embedding`` on uncached texts, per concurrency level
+* ``ingest``: ``ingest_lines`` of a synthetic corpus into the local backend
+* ``search``: ``QdrantWrapper.search`` on the local backend
+* ``answer``: ``RagOrchestrator.answer`` end to end (answer cache off)
+
+for each corpus size, and writes p50/p95/p99 latency and throughput as JSON.
+``--baseline`` compares against an earlier results file and exits non-zero
+when a benchmark regressed by more than ``--tolerance``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import numpy as np
+from .local_embedder import HashingEmbedder
+
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_CONCURRENCY = (1, 8)
+DEFAULT_TOLERANCE = 0.2
+
+_SERVICES = ["api", "checkout", "auth", "search", "billing", "worker"]
+_HOSTS = [f"node-{i}" for i in range(8)]
+_TEMPLATES = [
+    ("ERROR", "connection refused to {ip}:{port} after {n} retries"),
+    ("ERROR", "request {req} failed with status 500: upstream timeout after {n}ms"),
+    ("WARN", "slow query on table orders took {n}ms (request {req})"),
+    ("INFO", "user {user} logged in from {ip}"),
+    ("INFO", "processed batch {req} with {n} items in {n}ms"),
+    ("ERROR", "OOMKilled: container {pod} exceeded memory limit {n}Mi"),
+    ("WARN", "disk usage at {n}% on /var/lib/data"),
+    ("INFO", "GET /api/v1/items/{n} 200 {n}ms"),
+]
+_QUESTIONS = [
+    "why are requests failing with status 500",
+    "which containers were OOMKilled",
+    "what is causing connection refused errors",
+    "are there slow queries on the orders table",
+    "is any host running out of disk space",
+]
+
+
+class StandInServer:
+    """Local HTTP stand-in for the ``/api/embeddings`` and ``/api/generate`` endpoints.
+
+    Each request sleeps ``embed_latency`` or ``generate_latency`` seconds
+    before answering; streamed generations also sleep ``token_latency`` per
+    token.
+    """
+
+    def __init__(self, embed_latency: float = 0.0, generate_latency: float = 0.0, token_latency: float = 0.0,
+                 dim: int = 128, answer_tokens: int = 32):
+        self.embed_latency = embed_latency
+        self.generate_latency = generate_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        self.embedder = HashingEmbedder(dim=dim)
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; without this, Nagle plus
+            # delayed ACKs add ~40 ms to every keep-alive response.
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stand_in.requests += 1
+                if self.path.endswith("/api/embeddings"):
+                    time.sleep(stand_in.embed_latency)
+                    texts = body.get("input", "")
+                    if isinstance(texts, list):
+                        self.reply({"embeddings": stand_in.embedder.embed(texts).tolist()})
+                    else:
+                        self.reply({"embedding": stand_in.embedder.embed([texts])[0].tolist()})
+                elif self.path.endswith("/api/generate"):
+                    time.sleep(stand_in.generate_latency)
+                    tokens = [f"token{i} " for i in range(stand_in.answer_tokens)]
+                    if body.get("stream"):
+                        self.stream(tokens)
+                    else:
+                        self.reply({"text": "".join(tokens)})
+                else:
+                    self.send_error(404)
+
+            def reply(self, data):
+                raw = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def stream(self, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(stand_in.token_latency)
+                    self.wfile.write(json.dumps({"response": token, "done": False}).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                self.wfile.write(b'{"response": "", "done": true}\n')
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_lines(n: int, seed: int = 0) -> List[tuple]:
+    """``n`` ``(source, line, text)`` log lines drawn from a few realistic templates."""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n):
+        level, template = rng.choice(_TEMPLATES)
+        text = template.format(ip=f"10.0.{rng.randrange(256)}.{rng.randrange(256)}", port=rng.choice([5432, 6379, 443]),
+                               n=rng.randrange(1, 5000), req=f"req-{rng.getrandbits(32):08x}",
+                               user=f"user{rng.randrange(1000)}", pod=f"pod-{rng.getrandbits(24):06x}")
+        service = rng.choice(_SERVICES)
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(1700000000 + i))
+        lines.append((f"/var/log/{service}.log", i + 1,
+                      f"{stamp} {level} service={service} host={rng.choice(_HOSTS)} {text}"))
+    return lines
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of ``samples`` (seconds), in milliseconds."""
+    if not len(samples):
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(ms.mean())}
+
+
+def run_concurrent(fn: Callable, items: Sequence, concurrency: int) -> Dict[str, float]:
+    """Call ``fn(item)`` for every item on ``concurrency`` threads; latency percentiles and ops/s."""
+
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        latencies = list(pool.map(timed, items))
+    wall = time.perf_counter() - start
+    result = {"n": len(items), "concurrency": concurrency, "throughput": len(items) / wall if wall else 0.0}
+    result.update(percentiles(latencies))
+    return result
+
+
+@contextmanager
+def bench_env(endpoint: str) -> Iterator[None]:
+    """Point logician at ``endpoint`` with in-memory local storage and fresh caches."""
+    from . import http_client
+    from .cache import set_cache
+
+    overrides = {
+        "LLM_ENDPOINT": endpoint,
+        "LLM_EMBED_BACKEND": "",
+        "LLM_EMBED_CACHE_PATH": "",
+        "QDRANT_BACKEND": "local",
+        "QDRANT_LOCAL_PATH": "",
+        "BM25_INDEX_PATH": "",
+        "RAG_ANSWER_CACHE_TTL": "0",
+    }
+    saved = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    set_cache(None)
+    http_client.reset_session()
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        set_cache(None)
+        http_client.reset_session()
+
+
+def run_benchmarks(sizes: Sequence[int] = DEFAULT_SIZES, concurrency: Sequence[int] = DEFAULT_CONCURRENCY,
+                   queries: int = 200, answers: int = 50, embed_latency: float = 0.005,
+                   generate_latency: float = 0.2, seed: int = 0) -> Dict:
+    """Run every benchmark against a fresh stand-in server; returns the JSON-ready results."""
+    from .embedder import get_embedding, get_embeddings
+    from .ingest import ingest_lines
+    from .qdrant_wrapper import QdrantWrapper
+    from .rag import RagOrchestrator
+
+    results: List[Dict] = []
+    with StandInServer(embed_latency=embed_latency, generate_latency=generate_latency) as server, \
+            bench_env(server.url):
+        for c in concurrency:
+            texts = [f"bench embedding {c} {i} connection refused" for i in range(queries)]
+            results.append(dict(benchmark="embedding", **run_concurrent(get_embedding, texts, c)))
+
+        for size in sizes:
+            qdrant = QdrantWrapper()
+            collection = f"bench_{size}"
+            stats = ingest_lines(synthetic_lines(size, seed), collection=collection, qdrant=qdrant)
+            results.append({"benchmark": "ingest", "corpus": size, "n": stats.lines, "seconds": stats.elapsed,
+                            "throughput": stats.lines_per_sec})
+
+            questions = [f"{_QUESTIONS[i % len(_QUESTIONS)]} ({i})" for i in range(queries)]
+            vectors = get_embeddings(questions, as_array=True)
+            for c in concurrency:
+                row = run_concurrent(lambda v: qdrant.search(collection, v, top_k=10), list(vectors), c)
+                results.append(dict(benchmark="search", corpus=size, **row))
+
+            rag = RagOrchestrator(collection=collection)
+            rag.qdrant = qdrant
+            for c in concurrency:
+                asked = [f"{q} #{c}" for q in questions[:answers]]
+                results.append(dict(benchmark="answer", corpus=size, **run_concurrent(rag.answer, asked, c)))
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": {"sizes": list(sizes), "concurrency": list(concurrency), "queries": queries,
+                       "answers": answers, "embed_latency": embed_latency, "generate_latency": generate_latency},
+        },
+        "results": results,
+    }
+
+
+def _key(row: Dict) -> tuple:
+    return row["benchmark"], row.get("corpus"), row.get("concurrency")
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Regressions of ``current`` against ``baseline``: p95 up or throughput down by more than ``tolerance``."""
+    before = {_key(row): row for row in baseline.get("results", [])}
+    regressions = []
+    for row in current.get("results", []):
+        old = before.get(_key(row))
+        if old is None:
+            continue
+        name = "/".join(str(part) for part in _key(row) if part is not None)
+        if "p95_ms" in row and old.get("p95_ms") and row["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+        if old.get("throughput") and row["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['throughput']:.1f} -> {row['throughput']:.1f}/s")
+    return regressions
+
+
+def format_results(results: Dict) -> str:
+    lines = [f"{'benchmark':<10} {'corpus':>7} {'conc':>5} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for row in results["results"]:
+        ms = [f"{row[key]:>9.2f}" if key in row else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms")]
+        lines.append(f"{row['benchmark']:<10} {row.get('corpus') or '-':>7} {row.get('concurrency') or '-':>5} "
+                     f"{row['throughput']:>10.1f} " + " ".join(ms))
+    return "\n".join(lines)
+
+
+def _ints(text: str) -> List[int]:
+    return [int(part) for part in text.split(",") if part]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m logician.bench", description="logician latency benchmarks")
+    parser.add_argument("--sizes", type=_ints, default=list(DEFAULT_SIZES), help="Corpus sizes, e.g. 1000,10000")
+    parser.add_argument("--concurrency", type=_ints, default=list(DEFAULT_CONCURRENCY), help="e.g. 1,8,32")
+    parser.add_argument("--queries", type=int, default=200, help="Embedding and search calls per run")
+    parser.add_argument("--answers", type=int, default=50, help="answer() calls per run")
+    parser.add_argument("--embed-latency", type=float, default=5.0, help="Stand-in embedding latency (ms)")
+    parser.add_argument("--generate-latency", type=float, default=200.0, help="Stand-in generation latency (ms)")
+    parser.add_argument("--output", default="bench-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.concurrency, queries=args.queries, answers=args.answers,
+                             embed_latency=args.embed_latency / 1000, generate_latency=args.generate_latency / 1000)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(format_results(results))
+    print(f"wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare(json.load(fh), results, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
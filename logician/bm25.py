@@ -0,0 +1,370 @@
+"""BM25 inverted index over log text.
+
+Dense vectors blur exact tokens such as error codes, pod names and request
+IDs; this index finds them. Compound tokens are indexed whole and split, so
+``ERR_CONN_REFUSED`` matches both itself and ``refused``.
+
+New documents land in an in-memory buffer that is sealed into an immutable
+segment (sorted vocabulary plus flat ``docs``/``tfs`` posting arrays) every
+``segment_docs`` documents or on ``flush``. Persisted segments are written once
+and loaded as read-only memmaps, so appends never rewrite existing postings;
+``compact`` (run on save once there are more than ``max_segments``) merges
+segments and drops overwritten documents, renumbering the rest. Each save
+writes the per-document arrays under a new name and swaps ``meta.json`` in
+atomically before deleting the files it no longer lists, so a crash leaves
+either the old or the new index.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import math
+import os
+import re
+import threading
+import numpy as np
+from .ann import top_k_rows
+from .local_index import _grown, _load_array
+
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_SEGMENT_DOCS = 100_000
+DEFAULT_MAX_SEGMENTS = 8
+
+_TOKEN = re.compile(r"[a-z0-9](?:[a-z0-9_.:/@-]*[a-z0-9])?")
+_PARTS = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens, with compound tokens (``pod-7f9c``, ``a.b_c``) also split into parts."""
+    tokens = []
+    for tok in _TOKEN.findall(text.lower()):
+        tokens.append(tok)
+        parts = _PARTS.split(tok)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+class _Segment:
+    def __init__(self, terms: Dict[str, Tuple[int, int]], docs: np.ndarray, tfs: np.ndarray,
+                 name: Optional[str] = None):
+        self.terms = terms
+        self.docs = docs
+        self.tfs = tfs
+        self.name = name
+
+    def postings(self, term: str):
+        span = self.terms.get(term)
+        if span is None:
+            return None
+        start, count = span
+        return self.docs[start:start + count], self.tfs[start:start + count]
+
+    @classmethod
+    def build(cls, postings: Dict[str, Tuple[List[int], List[int]]]) -> "_Segment":
+        terms, docs, tfs = {}, [], []
+        for term in sorted(postings):
+            d, t = postings[term]
+            terms[term] = (len(docs), len(d))
+            docs.extend(d)
+            tfs.extend(t)
+        return cls(terms, np.array(docs, dtype=np.int32),
+                   np.minimum(np.array(tfs, dtype=np.int64), 65535).astype(np.uint16))
+
+    def save(self, prefix: str):
+        for name, arr in (("docs", self.docs), ("tfs", self.tfs)):
+            np.save(f"{prefix}.{self.name}.{name}.npy", arr)
+        with open(f"{prefix}.{self.name}.terms.json", "w", encoding="utf-8") as fh:
+            json.dump(self.terms, fh)
+
+    @classmethod
+    def load(cls, prefix: str, name: str) -> "_Segment":
+        with open(f"{prefix}.{name}.terms.json", "r", encoding="utf-8") as fh:
+            terms = {t: tuple(span) for t, span in json.load(fh).items()}
+        return cls(terms, _load_array(f"{prefix}.{name}.docs.npy"), _load_array(f"{prefix}.{name}.tfs.npy"), name)
+
+    def remove(self, prefix: str):
+        for suffix in ("docs.npy", "tfs.npy", "terms.json"):
+            path = f"{prefix}.{self.name}.{suffix}"
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class BM25Index:
+    """BM25 over the text of one collection's points, keyed by point id.
+
+    Re-adding an id replaces its text: the old document is tombstoned and
+    skipped at query time until ``compact``.
+    """
+
+    def __init__(self, k1: float = DEFAULT_K1, b: float = DEFAULT_B, segment_docs: int = DEFAULT_SEGMENT_DOCS,
+                 max_segments: int = DEFAULT_MAX_SEGMENTS):
+        self.k1 = k1
+        self.b = b
+        self.segment_docs = segment_docs
+        self.max_segments = max_segments
+        self.ids: List = []
+        self._docs: Dict = {}
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._live = np.zeros(0, dtype=bool)
+        self._live_count = 0
+        self._total_length = 0
+        self._segments: List[_Segment] = []
+        self._retired: List[_Segment] = []
+        self._buffer: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._buffered_docs = 0
+        self._next_segment = 0
+        # Name of the lengths/live arrays on disk ("" for the unversioned files of older saves).
+        self._arrays: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def add(self, ids: Sequence, texts: Sequence[str]):
+        with self._lock:
+            for pid, text in zip(ids, texts):
+                tokens = tokenize(text or "")
+                doc = len(self.ids)
+                self._lengths = _grown(self._lengths, doc + 1)
+                self._live = _grown(self._live, doc + 1)
+                old = self._docs.get(pid)
+                if old is not None and self._live[old]:
+                    self._live[old] = False
+                    self._live_count -= 1
+                    self._total_length -= int(self._lengths[old])
+                self.ids.append(pid)
+                self._docs[pid] = doc
+                self._lengths[doc] = len(tokens)
+                self._live[doc] = True
+                self._live_count += 1
+                self._total_length += len(tokens)
+                counts: Dict[str, int] = {}
+                for tok in tokens:
+                    counts[tok] = counts.get(tok, 0) + 1
+                for tok, tf in counts.items():
+                    entry = self._buffer.get(tok)
+                    if entry is None:
+                        entry = self._buffer[tok] = ([], [])
+                    entry[0].append(doc)
+                    entry[1].append(tf)
+                self._buffered_docs += 1
+                if self._buffered_docs >= self.segment_docs:
+                    self._seal()
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[object, float]]:
+        """Return ``(id, score)`` pairs for the ``top_k`` best-matching documents."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live_count:
+                return []
+            n = len(self.ids)
+            live = self._live[:n]
+            lengths = self._lengths[:n]
+            avgdl = self._total_length / self._live_count or 1.0
+            doc_parts, score_parts = [], []
+            for term in terms:
+                docs, tfs = self._postings(term)
+                keep = live[docs]
+                docs, tfs = docs[keep], tfs[keep]
+                if not len(docs):
+                    continue
+                df = len(docs)
+                idf = math.log(1.0 + (self._live_count - df + 0.5) / (df + 0.5))
+                tf = tfs.astype(np.float32)
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / avgdl)
+                doc_parts.append(docs)
+                score_parts.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+            if not doc_parts:
+                return []
+            # Dense accumulation over doc numbers avoids sorting the candidate postings.
+            scores = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(score_parts), minlength=n)
+            rows, best = top_k_rows(scores, top_k)
+            return [(self.ids[r], float(s)) for r, s in zip(rows, best) if s > 0]
+
+    def compact(self):
+        """Merge all segments (and the buffer) into one, dropping replaced documents."""
+        with self._lock:
+            self._compact()
+
+    def save(self, prefix: str):
+        with self._lock:
+            self._seal()
+            if len(self._segments) > self.max_segments:
+                self._compact()
+            for seg in self._segments:
+                if seg.name is None:
+                    seg.name = f"seg{self._next_segment}"
+                    self._next_segment += 1
+                    seg.save(prefix)
+            old_arrays, self._arrays = self._arrays, f"arr{self._next_segment}"
+            self._next_segment += 1
+            n = len(self.ids)
+            for name, arr in (("lengths", self._lengths[:n]), ("live", self._live[:n])):
+                np.save(f"{prefix}.{self._arrays}.{name}.npy", arr)
+            meta = {
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "segments": [seg.name for seg in self._segments],
+                "arrays": self._arrays,
+                "next_segment": self._next_segment,
+                "total_length": self._total_length,
+            }
+            with open(prefix + ".meta.tmp", "w", encoding="utf-8") as fh:
+                json.dump(meta, fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(prefix + ".meta.tmp", prefix + ".meta.json")
+            for seg in self._retired:
+                seg.remove(prefix)
+            self._retired = []
+            if old_arrays is not None:
+                _remove_arrays(prefix, old_arrays)
+
+    def remove_files(self, prefix: str):
+        """Delete the segment and array files this index saved under ``prefix`` (not ``meta.json``)."""
+        with self._lock:
+            for seg in self._segments + self._retired:
+                if seg.name is not None:
+                    seg.remove(prefix)
+            if self._arrays is not None:
+                _remove_arrays(prefix, self._arrays)
+
+    @classmethod
+    def load(cls, prefix: str) -> "BM25Index":
+        with open(prefix + ".meta.json", "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.ids = meta["ids"]
+        # Later documents win, so overwritten ids map to their live document.
+        index._docs = {pid: i for i, pid in enumerate(index.ids)}
+        index._arrays = meta.get("arrays", "")
+        arrays = f"{prefix}.{index._arrays}" if index._arrays else prefix
+        index._lengths = _load_array(arrays + ".lengths.npy")
+        index._live = _load_array(arrays + ".live.npy")
+        index._live_count = int(index._live.sum())
+        index._total_length = meta["total_length"]
+        index._next_segment = meta["next_segment"]
+        index._segments = [_Segment.load(prefix, name) for name in meta["segments"]]
+        return index
+
+    def _compact(self):
+        self._seal()
+        if len(self._segments) <= 1 and self._live_count == len(self.ids):
+            return
+        live = np.asarray(self._live[:len(self.ids)])
+        rows = np.flatnonzero(live)
+        # Live documents keep their order and are numbered from 0.
+        renumber = np.cumsum(live, dtype=np.int64) - 1
+        merged: Dict[str, Tuple[List[int], List[int]]] = {}
+        for term in sorted(set().union(*(seg.terms for seg in self._segments))):
+            docs, tfs = self._postings(term)
+            keep = live[docs]
+            if keep.any():
+                merged[term] = (renumber[docs[keep]].tolist(), tfs[keep].tolist())
+        self._retired.extend(seg for seg in self._segments if seg.name is not None)
+        self._segments = [_Segment.build(merged)] if merged else []
+        self.ids = [self.ids[r] for r in rows]
+        self._docs = {pid: i for i, pid in enumerate(self.ids)}
+        self._lengths = np.array(self._lengths[rows], dtype=np.int32)
+        self._live = np.ones(len(rows), dtype=bool)
+
+    def _seal(self):
+        if self._buffer:
+            self._segments.append(_Segment.build(self._buffer))
+        self._buffer = {}
+        self._buffered_docs = 0
+
+    def _postings(self, term: str):
+        docs, tfs = [], []
+        for seg in self._segments:
+            found = seg.postings(term)
+            if found is not None:
+                docs.append(found[0])
+                tfs.append(found[1])
+        entry = self._buffer.get(term)
+        if entry is not None:
+            docs.append(np.array(entry[0], dtype=np.int32))
+            tfs.append(np.array(entry[1], dtype=np.uint16))
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+        if len(docs) == 1:
+            return docs[0], tfs[0]
+        return np.concatenate(docs), np.concatenate(tfs)
+
+
+def _remove_arrays(prefix: str, arrays: str):
+    base = f"{prefix}.{arrays}" if arrays else prefix
+    for suffix in (".lengths.npy", ".live.npy"):
+        if os.path.exists(base + suffix):
+            os.remove(base + suffix)
+
+
+class LexicalStore:
+    """Named ``BM25Index``es, optionally persisted under directory ``path``."""
+
+    _shared: Dict[str, "LexicalStore"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.indexes: Dict[str, BM25Index] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: Optional[str] = None) -> "LexicalStore":
+        """Return a fresh in-memory store, or the process-wide store for ``path``."""
+        if not path:
+            return cls()
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            store = cls._shared.get(key)
+            if store is None:
+                store = cls._shared[key] = cls(path)
+            return store
+
+    def create(self, name: str) -> BM25Index:
+        with self._lock:
+            old = self.get(name)
+            index = self.indexes[name] = BM25Index()
+            if old is not None:
+                # File names keep counting up, so the new index never reuses (and deletes) the old ones.
+                index._next_segment = old._next_segment
+                if self.path:
+                    # The empty index's meta.json replaces the old one before the old files go.
+                    index.save(self._prefix(name))
+                    old.remove_files(self._prefix(name))
+            return index
+
+    def get(self, name: str) -> Optional[BM25Index]:
+        index = self.indexes.get(name)
+        if index is None and self.path and os.path.exists(self._prefix(name) + ".meta.json"):
+            index = self.indexes.setdefault(name, BM25Index.load(self._prefix(name)))
+        return index
+
+    def drop(self, name: str):
+        """Forget index ``name`` and remove its files."""
+        with self._lock:
+            index = self.get(name)
+            self.indexes.pop(name, None)
+            if index is None or not self.path:
+                return
+            prefix = self._prefix(name)
+            if os.path.exists(prefix + ".meta.json"):
+                os.remove(prefix + ".meta.json")
+            index.remove_files(prefix)
+
+    def get_or_create(self, name: str) -> BM25Index:
+        index = self.get(name)
+        return index if index is not None else self.create(name)
+
+    def flush(self):
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for name, index in list(self.indexes.items()):
+            index.save(self._prefix(name))
+
+    def _prefix(self, name: str) -> str:
+        return os.path.join(self.path, name + ".bm25")
@@ -0,0 +1,236 @@
+"""Content-addressed embedding cache.
+
+Vectors are keyed by (model, sha256(text)). A bounded in-memory LRU tier sits in
+front of an optional SQLite tier, so repeated queries and log lines skip the
+embeddings endpoint, across processes too when a path is configured.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+DEFAULT_MAX_ENTRIES = 10000
+# Disk hits whose access times are buffered before they are written in one transaction.
+ATIME_BATCH = 256
+# SQLite's default limit on bound parameters is 999.
+_SELECT_CHUNK = 500
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier LRU embedding cache with hit/miss counters.
+
+    ``max_entries`` bounds the memory tier (0 disables it). When ``path`` is
+    given, entries are also written to a SQLite file bounded by
+    ``max_disk_entries``; least recently used rows are evicted first. Disk
+    vectors are stored as float32. ``get_many``/``put_many`` cost one query and
+    one transaction per call; access times of disk hits are written lazily,
+    with the next put or every ``ATIME_BATCH`` hits.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None,
+                 max_disk_entries: Optional[int] = None, model: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.model = model
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_count = 0
+        self._touched: Dict[Tuple[str, str], float] = {}
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT, key TEXT, vector BLOB, atime REAL, PRIMARY KEY (model, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_atime ON embeddings (atime)")
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if model is not None:
+            self._drop_other_models(model)
+
+    def use_model(self, model: str):
+        """Switch the active model, invalidating entries cached for any other model."""
+        if model != self.model:
+            with self._lock:
+                self._drop_other_models(model)
+                self.model = model
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        return self.get_many([text], model)[0]
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """Cached vectors for ``texts`` (None where missing), with one disk query per call."""
+        keys = [(model, text_key(t)) for t in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        with self._lock:
+            missing = []
+            for i, key in enumerate(keys):
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vec
+                else:
+                    missing.append(i)
+            if self._db is not None and missing:
+                rows = self._select(model, sorted({keys[i][1] for i in missing}))
+                now = time.time()
+                for i in missing:
+                    blob = rows.get(keys[i][1])
+                    if blob is not None:
+                        results[i] = np.frombuffer(blob, dtype=np.float32).astype(float).tolist()
+                        self._remember(keys[i], results[i])
+                        self._touched[keys[i]] = now
+                        self.disk_hits += 1
+                if len(self._touched) >= ATIME_BATCH:
+                    self._write_atimes()
+                    self._db.commit()
+            found = sum(vec is not None for vec in results)
+            self.hits += found
+            self.misses += len(keys) - found
+        return results
+
+    def put(self, text: str, model: str, vector: List[float]):
+        self.put_many([text], model, [vector])
+
+    def put_many(self, texts: Sequence[str], model: str, vectors: Sequence[List[float]]):
+        """Cache ``vectors`` for ``texts``, in one disk transaction."""
+        keys = [(model, text_key(t)) for t in texts]
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if self._db is None or not keys:
+                return
+            hashes = sorted({k for _, k in keys})
+            new = set(hashes) - set(self._select(model, hashes, column="1"))
+            now = time.time()
+            rows = {key: np.asarray(vector, dtype=np.float32).tobytes() for key, vector in zip(keys, vectors)}
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, atime) VALUES (?, ?, ?, ?)",
+                [key + (blob, now) for key, blob in rows.items()],
+            )
+            self._disk_count += len(new)
+            self._write_atimes()
+            self._evict_disk()
+            self._db.commit()
+
+    def invalidate(self, model: Optional[str] = None):
+        """Drop cached vectors for ``model``, or everything when no model is given."""
+        with self._lock:
+            if model is None:
+                self._memory.clear()
+                if self._db is not None:
+                    self._db.execute("DELETE FROM embeddings")
+                    self._db.commit()
+                    self._disk_count = 0
+                return
+            for key in [k for k in self._memory if k[0] == model]:
+                del self._memory[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+                self._db.commit()
+                self._disk_count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_count,
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._write_atimes()
+                self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: Tuple[str, str], vector: List[float]):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _select(self, model: str, keys: Sequence[str], column: str = "vector") -> Dict[str, bytes]:
+        rows: Dict[str, bytes] = {}
+        for start in range(0, len(keys), _SELECT_CHUNK):
+            chunk = keys[start:start + _SELECT_CHUNK]
+            rows.update(self._db.execute(
+                f"SELECT key, {column} FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(chunk))})",
+                (model, *chunk),
+            ))
+        return rows
+
+    def _write_atimes(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE embeddings SET atime = ? WHERE model = ? AND key = ?",
+                [(atime,) + key for key, atime in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict_disk(self):
+        if not self.max_disk_entries or self._disk_count <= self.max_disk_entries:
+            return
+        excess = self._disk_count - self.max_disk_entries
+        self._db.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY atime LIMIT ?)",
+            (excess,),
+        )
+        self._disk_count -= excess
+
+    def _drop_other_models(self, model: str):
+        for key in [k for k in self._memory if k[0] != model]:
+            del self._memory[key]
+        if self._db is not None:
+            self._db.execute("DELETE FROM embeddings WHERE model != ?", (model,))
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> EmbeddingCache:
+    """Return the process-wide cache, built from env on first use.
+
+    ``LLM_EMBED_CACHE_SIZE`` bounds the memory tier, ``LLM_EMBED_CACHE_PATH``
+    enables the SQLite tier and ``LLM_EMBED_CACHE_DISK_SIZE`` bounds it.
+    """
+    global _default_cache
+    if _default_cache is None:
+        disk_size = os.getenv("LLM_EMBED_CACHE_DISK_SIZE")
+        _default_cache = EmbeddingCache(
+            max_entries=int(os.getenv("LLM_EMBED_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+            path=os.getenv("LLM_EMBED_CACHE_PATH") or None,
+            max_disk_entries=int(disk_size) if disk_size else None,
+        )
+    return _default_cache
+
+
+def set_cache(cache: Optional[EmbeddingCache]):
+    """Replace the process-wide cache; ``None`` rebuilds it from env on next use."""
+    global _default_cache
+    if _default_cache is not None and _default_cache is not cache:
+        _default_cache.close()
+    _default_cache = cache
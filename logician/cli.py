@@ -1,17 +1,229 @@
-"""Simple CLI for logician"""
+"""Simple CLI for logician
+
+The RAG stack is imported only when a query runs locally, so the thin client
+(``--server`` / ``LOGICIAN_SERVER``) starts without NumPy or qdrant-client.
+"""
 import argparse
-from .rag import RagOrchestrator
+import contextlib
+import os
+import sys
+import time
+
 
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "ingest":
+        return ingest_main(argv[1:])
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    if argv and argv[0] == "retention":
+        return retention_main(argv[1:])
 
-def main():
     parser = argparse.ArgumentParser(prog="logician")
     parser.add_argument("query", help="Query to ask the assistant")
-    args = parser.parse_args()
+    parser.add_argument("--stream", action="store_true", help="Print the answer as it is generated")
+    parser.add_argument("--service", help="Only search lines from this service")
+    parser.add_argument("--host", help="Only search lines from this host")
+    parser.add_argument("--level", help="Only search lines at this level (e.g. ERROR)")
+    parser.add_argument("--since", help="Only search lines newer than this (e.g. 30m, 2h, 1d)")
+    parser.add_argument("--trace", action="store_true", help="Print a per-stage latency breakdown on stderr")
+    parser.add_argument("--server", default=os.getenv("LOGICIAN_SERVER"),
+                        help="Ask a running `logician serve` (http://host:port or unix:/path)")
+    args = parser.parse_args(argv)
+
+    if args.server:
+        return client_main(args)
+    from .metrics import trace
+    from .rag import RagOrchestrator
 
     orchestrator = RagOrchestrator()
-    answer = orchestrator.answer(args.query)
-    print(answer)
+    filters = cli_filters(parser, args)
+    with (trace() if args.trace else contextlib.nullcontext()) as query_trace:
+        if args.stream:
+            stream_answer(orchestrator, args.query, filters)
+        else:
+            print(orchestrator.answer(args.query, filters=filters))
+    if query_trace is not None:
+        print(query_trace.format(), file=sys.stderr)
+
+
+def cli_filters(parser, args):
+    """Filters from ``--service/--host/--level/--since``; None (parse the query) if none given."""
+    from .filters import option_filters
+
+    try:
+        return option_filters(args.service, args.host, args.level, args.since)
+    except ValueError:
+        parser.error(f"invalid --since duration {args.since!r}")
+
+
+def client_main(args):
+    """Answer through ``logician serve`` at ``args.server``; filter options are resolved server-side."""
+    from .client import LogicianClient, ServerError
+
+    client = LogicianClient(args.server)
+    options = {k: getattr(args, k) for k in ("service", "host", "level", "since") if getattr(args, k)}
+    if args.trace:
+        options["trace"] = True
+    try:
+        if args.stream:
+            result = {}
+            for chunk in client.stream_answer(args.query, **options):
+                if "token" in chunk:
+                    print(chunk["token"], end="", flush=True)
+                else:
+                    result = chunk
+            print()
+        else:
+            result = client.answer(args.query, **options)
+            print(result["answer"])
+    except (OSError, ServerError) as exc:
+        print(f"logician: server {args.server}: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    if result.get("trace"):
+        print(result["trace"], file=sys.stderr)
+    return 0
+
+
+def stream_answer(orchestrator, query: str, filters=None):
+    start = time.perf_counter()
+    first_token = None
+    for token in orchestrator.stream_answer(query, filters=filters):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        print(token, end="", flush=True)
+    print()
+    total = time.perf_counter() - start
+    ttft = f"{first_token * 1000:.0f} ms" if first_token is not None else "n/a"
+    print(f"[time to first token: {ttft}, total: {total * 1000:.0f} ms]", file=sys.stderr)
+
+
+def serve_main(argv):
+    from .rag import RagOrchestrator
+    from .server import DEFAULT_HOST, DEFAULT_PORT, LogicianServer
+
+    parser = argparse.ArgumentParser(prog="logician serve", description="Answer queries from a warm daemon")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--collection", default="log_entries")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="Requests answered at once (default LOGICIAN_SERVE_CONCURRENCY or 16)")
+    args = parser.parse_args(argv)
+
+    server = LogicianServer(RagOrchestrator(collection=args.collection), max_concurrency=args.max_concurrency)
+    server.warm()
+    where = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    print(f"logician serving {args.collection} on {where}", file=sys.stderr)
+    try:
+        server.serve(args.host, args.port, socket_path=args.socket)
+    except KeyboardInterrupt:
+        pass
+
+
+def ingest_main(argv):
+    from .ingest import DEFAULT_BATCH_SIZE, DEFAULT_QUEUE_SIZE, DEFAULT_WORKERS, ingest_files
+
+    parser = argparse.ArgumentParser(prog="logician ingest", description="Ingest log files into Qdrant")
+    parser.add_argument("paths", nargs="+", help="Log files or globs (.gz and rotated files supported)")
+    parser.add_argument("--collection", default="log_entries")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--recreate", action="store_true",
+                        help="Recreate the collection first (wipes it; refits LLM_LOCAL_EMBED_IDF weights)")
+    parser.add_argument("--quantization", choices=["float16", "int8", "pq"],
+                        help="Store vectors quantized (with --recreate, --follow, or in new partitions/shards)")
+    parser.add_argument("--templates", action="store_true", help="Embed one point per mined log template")
+    parser.add_argument("--embed-workers", type=int,
+                        help="Processes for local embedding (default LLM_EMBED_WORKERS; 0/1 = in-process)")
+    parser.add_argument("--embed-batch", type=int, help="Texts per embedding process task")
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep tailing the files, upserting new lines (resumes from --checkpoint)")
+    parser.add_argument("--checkpoint", help="Follow-mode offsets file (default LOGICIAN_TAIL_CHECKPOINT)")
+    parser.add_argument("--flush-interval", type=float,
+                        help="Follow mode: upsert pending lines at least this often, in seconds")
+    parser.add_argument("--persist-interval", type=float,
+                        help="Follow mode: write indexes to disk and checkpoint offsets this often, in seconds")
+    parser.add_argument("--partition", choices=["day", "hour"], default=os.getenv("RAG_PARTITION") or None,
+                        help="Store lines in per-day/hour collections by timestamp (default RAG_PARTITION)")
+    parser.add_argument("--shard-key", default=os.getenv("RAG_SHARD_KEY") or None,
+                        help="Store lines in one collection per value of this payload field, e.g. service "
+                             "(default RAG_SHARD_KEY)")
+    args = parser.parse_args(argv)
+    if args.follow and (args.recreate or args.templates):
+        parser.error("--follow can't be combined with --recreate or --templates")
+    if (args.partition or args.shard_key) and args.templates:
+        parser.error("--partition and --shard-key can't be combined with --templates")
+
+    if args.embed_workers and args.embed_workers > 1:
+        from .embed_pool import DEFAULT_WORKER_BATCH, EmbeddingPool, set_embed_pool
+
+        set_embed_pool(EmbeddingPool(args.embed_workers, batch_size=args.embed_batch or DEFAULT_WORKER_BATCH))
+
+    def progress(stats):
+        print(f"\r{stats.lines} lines, {stats.lines_per_sec:.0f} lines/s", end="", file=sys.stderr, flush=True)
+
+    if args.follow:
+        from .tail import DEFAULT_FLUSH_INTERVAL, DEFAULT_PERSIST_INTERVAL, follow_files
+
+        stats = follow_files(args.paths, collection=args.collection, checkpoint=args.checkpoint,
+                             batch_size=args.batch_size, on_flush=progress, partition=args.partition,
+                             shard_key=args.shard_key, quantization=args.quantization,
+                             flush_interval=args.flush_interval or DEFAULT_FLUSH_INTERVAL,
+                             persist_interval=args.persist_interval or DEFAULT_PERSIST_INTERVAL)
+        print(file=sys.stderr)
+        print(f"followed {stats.lines} new lines in {stats.elapsed:.2f}s")
+        return
+
+    stats = ingest_files(
+        args.paths,
+        collection=args.collection,
+        recreate=args.recreate,
+        templates=args.templates,
+        quantization=args.quantization,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        on_progress=progress,
+        partition=args.partition,
+        shard_key=args.shard_key,
+    )
+    print(file=sys.stderr)
+    print(f"ingested {stats.lines} lines in {stats.elapsed:.2f}s ({stats.lines_per_sec:.0f} lines/s)")
+    if args.templates:
+        print(f"{stats.templates} templates upserted")
+
+
+def retention_main(argv):
+    from .partitions import apply_retention
+    from .qdrant_wrapper import QdrantWrapper
+    from .shards import select_shards
+
+    parser = argparse.ArgumentParser(prog="logician retention",
+                                     description="Drop and compact old time partitions of a collection")
+    parser.add_argument("--collection", default="log_entries")
+    parser.add_argument("--keep-days", type=float, required=True, help="Drop partitions older than this")
+    parser.add_argument("--compact-days", type=float, help="Int8-quantize kept partitions older than this")
+    parser.add_argument("--partition", choices=["day", "hour"], default=os.getenv("RAG_PARTITION") or "day")
+    parser.add_argument("--shard-key", default=os.getenv("RAG_SHARD_KEY") or None,
+                        help="Apply to every shard of the collection (default RAG_SHARD_KEY)")
+    args = parser.parse_args(argv)
+
+    qdrant = QdrantWrapper()
+    collections = [args.collection]
+    if args.shard_key:
+        collections = select_shards(qdrant.list_collections(), args.collection, args.shard_key)
+    for collection in collections:
+        result = apply_retention(qdrant, collection, args.keep_days,
+                                 compact_days=args.compact_days, granularity=args.partition)
+        for name in result["dropped"]:
+            print(f"dropped {name}")
+        for name in result["compacted"]:
+            print(f"compacted {name}")
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
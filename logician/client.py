@@ -0,0 +1,104 @@
+"""Thin client for ``logician serve``.
+
+Standard library only, so ``logician --server ADDRESS "query"`` starts without
+importing NumPy, requests or qdrant-client. ``ADDRESS`` is ``http://host:port``
+or ``unix:/path/to/socket``.
+"""
+from typing import Dict, Iterator, List, Optional
+import http.client
+import json
+import socket
+from urllib.parse import urlsplit
+
+
+DEFAULT_TIMEOUT = 120.0
+
+
+class ServerError(Exception):
+    pass
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class LogicianClient:
+    """JSON client for one ``logician serve`` address; reuses its keep-alive connection."""
+
+    def __init__(self, address: str, timeout: float = DEFAULT_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.address.startswith("unix:"):
+            return _UnixConnection(self.address[len("unix:"):], self.timeout)
+        url = urlsplit(self.address if "://" in self.address else "http://" + self.address)
+        return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> http.client.HTTPResponse:
+        raw = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if raw is not None else {}
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.request(method, path, body=raw, headers=headers)
+                return self._conn.getresponse()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                # A kept-alive connection the server has since closed; retry once on a new one.
+                self.close()
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def _json(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        resp = self._request(method, path, body)
+        data = json.loads(resp.read() or b"{}")
+        if resp.getheader("Connection", "").lower() == "close":
+            self.close()
+        if resp.status != 200:
+            raise ServerError(f"{resp.status}: {data.get('error', resp.reason)}")
+        return data
+
+    def health(self) -> Dict:
+        return self._json("GET", "/health")
+
+    def stats(self) -> Dict:
+        return self._json("GET", "/stats")
+
+    def answer(self, query: str, **options) -> Dict:
+        """``{"answer": ...}`` (plus ``"trace"`` with ``trace=True``); options are filters or ``service``/``since``/..."""
+        return self._json("POST", "/answer", dict(options, query=query))
+
+    def answer_many(self, queries: List[str], **options) -> List:
+        return self._json("POST", "/answer_many", dict(options, queries=list(queries)))["answers"]
+
+    def stream_answer(self, query: str, **options) -> Iterator[Dict]:
+        """Yield ``{"token"}`` chunks, then ``{"done", "trace"?}``."""
+        resp = self._request("POST", "/answer", dict(options, query=query, stream=True))
+        try:
+            if resp.status != 200:
+                data = json.loads(resp.read() or b"{}")
+                raise ServerError(f"{resp.status}: {data.get('error', resp.reason)}")
+            for line in resp:
+                if line.strip():
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise ServerError(chunk["error"])
+                    yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,149 @@
+"""Prompt context assembly.
+
+Turns retrieved hits into compact context lines (only the payload fields that
+help answer a question), drops repeats of the same event, optionally reorders them by
+maximal marginal relevance (MMR) so the context covers different events, and
+stops at a token budget. Token counts are estimated with a regex rather than a
+real tokenizer: close enough for budgeting, and free.
+"""
+from typing import Dict, List, Optional, Sequence
+import re
+import numpy as np
+from .local_embedder import get_local_embedder
+
+
+DEFAULT_CONTEXT_TOKENS = 1500
+MIN_SNIPPET_TOKENS = 16
+
+# Payload fields shown before the text, in order; everything else is dropped.
+CONTEXT_FIELDS = ("timestamp", "service", "host", "level", "count")
+# Where and when a line was logged; ignored when comparing hits for duplicates.
+_LOCATION_FIELDS = ("source", "line", "timestamp")
+_TOKEN = re.compile(r"\w{1,4}|[^\w\s]")
+_ELLIPSIS = " ..."
+# Timestamps and UUIDs differ between repeats of one event; status codes, hosts
+# and other numbers tell events apart, so they are kept.
+_VOLATILE = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+    r"|\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count: one per punctuation mark and per 4 word characters."""
+    return len(_TOKEN.findall(text))
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """``text`` cut to ``budget`` tokens, ending in an ellipsis if anything was dropped."""
+    if estimate_tokens(text) <= budget:
+        return text
+    keep = budget - estimate_tokens(_ELLIPSIS)
+    if keep <= 0:
+        return ""
+    for i, m in enumerate(_TOKEN.finditer(text)):
+        if i == keep:
+            return text[:m.start()].rstrip() + _ELLIPSIS
+    return text
+
+
+def _score(hit) -> float:
+    score = hit.get("score") if isinstance(hit, dict) else getattr(hit, "score", None)
+    return float(score or 0.0)
+
+
+def _payload(hit) -> Optional[Dict]:
+    payload = hit.get("payload") if isinstance(hit, dict) else getattr(hit, "payload", None)
+    return payload if isinstance(payload, dict) else None
+
+
+def format_hit(hit) -> str:
+    """One context line: ``[source:line] field=value ... | text``."""
+    payload = _payload(hit)
+    if payload is None:
+        return str(hit)
+    parts = []
+    if payload.get("source"):
+        where = str(payload["source"])
+        if payload.get("line") is not None:
+            where += f":{payload['line']}"
+        parts.append(f"[{where}]")
+    parts.extend(f"{field}={payload[field]}" for field in CONTEXT_FIELDS if payload.get(field) is not None)
+    text = payload.get("text") or payload.get("template")
+    if text is None:
+        text = str({k: v for k, v in payload.items() if k not in CONTEXT_FIELDS})
+    return " ".join(parts + ["|", str(text)]) if parts else str(text)
+
+
+def dedup_key(hit) -> str:
+    """``hit``'s context line without its source, line and timestamp, with timestamps and
+    UUIDs in the text masked and whitespace collapsed."""
+    payload = _payload(hit)
+    if payload is not None:
+        hit = {"payload": {k: v for k, v in payload.items() if k not in _LOCATION_FIELDS}}
+    return " ".join(_VOLATILE.sub("*", format_hit(hit)).split())
+
+
+def mmr_order(similarity: np.ndarray, relevance: np.ndarray, lam: float) -> List[int]:
+    """Indices in maximal-marginal-relevance order.
+
+    Each step picks the item maximising ``lam * relevance - (1 - lam) *
+    max similarity to the items already picked``.
+    """
+    n = len(relevance)
+    if not n:
+        return []
+    order = [int(np.argmax(relevance))]
+    redundancy = similarity[order[0]].copy()
+    chosen = np.zeros(n, dtype=bool)
+    chosen[order[0]] = True
+    for _ in range(n - 1):
+        gain = lam * relevance - (1.0 - lam) * redundancy
+        gain[chosen] = -np.inf
+        best = int(np.argmax(gain))
+        order.append(best)
+        chosen[best] = True
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return order
+
+
+def build_context(hits: Sequence, max_tokens: int = DEFAULT_CONTEXT_TOKENS, max_hits: Optional[int] = None,
+                  mmr_lambda: Optional[float] = None, dedup: bool = True) -> List[str]:
+    """Context lines for ``hits`` (best first) within ``max_tokens``.
+
+    With ``dedup``, a hit with the same ``dedup_key`` as a better hit is
+    dropped. With ``mmr_lambda``, the rest are reordered by MMR over relevance
+    (the hit scores, or rank when scores are missing) and similarity (local
+    hashing embeddings) before the first ``max_hits`` are taken. A line that
+    overflows the budget is truncated if enough room is left, otherwise
+    assembly stops.
+    """
+    lines = [format_hit(h) for h in hits]
+    if not lines:
+        return []
+    keep, seen = [], set()
+    for i, hit in enumerate(hits):
+        key = dedup_key(hit) if dedup else i
+        if key not in seen:
+            seen.add(key)
+            keep.append(i)
+    if mmr_lambda is not None and len(keep) > 1:
+        vectors = get_local_embedder().embed([lines[i] for i in keep])
+        similarity = vectors @ vectors.T
+        scores = np.array([_score(hits[i]) for i in keep], dtype=np.float32)
+        if not scores.any():
+            scores = 1.0 / np.arange(1, len(keep) + 1, dtype=np.float32)
+        span = float(scores.max() - scores.min())
+        relevance = (scores - scores.min()) / span if span else np.ones_like(scores)
+        keep = [keep[i] for i in mmr_order(similarity, relevance, mmr_lambda)]
+    context, used = [], 0
+    for i in keep[:max_hits]:
+        cost = estimate_tokens(lines[i])
+        if used + cost > max_tokens:
+            room = max_tokens - used
+            if room >= MIN_SNIPPET_TOKENS:
+                context.append(truncate_tokens(lines[i], room))
+            break
+        context.append(lines[i])
+        used += cost
+    return context
@@ -0,0 +1,120 @@
+"""Process pool for CPU-bound local embedding.
+
+The hashing embedder holds the GIL, so threads can't spread it over cores.
+``EmbeddingPool`` shards a batch of texts across worker processes, each of
+which keeps its own warm copy of the parent's embedder, and collects the
+vectors in a ``multiprocessing.shared_memory`` buffer: workers write their rows
+straight into the output matrix, so only the input texts are pickled.
+
+``get_embeddings`` (and so every ingest path) uses the process-wide pool for
+local embeddings once ``LLM_EMBED_WORKERS`` is above 1; ``LLM_EMBED_WORKER_BATCH``
+sets the texts per task.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence
+import atexit
+import multiprocessing
+import os
+import threading
+import numpy as np
+from .local_embedder import HashingEmbedder, get_local_embedder
+
+
+DEFAULT_WORKER_BATCH = 256
+# Smaller calls are embedded in-process: a round trip to a worker costs more.
+MIN_POOL_TEXTS = 64
+
+_worker_embedder: Optional[HashingEmbedder] = None
+
+
+def _init_worker(embedder: HashingEmbedder):
+    global _worker_embedder
+    _worker_embedder = embedder
+
+
+def _embed_rows(shm_name: str, shape: tuple, start: int, texts: List[str]) -> int:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = _worker_embedder.embed(texts)
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class EmbeddingPool:
+    """``workers`` processes embedding with copies of ``embedder`` (default: the process-wide one)."""
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = DEFAULT_WORKER_BATCH,
+                 embedder: Optional[HashingEmbedder] = None, min_texts: int = MIN_POOL_TEXTS):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_texts = min_texts
+        self.embedder = embedder or get_local_embedder()
+        methods = multiprocessing.get_all_start_methods()
+        # Not fork: ingest calls this from worker threads, and forking a threaded process can deadlock.
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(self.embedder,))
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return a ``(len(texts), dim)`` float32 matrix, like ``HashingEmbedder.embed``."""
+        texts = list(texts)
+        if len(texts) < self.min_texts:
+            return self.embedder.embed(texts)
+        shape = (len(texts), self.embedder.dim)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 4))
+        try:
+            futures = [self._executor.submit(_embed_rows, shm.name, shape, start, texts[start:start + self.batch_size])
+                       for start in range(0, len(texts), self.batch_size)]
+            for fut in futures:
+                fut.result()
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def warm(self):
+        """Start every worker now instead of on first use."""
+        list(self._executor.map(_warm, range(self.workers)))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _warm(_):
+    return _worker_embedder is not None
+
+
+_default: Optional[EmbeddingPool] = None
+_default_lock = threading.Lock()
+_configured = False
+
+
+def get_embed_pool() -> Optional[EmbeddingPool]:
+    """The process-wide pool, or None when ``LLM_EMBED_WORKERS`` is unset or at most 1."""
+    global _default, _configured
+    if not _configured:
+        with _default_lock:
+            if not _configured:
+                workers = int(os.getenv("LLM_EMBED_WORKERS", "0") or 0)
+                if workers > 1:
+                    _default = EmbeddingPool(
+                        workers, batch_size=int(os.getenv("LLM_EMBED_WORKER_BATCH", DEFAULT_WORKER_BATCH)))
+                _configured = True
+    return _default
+
+
+def set_embed_pool(pool: Optional[EmbeddingPool]):
+    """Replace the process-wide pool (shutting down the old one); ``None`` re-reads env on next use."""
+    global _default, _configured
+    with _default_lock:
+        if _default is not None and _default is not pool:
+            _default.shutdown()
+        _default = pool
+        _configured = pool is not None
+
+
+atexit.register(lambda: set_embed_pool(None))
@@ -1,40 +1,229 @@
 """Embedding generation wrapper.
 
 This module provides a minimal function to generate embeddings using an HTTP LLM endpoint
-or a local placeholder (random vectors) for testing.
+or the CPU-only hashing embedder in ``logician.local_embedder``. Set
+``LLM_EMBED_BACKEND=local`` to use the local embedder even when ``LLM_ENDPOINT`` is set.
 """
-from typing import List
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
 import os
+import threading
 import numpy as np
-import requests
+from . import http_client
+from .cache import get_cache
+from .embed_pool import get_embed_pool
+from .local_embedder import get_local_embedder
+from .metrics import fallback
 
 
-def get_embedding(text: str, model: str = None) -> List[float]:
+DEFAULT_BATCH_SIZE = 32
+
+
+def _local_matrix(texts: List[str]) -> np.ndarray:
+    pool = get_embed_pool()
+    if pool is not None:
+        return pool.embed(texts)
+    return get_local_embedder().embed(texts)
+
+
+def _local_embedding(text: str) -> List[float]:
+    return _local_matrix([text])[0].astype(float).tolist()
+
+
+def as_vector(vec) -> np.ndarray:
+    """``vec`` as a contiguous float32 array (no copy if it already is one)."""
+    return np.ascontiguousarray(vec, dtype=np.float32)
+
+
+def _embed_endpoint() -> Optional[str]:
+    if os.getenv("LLM_EMBED_BACKEND", "").lower() == "local":
+        return None
+    return os.getenv("LLM_ENDPOINT")
+
+
+def _embed_model(model: Optional[str]) -> str:
+    return model or os.getenv("LLM_EMBED_MODEL", "default")
+
+
+def _post_single(endpoint: str, api_key: Optional[str], text: str) -> Optional[List[float]]:
+    # Expect the local LLM service to expose an embeddings endpoint at /embeddings
+    try:
+        resp = http_client.post(f"{endpoint.rstrip('/')}/api/embeddings", {"input": text}, "embed", api_key)
+        data = resp.json()
+        return data.get("embedding")
+    except Exception as exc:
+        fallback("embed", exc)
+        return None
+
+
+def get_embedding(text: str, model: str = None, as_array: bool = False) -> List[float]:
     """Return an embedding vector for the given text.
 
     If LLM_ENDPOINT is set in env, send a request to the local LLM service that returns
-    an embedding. Otherwise generate a deterministic pseudo-embedding using hashing.
+    an embedding. Otherwise (or if that fails) use the deterministic local embedder.
+    Endpoint results are cached per (model, text); see ``logician.cache``. With
+    ``as_array`` the vector comes back as a float32 ``ndarray``.
     """
-    endpoint = os.getenv("LLM_ENDPOINT")
+    endpoint = _embed_endpoint()
+    api_key = os.getenv("LLM_API_KEY")
+
+    if endpoint:
+        model = _embed_model(model)
+        cache = get_cache()
+        cache.use_model(model)
+        vec = cache.get(text, model)
+        if vec is not None:
+            return as_vector(vec) if as_array else vec
+        vec = _post_single(endpoint, api_key, text)
+        if vec is not None:
+            cache.put(text, model, vec)
+            return as_vector(vec) if as_array else vec
+        # fallback to the local embedder
+
+    if as_array:
+        return _local_matrix([text])[0]
+    return _local_embedding(text)
+
+
+async def aget_embedding(text: str, model: str = None, client=None, as_array: bool = False) -> List[float]:
+    """Async ``get_embedding``; ``client`` is an optional ``httpx.AsyncClient``."""
+    endpoint = _embed_endpoint()
     api_key = os.getenv("LLM_API_KEY")
 
     if endpoint:
-        # Expect the local LLM service to expose an embeddings endpoint at /embeddings
+        model = _embed_model(model)
+        cache = get_cache()
+        cache.use_model(model)
+        vec = cache.get(text, model)
+        if vec is not None:
+            return as_vector(vec) if as_array else vec
         try:
-            resp = requests.post(
-                f"{endpoint.rstrip('/')}/api/embeddings",
-                json={"input": text},
-                timeout=10,
-                headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            data = await http_client.apost(
+                client, f"{endpoint.rstrip('/')}/api/embeddings", {"input": text}, "embed", api_key
             )
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("embedding")
-        except Exception:
-            # fallback to deterministic pseudo-embedding
-            pass
-
-    # Deterministic pseudo-embedding for tests: use numpy hash to produce small vector
-    rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
-    vec = rng.standard_normal(128).astype(float).tolist()
-    return vec
+            vec = data.get("embedding")
+        except Exception as exc:
+            fallback("embed", exc)
+            vec = None
+        if vec is not None:
+            cache.put(text, model, vec)
+            return as_vector(vec) if as_array else vec
+
+    if as_array:
+        return _local_matrix([text])[0]
+    return _local_embedding(text)
+
+
+def _post_batch(endpoint: str, api_key: Optional[str], texts: List[str]) -> Optional[List[List[float]]]:
+    """Send one batch to the embeddings endpoint; return None if it can't be used."""
+    try:
+        resp = http_client.post(f"{endpoint.rstrip('/')}/api/embeddings", {"input": texts}, "embed", api_key)
+        data = resp.json()
+    except Exception as exc:
+        fallback("embed_batch", exc)
+        return None
+    vectors = data.get("embeddings")
+    if not isinstance(vectors, list) or len(vectors) != len(texts):
+        fallback("embed_batch", "malformed response")
+        return None
+    return vectors
+
+
+def get_embeddings(texts: List[str], model: str = None, batch_size: int = None,
+                   as_array: bool = False) -> List[List[float]]:
+    """Return embedding vectors for many texts, in input order.
+
+    Texts are sent to the embeddings endpoint in batches of ``batch_size``
+    (default ``LLM_EMBED_BATCH_SIZE`` or 32) as ``{"input": [...]}``, expecting
+    ``{"embeddings": [...]}`` back. A batch that fails or comes back malformed is
+    retried item by item through ``get_embedding``, which in turn falls back to
+    the local embedder. Cached texts are never sent. With ``as_array`` the
+    result is one contiguous ``(len(texts), dim)`` float32 matrix.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32) if as_array else []
+    endpoint = _embed_endpoint()
+    api_key = os.getenv("LLM_API_KEY")
+    if not endpoint:
+        matrix = _local_matrix(texts)
+        return matrix if as_array else matrix.astype(float).tolist()
+
+    model = _embed_model(model)
+    cache = get_cache()
+    cache.use_model(model)
+    results: List[Optional[List[float]]] = cache.get_many(texts, model)
+    missing = [i for i, vec in enumerate(results) if vec is None]
+    fresh: List[int] = []
+
+    batch_size = batch_size or int(os.getenv("LLM_EMBED_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    for start in range(0, len(missing), batch_size):
+        idx = missing[start:start + batch_size]
+        batch = [texts[i] for i in idx]
+        vectors = _post_batch(endpoint, api_key, batch)
+        if vectors is None:
+            vectors = [get_embedding(t, model=model) for t in batch]
+        else:
+            fresh.extend(idx)
+        for i, vec in zip(idx, vectors):
+            results[i] = vec
+    if fresh:
+        cache.put_many([texts[i] for i in fresh], model, [results[i] for i in fresh])
+    if as_array:
+        return np.asarray(results, dtype=np.float32)
+    return results
+
+
+class EmbeddingCoalescer:
+    """Merge concurrent single-text embedding calls into batch requests.
+
+    Calls to ``embed`` made from different threads within ``window`` seconds of
+    the first pending call are sent together through ``get_embeddings``. A batch
+    is flushed early once ``max_batch`` texts are waiting.
+    """
+
+    def __init__(self, window: float = 0.005, max_batch: int = DEFAULT_BATCH_SIZE, model: str = None):
+        self.window = window
+        self.max_batch = max_batch
+        self.model = model
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Future]] = []
+        self._timer: Optional[threading.Timer] = None
+
+    def embed(self, text: str) -> List[float]:
+        fut: Future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((text, fut))
+            if len(self._pending) >= self.max_batch:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run(batch)
+        return fut.result()
+
+    def flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _take(self) -> List[Tuple[str, Future]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _run(self, batch: List[Tuple[str, Future]]):
+        try:
+            vectors = get_embeddings([t for t, _ in batch], model=self.model, batch_size=len(batch))
+        except Exception as exc:
+            for _, fut in batch:
+                fut.set_exception(exc)
+            return
+        for (_, fut), vec in zip(batch, vectors):
+            fut.set_result(vec)
@@ -0,0 +1,160 @@
+"""Structured search filters over point payloads.
+
+A filter is a dict from payload field to a condition: a value, a list of
+values (match any), or a range dict with any of ``gte``/``gt``/``lte``/``lt``::
+
+    {"service": "api", "level": ["ERROR", "FATAL"], "timestamp": {"gte": 1700000000}}
+
+``to_qdrant_filter`` pushes such a dict down to Qdrant; the local backend
+evaluates it against its payload indexes. ``parse_filters`` extracts one from a
+natural-language query.
+"""
+from typing import Dict, Optional, Tuple
+import re
+import time
+from .utils import normalize_level
+
+
+try:
+    from qdrant_client.http.models import FieldCondition, Filter, MatchAny, MatchValue, Range
+except Exception:
+    Filter = None  # type: ignore
+
+
+# Payload fields indexed at collection creation: name -> "keyword" or "float".
+PAYLOAD_INDEXES = {
+    "service": "keyword",
+    "host": "keyword",
+    "level": "keyword",
+    "source": "keyword",
+    "timestamp": "float",
+}
+
+RANGE_KEYS = ("gte", "gt", "lte", "lt")
+
+_UNITS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hr": 3600,
+          "hour": 3600, "d": 86400, "day": 86400, "w": 604800, "week": 604800}
+_DURATION = re.compile(r"^(\d+)\s*([a-z]+?)s?$")
+_FIELD = re.compile(r"\b(service|host|level|source|since):(\S+)", re.I)
+_LAST = re.compile(r"\b(?:in\s+)?(?:the\s+)?(?:last|past)\s+(?:(\d+)\s*)?([a-z]+?)s?\b", re.I)
+_IN_SERVICE = re.compile(r"\b(?:in|for|from)\s+(?:the\s+)?service\s+([\w.-]+)", re.I)
+_ON_HOST = re.compile(r"\b(?:on|from)\s+(?:the\s+)?host\s+([\w.-]+)", re.I)
+
+
+def is_range(condition) -> bool:
+    return isinstance(condition, dict)
+
+
+def in_range(value: float, condition: Dict) -> bool:
+    return not (("gte" in condition and value < condition["gte"])
+                or ("gt" in condition and value <= condition["gt"])
+                or ("lte" in condition and value > condition["lte"])
+                or ("lt" in condition and value >= condition["lt"]))
+
+
+def matches(payload: Dict, filters: Optional[Dict]) -> bool:
+    """True if ``payload`` satisfies every condition in ``filters``."""
+    for field, condition in (filters or {}).items():
+        value = payload.get(field)
+        if value is None:
+            return False
+        if is_range(condition):
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return False
+            if not in_range(value, condition):
+                return False
+        elif isinstance(condition, (list, tuple, set)):
+            if value not in condition:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def duration_seconds(text: str) -> Optional[float]:
+    """Seconds in ``"90m"``, ``"2 hours"``, ``"1d"``; None if unparseable."""
+    m = _DURATION.match(text.strip().lower())
+    if not m or m.group(2) not in _UNITS:
+        return None
+    return int(m.group(1)) * _UNITS[m.group(2)]
+
+
+def option_filters(service: Optional[str] = None, host: Optional[str] = None, level: Optional[str] = None,
+                   since: Optional[str] = None, now: Optional[float] = None) -> Optional[Dict]:
+    """Filters from CLI-style options (``since`` is a duration like ``"2h"``); None if none are set.
+
+    Raises ``ValueError`` for an unparseable ``since``.
+    """
+    filters: Dict = {}
+    if service:
+        filters["service"] = service
+    if host:
+        filters["host"] = host
+    if level:
+        filters["level"] = normalize_level(level)
+    if since:
+        seconds = duration_seconds(since)
+        if seconds is None:
+            raise ValueError(f"invalid duration {since!r}")
+        filters["timestamp"] = {"gte": (time.time() if now is None else now) - seconds}
+    return filters or None
+
+
+def parse_filters(query: str, now: Optional[float] = None) -> Tuple[str, Dict]:
+    """Split ``query`` into search text and filters.
+
+    Understands ``field:value`` tokens (``service``, ``host``, ``level``,
+    ``source``, ``since:2h``), "in the last 2 hours"/"past day", "in service X"
+    and "on host X". Field tokens and time phrases are removed from the returned
+    text. Levels are only filtered on with an explicit ``level:``: words like
+    "errors" stay search text, since a level filter drops lines without one.
+    """
+    now = time.time() if now is None else now
+    filters: Dict = {}
+
+    def field(m):
+        key, value = m.group(1).lower(), m.group(2)
+        if key == "since":
+            seconds = duration_seconds(value)
+            if seconds is None:
+                return m.group(0)
+            filters["timestamp"] = {"gte": now - seconds}
+        elif key == "level":
+            filters[key] = normalize_level(value)
+        else:
+            filters[key] = value
+        return ""
+
+    def last(m):
+        unit = m.group(2).lower()
+        if unit not in _UNITS:
+            return m.group(0)
+        filters["timestamp"] = {"gte": now - int(m.group(1) or 1) * _UNITS[unit]}
+        return ""
+
+    text = _FIELD.sub(field, query)
+    text = _LAST.sub(last, text)
+    m = _IN_SERVICE.search(text)
+    if m and "service" not in filters:
+        filters["service"] = m.group(1)
+    m = _ON_HOST.search(text)
+    if m and "host" not in filters:
+        filters["host"] = m.group(1)
+    return " ".join(text.split()), filters
+
+
+def to_qdrant_filter(filters: Optional[Dict]):
+    """``filters`` as a qdrant-client ``Filter`` (None when empty)."""
+    if not filters:
+        return None
+    must = []
+    for field, condition in filters.items():
+        if is_range(condition):
+            must.append(FieldCondition(key=field, range=Range(**{k: condition[k] for k in RANGE_KEYS if k in condition})))
+        elif isinstance(condition, (list, tuple, set)):
+            must.append(FieldCondition(key=field, match=MatchAny(any=list(condition))))
+        else:
+            must.append(FieldCondition(key=field, match=MatchValue(value=condition)))
+    return Filter(must=must)
@@ -0,0 +1,187 @@
+"""Shared HTTP client for the embedding and LLM endpoints.
+
+All outbound calls go through one pooled ``requests.Session`` so warm requests
+reuse keep-alive connections instead of paying TCP/TLS setup every time. Each
+logical endpoint ("embed", "generate") has its own timeout and retry/backoff
+policy, configurable from env. Generation gets a longer timeout and does not
+retry read timeouts, since a resent prompt pays for the whole generation again.
+"""
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional
+import asyncio
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+try:
+    import httpx
+    _HAS_HTTPX = True
+except Exception:
+    httpx = None  # type: ignore
+    _HAS_HTTPX = False
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_ASYNC_POOL_SIZE = 100
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class EndpointPolicy(NamedTuple):
+    timeout: float = 10.0
+    retries: int = 2
+    backoff: float = 0.2
+    # Whether a read timeout (the server took the request but answered too slowly) is retried.
+    retry_read_timeouts: bool = True
+
+
+# Defaults for endpoints that differ from ``EndpointPolicy()``.
+DEFAULT_POLICIES: Dict[str, EndpointPolicy] = {
+    "generate": EndpointPolicy(timeout=60.0, retry_read_timeouts=False),
+}
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_policies: Dict[str, EndpointPolicy] = {}
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide pooled session (pool size from ``LLM_POOL_SIZE``)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = int(os.getenv("LLM_POOL_SIZE", DEFAULT_POOL_SIZE))
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def reset_session():
+    """Close the pooled session; the next call builds a fresh one."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def get_policy(endpoint: str) -> EndpointPolicy:
+    """Return the policy for ``endpoint``, read once from ``LLM_<ENDPOINT>_TIMEOUT``,
+    ``LLM_<ENDPOINT>_RETRIES``, ``LLM_<ENDPOINT>_BACKOFF`` and
+    ``LLM_<ENDPOINT>_RETRY_READ_TIMEOUTS`` over ``DEFAULT_POLICIES``."""
+    policy = _policies.get(endpoint)
+    if policy is None:
+        prefix = f"LLM_{endpoint.upper()}_"
+        default = DEFAULT_POLICIES.get(endpoint, EndpointPolicy())
+        retry_read = os.getenv(prefix + "RETRY_READ_TIMEOUTS")
+        policy = EndpointPolicy(
+            timeout=float(os.getenv(prefix + "TIMEOUT", default.timeout)),
+            retries=int(os.getenv(prefix + "RETRIES", default.retries)),
+            backoff=float(os.getenv(prefix + "BACKOFF", default.backoff)),
+            retry_read_timeouts=default.retry_read_timeouts if retry_read is None else retry_read != "0",
+        )
+        _policies[endpoint] = policy
+    return policy
+
+
+def set_policy(endpoint: str, policy: Optional[EndpointPolicy]):
+    """Override the policy for ``endpoint``; ``None`` re-reads it from env on next use."""
+    if policy is None:
+        _policies.pop(endpoint, None)
+    else:
+        _policies[endpoint] = policy
+
+
+@lru_cache(maxsize=8)
+def auth_headers(api_key: Optional[str]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+
+def post(url: str, payload: Any, endpoint: str, api_key: Optional[str] = None,
+         stream: bool = False) -> requests.Response:
+    """POST ``payload`` as JSON using the pooled session and ``endpoint``'s policy.
+
+    Connection errors, timeouts and 429/5xx gateway responses are retried with
+    exponential backoff (read timeouts only if the policy says so); anything
+    else (and the last failure) is raised.
+    """
+    policy = get_policy(endpoint)
+    session = get_session()
+    attempt = 0
+    while True:
+        try:
+            resp = session.post(url, json=payload, timeout=policy.timeout,
+                                headers=auth_headers(api_key), stream=stream)
+            if resp.status_code in RETRY_STATUSES and attempt < policy.retries:
+                resp.close()
+            else:
+                resp.raise_for_status()
+                return resp
+        except requests.ReadTimeout:
+            if not policy.retry_read_timeouts or attempt >= policy.retries:
+                raise
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= policy.retries:
+                raise
+        attempt += 1
+        time.sleep(policy.backoff * (2 ** (attempt - 1)))
+
+
+def new_async_client():
+    """Return a pooled ``httpx.AsyncClient`` (``LLM_ASYNC_POOL_SIZE``), or None without httpx.
+
+    The client is bound to the running event loop, so callers own and close it.
+    """
+    if not _HAS_HTTPX:
+        return None
+    pool_size = int(os.getenv("LLM_ASYNC_POOL_SIZE", DEFAULT_ASYNC_POOL_SIZE))
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.AsyncClient(limits=limits)
+
+
+async def apost(client, url: str, payload: Any, endpoint: str, api_key: Optional[str] = None) -> Any:
+    """Async counterpart of ``post`` that returns the decoded JSON body.
+
+    Uses ``client`` (from ``new_async_client``) with the same retry policy; when
+    it is None the blocking ``post`` runs in a worker thread instead.
+    """
+    if client is None:
+        resp = await asyncio.to_thread(post, url, payload, endpoint, api_key)
+        return resp.json()
+    policy = get_policy(endpoint)
+    attempt = 0
+    while True:
+        try:
+            resp = await client.post(url, json=payload, timeout=policy.timeout, headers=auth_headers(api_key))
+            if not (resp.status_code in RETRY_STATUSES and attempt < policy.retries):
+                resp.raise_for_status()
+                return resp.json()
+        except httpx.ReadTimeout:
+            if not policy.retry_read_timeouts or attempt >= policy.retries:
+                raise
+        except (httpx.TransportError, httpx.TimeoutException):
+            if attempt >= policy.retries:
+                raise
+        attempt += 1
+        await asyncio.sleep(policy.backoff * (2 ** (attempt - 1)))
+
+
+async def astream_lines(client, url: str, payload: Any, endpoint: str, api_key: Optional[str] = None):
+    """Async-iterate the non-empty response lines of a streamed POST on an httpx client.
+
+    Streams are not retried: a failure after the first line would duplicate output.
+    """
+    policy = get_policy(endpoint)
+    async with client.stream("POST", url, json=payload, timeout=policy.timeout,
+                             headers=auth_headers(api_key)) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if line:
+                yield line
@@ -0,0 +1,325 @@
+"""Log ingestion into Qdrant.
+
+Log files (plain, gzip and rotated siblings) are streamed line by line, grouped
+into batches, and handed through a bounded queue to worker threads that embed
+and upsert them in parallel. The bounded queue gives backpressure: the reader
+blocks instead of buffering a whole archive when embedding or Qdrant falls
+behind.
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import functools
+import glob
+import gzip
+import itertools
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from .embed_pool import EmbeddingPool, get_embed_pool, set_embed_pool
+from .embedder import _embed_endpoint, get_embeddings
+from .local_embedder import HashingEmbedder, get_local_embedder, set_local_embedder
+from .partitions import partition_start, route
+from .shards import route_by_key, shard_of
+from .qdrant_wrapper import QdrantWrapper
+from .templates import TEMPLATE_FIELDS, LogCluster, TemplateMiner, merge_payloads
+from .utils import parse_fields, parse_timestamp
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_IDF_SAMPLE = 100_000
+
+_ROTATED = re.compile(r"\.(\d+)(\.gz)?")
+
+LogLine = Tuple[str, int, str]
+
+
+class IngestStats:
+    def __init__(self):
+        self.lines = 0
+        self.batches = 0
+        self.templates = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def lines_per_sec(self) -> float:
+        elapsed = self.elapsed or (time.perf_counter() - self.started)
+        return self.lines / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "lines": self.lines,
+            "batches": self.batches,
+            "templates": self.templates,
+            "elapsed": self.elapsed,
+            "lines_per_sec": self.lines_per_sec,
+        }
+
+
+def expand_log_paths(paths: Iterable[str]) -> List[str]:
+    """Expand globs and pick up rotated siblings (``app.log.1``, ``app.log.2.gz``).
+
+    Rotated files come first, oldest (highest suffix) to newest, followed by
+    the live file, so lines are ingested in roughly chronological order.
+    """
+    result: List[str] = []
+    seen = set()
+    for pattern in paths:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        for path in matches:
+            group = [path]
+            if os.path.isfile(path):
+                rotated = [p for p in glob.glob(glob.escape(path) + ".*") if _ROTATED.fullmatch(p[len(path):])]
+                rotated.sort(key=lambda p: int(_ROTATED.fullmatch(p[len(path):]).group(1)), reverse=True)
+                group = rotated + group
+            for p in group:
+                if p not in seen:
+                    seen.add(p)
+                    result.append(p)
+    return result
+
+
+def open_log(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_log_lines(paths: Iterable[str]) -> Iterator[LogLine]:
+    """Yield ``(source, line_number, text)`` for every non-empty line, streaming."""
+    for path in paths:
+        with open_log(path) as fh:
+            for lineno, line in enumerate(fh, 1):
+                line = line.rstrip("\r\n")
+                if line.strip():
+                    yield path, lineno, line
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def point_id(source: str, lineno: int) -> str:
+    """Deterministic UUID for a log line, so re-ingesting a file overwrites its points."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{os.path.abspath(source)}:{lineno}"))
+
+
+def source_service(source: str) -> str:
+    """Service name implied by a log file name: ``/var/log/checkout.log.2.gz`` -> ``checkout``."""
+    name = os.path.basename(source)
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return os.path.splitext(re.sub(r"\.\d+$", "", name))[0]
+
+
+def line_payload(source: str, lineno: int, text: str) -> Dict:
+    """Payload of one log line, with the filterable fields from ``logician.filters``.
+
+    ``service`` defaults to the file name; ``service=``/``host=`` pairs and the
+    level in the line itself take precedence.
+    """
+    payload = {"text": text, "source": source, "line": lineno, "service": source_service(source)}
+    payload.update(parse_fields(text))
+    ts = parse_timestamp(text)
+    if ts is not None:
+        payload["timestamp"] = ts
+    return payload
+
+
+def upsert_points(qdrant: QdrantWrapper, collection: str, ids: List, vectors, payloads: List[Dict],
+                  partition: Optional[str] = None, shard_key: Optional[str] = None,
+                  quantization: Optional[str] = None):
+    """Upsert into ``collection``, split into its ``shard_key`` shards (see ``logician.shards``)
+    and their ``partition`` ("day"/"hour") time partitions when given. Shards and partitions
+    created on the way are stored with ``quantization``."""
+    if not (partition or shard_key):
+        qdrant.upsert(collection, ids, vectors, payloads)
+        return
+    groups = route_by_key(collection, shard_key, payloads) if shard_key else {collection: list(range(len(ids)))}
+    for shard, rows in groups.items():
+        targets = {shard: rows}
+        if partition:
+            targets = {name: [rows[j] for j in picked]
+                       for name, picked in route(shard, [payloads[i] for i in rows], partition).items()}
+        for name, picked in targets.items():
+            qdrant.ensure_collection(name, vector_size=len(vectors[0]), quantization=quantization)
+            qdrant.upsert(name, [ids[i] for i in picked], vectors[picked], [payloads[i] for i in picked])
+
+
+def embed_and_upsert(qdrant: QdrantWrapper, collection: str, batch: List[LogLine],
+                     partition: Optional[str] = None, shard_key: Optional[str] = None,
+                     quantization: Optional[str] = None):
+    vectors = get_embeddings([text for _, _, text in batch], as_array=True)
+    ids = [point_id(source, lineno) for source, lineno, _ in batch]
+    payloads = [line_payload(source, lineno, text) for source, lineno, text in batch]
+    upsert_points(qdrant, collection, ids, vectors, payloads, partition, shard_key, quantization)
+
+
+def embed_and_upsert_templates(qdrant: QdrantWrapper, collection: str, batch: List[LogCluster]):
+    """Upsert one point per template, merged with the statistics earlier ingests stored for it."""
+    vectors = get_embeddings([c.template for c in batch], as_array=True)
+    ids = [c.cluster_id for c in batch]
+    stored = qdrant.payloads(collection, ids)
+    payloads = [merge_payloads(stored[pid], c.payload()) if pid in stored else c.payload()
+                for pid, c in zip(ids, batch)]
+    qdrant.upsert(collection, ids, vectors, payloads)
+
+
+def ingest_lines(lines: Iterable[LogLine], collection: str = "log_entries",
+                 qdrant: Optional[QdrantWrapper] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 on_progress: Optional[Callable[[IngestStats], None]] = None,
+                 handler: Callable = embed_and_upsert) -> IngestStats:
+    """Embed and upsert ``lines`` with ``workers`` threads behind a bounded queue.
+
+    ``handler(qdrant, collection, batch)`` does the per-batch work. The first
+    worker error stops reading and is re-raised once in-flight batches drain.
+    """
+    qdrant = qdrant or QdrantWrapper()
+    stats = IngestStats()
+    batches: "queue.Queue[Optional[list]]" = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+    errors: List[Exception] = []
+
+    def worker():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if errors:
+                continue
+            try:
+                handler(qdrant, collection, batch)
+            except Exception as exc:
+                errors.append(exc)
+                continue
+            with lock:
+                stats.lines += len(batch)
+                stats.batches += 1
+                if on_progress:
+                    on_progress(stats)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    try:
+        for batch in iter_batches(lines, batch_size):
+            if errors:
+                break
+            batches.put(batch)
+    finally:
+        for _ in threads:
+            batches.put(None)
+        for t in threads:
+            t.join()
+        stats.elapsed = time.perf_counter() - stats.started
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def ingest_templates(lines: Iterable[LogLine], collection: str = "log_entries",
+                     qdrant: Optional[QdrantWrapper] = None, miner: Optional[TemplateMiner] = None,
+                     **kwargs) -> IngestStats:
+    """Mine templates from ``lines`` and upsert one point per template.
+
+    Each point carries the template's occurrence count, first/last timestamp,
+    most common level/service/host and a few sample ``(source, line)``
+    references as payload, added to what earlier ingests stored for the same
+    template. Only the clusters are held in memory while reading. Extra keyword
+    arguments go to ``ingest_lines``.
+    """
+    miner = miner or TemplateMiner()
+    started = time.perf_counter()
+    for source, lineno, text in lines:
+        payload = line_payload(source, lineno, text)
+        miner.add(text, source=source, lineno=lineno, timestamp=payload.get("timestamp"),
+                  fields={field: payload[field] for field in TEMPLATE_FIELDS if field in payload})
+    stats = ingest_lines(miner.clusters, collection=collection, qdrant=qdrant,
+                         handler=embed_and_upsert_templates, **kwargs)
+    stats.templates = stats.lines
+    stats.lines = miner.lines
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def fit_local_idf(files: List[str], path: str, sample: int = DEFAULT_IDF_SAMPLE) -> HashingEmbedder:
+    """Fit the local embedder's IDF on the first ``sample`` lines of ``files`` and save it to ``path``.
+
+    The fitted embedder replaces the process-wide one (and the embedding pool's
+    workers, if a pool is running), so everything embedded afterwards uses it.
+    """
+    embedder = HashingEmbedder(dim=get_local_embedder().dim)
+    texts = [text for _, _, text in itertools.islice(iter_log_lines(files), sample)]
+    embedder.fit(texts)
+    embedder.save(path)
+    set_local_embedder(embedder)
+    pool = get_embed_pool()
+    if pool is not None and pool.embedder is not embedder:
+        set_embed_pool(EmbeddingPool(pool.workers, batch_size=pool.batch_size, embedder=embedder,
+                                     min_texts=pool.min_texts))
+    logger.info("fitted local IDF on %d lines, saved to %s", len(texts), path)
+    return embedder
+
+
+def ingest_files(paths: Iterable[str], collection: str = "log_entries",
+                 qdrant: Optional[QdrantWrapper] = None, recreate: bool = False,
+                 templates: bool = False, quantization: Optional[str] = None,
+                 partition: Optional[str] = None, shard_key: Optional[str] = None, **kwargs) -> IngestStats:
+    """Stream log files (globs, gzip and rotated siblings included) into ``collection``.
+
+    With ``recreate`` the collection is (re)created first, sized from the
+    current embedding model and stored with ``quantization`` if given. With
+    ``templates`` lines are deduplicated into templates before embedding (see
+    ``ingest_templates``). With ``partition`` and/or ``shard_key`` lines go to
+    the day or hour partitions (see ``logician.partitions``) and the per-value
+    shards (see ``logician.shards``) of ``collection`` instead, each created
+    with ``quantization``, and ``recreate`` drops the existing ones. When ``recreate`` embeds with the
+    local embedder and ``LLM_LOCAL_EMBED_IDF`` names a file, IDF weights are
+    fitted on the input first and written there (see ``fit_local_idf``); an
+    existing collection keeps the weights it was built with. Extra keyword
+    arguments go to ``ingest_lines``.
+    """
+    qdrant = qdrant or QdrantWrapper()
+    files = expand_log_paths(paths)
+    idf_path = os.getenv("LLM_LOCAL_EMBED_IDF")
+    if recreate and idf_path and not _embed_endpoint():
+        fit_local_idf(files, idf_path)
+    if partition or shard_key:
+        if templates:
+            raise ValueError("templates can't be stored in partitions or shards")
+        if recreate:
+            for name in qdrant.list_collections():
+                if (name == collection or (shard_key and shard_of(collection, shard_key, name))
+                        or (partition and partition_start(collection, name, partition) is not None)):
+                    qdrant.delete_collection(name)
+        kwargs["handler"] = functools.partial(embed_and_upsert, partition=partition, shard_key=shard_key,
+                                              quantization=quantization)
+    elif recreate:
+        vector_size = len(get_embeddings(["probe"])[0])
+        if quantization:
+            qdrant.create_collection(collection, vector_size=vector_size, quantization=quantization)
+        else:
+            qdrant.create_collection(collection, vector_size=vector_size)
+    logger.info("ingesting %d file(s) into %s", len(files), collection)
+    if templates:
+        stats = ingest_templates(iter_log_lines(files), collection=collection, qdrant=qdrant, **kwargs)
+    else:
+        stats = ingest_lines(iter_log_lines(files), collection=collection, qdrant=qdrant, **kwargs)
+    qdrant.flush()
+    qdrant.invalidate(collection)
+    return stats
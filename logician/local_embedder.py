@@ -0,0 +1,130 @@
+"""CPU-only local embeddings for log lines.
+
+Each text is turned into hashed features (lowercased words, word bigrams and
+character trigrams of words; digit runs collapse to one token) weighted by
+sublinear term frequency and, once ``fit`` has seen a corpus, inverse document
+frequency. Features go through a sparse random projection: every feature adds
+its weight, with a pseudo-random sign, to ``probes`` of the ``dim`` output
+components picked from its hash. Rows are L2-normalised, so lines that share
+vocabulary have high cosine similarity.
+
+Hashing uses CRC32 rather than ``hash()``, so vectors are identical in every
+process and an index built offline can be served by any worker.
+"""
+from typing import Iterable, List, Optional
+import os
+import re
+import threading
+import zlib
+import numpy as np
+
+
+DEFAULT_DIM = 128
+DEFAULT_PROBES = 4
+IDF_FEATURES = 1 << 20
+
+_TOKEN = re.compile(r"[a-z_][a-z0-9_]*|\d+")
+# Odd 32-bit multipliers for deriving each probe's component and sign from a feature hash.
+_MIX = np.array([0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F, 0x165667B1, 0xD3A2646D,
+                 0xFD7046C5, 0xB55A4F09], dtype=np.uint64)
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder with a sparse random projection."""
+
+    def __init__(self, dim: int = DEFAULT_DIM, probes: int = DEFAULT_PROBES, char_ngrams: int = 3):
+        if not 1 <= probes <= len(_MIX):
+            raise ValueError(f"probes must be between 1 and {len(_MIX)}")
+        self.dim = dim
+        self.probes = probes
+        self.char_ngrams = char_ngrams
+        self.idf: Optional[np.ndarray] = None
+
+    def features(self, text: str) -> List[str]:
+        tokens = ["0" if t[0].isdigit() else t for t in _TOKEN.findall(text.lower())]
+        if not tokens:
+            stripped = text.strip()
+            return [stripped] if stripped else []
+        feats = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        n = self.char_ngrams
+        for tok in tokens:
+            if len(tok) > n:
+                padded = f"<{tok}>"
+                feats.extend("#" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return feats
+
+    def _hashes(self, texts: List[str]):
+        docs, hashes = [], []
+        for i, text in enumerate(texts):
+            feats = self.features(text)
+            docs.append(np.full(len(feats), i, dtype=np.int64))
+            hashes.append(np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats),
+                                      dtype=np.uint64, count=len(feats)))
+        if not docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+        return np.concatenate(docs), np.concatenate(hashes)
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        """Return a ``(len(texts), dim)`` float32 matrix of unit vectors."""
+        texts = list(texts)
+        out = np.zeros(len(texts) * self.dim, dtype=np.float64)
+        docs, hashes = self._hashes(texts)
+        if len(hashes):
+            keys, counts = np.unique((docs.astype(np.uint64) << np.uint64(32)) | hashes, return_counts=True)
+            docs = (keys >> np.uint64(32)).astype(np.int64)
+            hashes = keys & np.uint64(0xFFFFFFFF)
+            weights = 1.0 + np.log(counts)
+            if self.idf is not None:
+                weights *= self.idf[hashes % np.uint64(len(self.idf))]
+            weights /= np.sqrt(self.probes)
+            for mix in _MIX[:self.probes]:
+                mixed = (hashes * mix) & np.uint64(0xFFFFFFFF)
+                mixed ^= mixed >> np.uint64(15)
+                comp = (mixed % np.uint64(self.dim)).astype(np.int64)
+                sign = np.where(mixed & np.uint64(1 << 16), -1.0, 1.0)
+                out += np.bincount(docs * self.dim + comp, weights=sign * weights, minlength=len(out))
+        out = out.reshape(len(texts), self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (out / norms).astype(np.float32)
+
+    def fit(self, texts: Iterable[str], features: int = IDF_FEATURES):
+        """Learn smoothed IDF weights from a corpus sample (e.g. lines about to be ingested)."""
+        texts = list(texts)
+        docs, hashes = self._hashes(texts)
+        buckets = np.unique((docs.astype(np.uint64) << np.uint64(32)) | (hashes % np.uint64(features)))
+        df = np.bincount((buckets & np.uint64(0xFFFFFFFF)).astype(np.int64), minlength=features)
+        self.idf = (np.log((1.0 + len(texts)) / (1.0 + df)) + 1.0).astype(np.float32)
+        return self
+
+    def save(self, path: str):
+        np.save(path, self.idf if self.idf is not None else np.zeros(0, dtype=np.float32))
+
+    def load(self, path: str):
+        idf = np.load(path)
+        self.idf = idf if len(idf) else None
+        return self
+
+
+_default: Optional[HashingEmbedder] = None
+_default_lock = threading.Lock()
+
+
+def get_local_embedder() -> HashingEmbedder:
+    """Return the process-wide embedder (``LLM_LOCAL_EMBED_DIM``, IDF from ``LLM_LOCAL_EMBED_IDF``)."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                embedder = HashingEmbedder(dim=int(os.getenv("LLM_LOCAL_EMBED_DIM", DEFAULT_DIM)))
+                idf_path = os.getenv("LLM_LOCAL_EMBED_IDF")
+                if idf_path and os.path.exists(idf_path):
+                    embedder.load(idf_path)
+                _default = embedder
+    return _default
+
+
+def set_local_embedder(embedder: Optional[HashingEmbedder]):
+    """Replace the process-wide embedder; ``None`` re-reads env on next use."""
+    global _default
+    _default = embedder
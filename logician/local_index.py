@@ -0,0 +1,443 @@
+"""In-process vector store used when qdrant-client is not installed.
+
+Each collection keeps unit-normalised vectors in one contiguous float32 matrix
+with ids and payloads in side lists, so cosine top-k is a single matrix-vector
+product followed by ``argpartition``. Large collections switch to an IVF
+approximate index (``logician.ann``) and vectors can be stored quantized
+(``logician.quantization``). Collections persist as a ``.npy`` matrix
+(memory-mapped on load) plus a JSON sidecar for ids and payloads.
+"""
+from typing import Dict, List, Optional
+import json
+import os
+import threading
+import numpy as np
+from .ann import DEFAULT_NLIST, DEFAULT_NPROBE, IVFIndex, top_k_rows
+from .filters import is_range, matches
+from .quantization import make_quantizer
+
+
+_INITIAL_CAPACITY = 1024
+DEFAULT_ANN_THRESHOLD = 1_000_000
+# Bound on the (rows x queries) score matrix built by one ``search_batch`` step.
+_BATCH_SCORE_ELEMENTS = 1 << 24
+_COLLECTION_FILES = (".meta.json", ".vectors.npy", ".codes.npy", ".ivf.npz", ".quant.npz")
+
+
+class LocalCollection:
+    """Vectors, ids and payloads of one collection.
+
+    Searches are exact until the collection holds ``ann_threshold`` vectors
+    (``QDRANT_LOCAL_ANN_THRESHOLD``, 0 disables) or ``build_ann`` is called;
+    after that they go through the IVF index unless ``exact=True``.
+
+    With ``quantization`` (see ``logician.quantization``) vectors are scored
+    from compact codes. ``rescore`` keeps the float32 vectors as well and
+    re-ranks the best ``rescore_factor * top_k`` candidates with them. Product
+    quantization trains itself once ``pq_train_size`` vectors have arrived.
+
+    ``create_payload_index`` keeps a payload field as a column (keyword codes
+    or floats) so ``search(filters=...)`` (see ``logician.filters``) selects rows
+    with vectorised comparisons; other fields are matched payload by payload.
+    """
+
+    def __init__(self, dim: int, ann_threshold: Optional[int] = None, quantization: Optional[str] = None,
+                 rescore: bool = True, rescore_factor: int = 4, pq_train_size: int = 4096):
+        self.dim = dim
+        if ann_threshold is None:
+            ann_threshold = int(os.getenv("QDRANT_LOCAL_ANN_THRESHOLD", DEFAULT_ANN_THRESHOLD))
+        self.ann_threshold = ann_threshold
+        self.ann: Optional[IVFIndex] = None
+        self.quantizer = make_quantizer(quantization, dim) if quantization else None
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.pq_train_size = pq_train_size
+        self._vectors: Optional[np.ndarray] = np.zeros((0, dim), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        if self.quantizer is not None and self.quantizer.trained:
+            self._codes = np.zeros((0, self.quantizer.code_size), dtype=self.quantizer.dtype)
+            if not rescore:
+                self._vectors = None
+        self._size = 0
+        self.ids: List = []
+        self.payloads: List[Dict] = []
+        self._rows: Dict = {}
+        self._indexes: Dict[str, str] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._keywords: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Unit vectors at full precision, decoded from codes if they are not kept."""
+        if self._vectors is None:
+            return self.quantizer.decode(self._codes[:self._size])
+        return self._vectors[:self._size]
+
+    @property
+    def quantization(self) -> Optional[str]:
+        return self.quantizer.kind if self.quantizer is not None else None
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for arr in (self._vectors, self._codes):
+            if arr is not None:
+                total += arr[:self._size].nbytes
+        return total
+
+    def payload(self, pid) -> Optional[Dict]:
+        row = self._rows.get(pid)
+        return self.payloads[row] if row is not None else None
+
+    def upsert(self, ids: List, vectors, payloads: List[Dict]):
+        matrix = normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        with self._lock:
+            rows = []
+            for pid, payload in zip(ids, payloads):
+                row = self._rows.get(pid)
+                if row is None:
+                    row = self._size
+                    self._rows[pid] = row
+                    self.ids.append(pid)
+                    self.payloads.append(payload)
+                    self._size += 1
+                else:
+                    self.payloads[row] = payload
+                rows.append(row)
+            matrix = matrix[:len(rows)]
+            self._index_payloads(rows)
+            if self._vectors is not None:
+                self._vectors = _grown(self._vectors, self._size)
+                self._vectors[rows] = matrix
+            if self._codes is not None:
+                self._codes = _grown(self._codes, self._size)
+                self._codes[rows] = self.quantizer.encode(matrix)
+            if self.ann is not None:
+                self.ann.add(rows, matrix)
+            if self._codes is None and self.quantizer is not None and self._size >= self.pq_train_size:
+                self._train_quantizer()
+
+    def create_payload_index(self, field: str, kind: str = "keyword"):
+        """Index payload ``field`` as ``"keyword"`` (exact match) or ``"float"`` (ranges)."""
+        if kind not in ("keyword", "float"):
+            raise ValueError(f"unknown payload index type {kind!r}")
+        with self._lock:
+            self._indexes[field] = kind
+            self._columns[field] = np.zeros(0, dtype=np.float64 if kind == "float" else np.int32)
+            self._keywords[field] = {}
+            self._index_payloads(range(self._size), fields=[field])
+
+    def filter_mask(self, filters: Dict) -> np.ndarray:
+        """Boolean mask over rows whose payloads satisfy ``filters``."""
+        mask = np.ones(self._size, dtype=bool)
+        for field, condition in filters.items():
+            kind = self._indexes.get(field)
+            column = self._columns[field][:self._size] if kind else None
+            if kind == "float" and is_range(condition):
+                mask &= _range_mask(column, condition)
+            elif kind == "float" and not isinstance(condition, (list, tuple, set)):
+                mask &= column == float(condition)
+            elif kind == "keyword" and not is_range(condition):
+                values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+                codes = [self._keywords[field][v] for v in values if v in self._keywords[field]]
+                mask &= np.isin(column, codes)
+            else:
+                only = {field: condition}
+                mask &= np.fromiter((matches(p, only) for p in self.payloads[:self._size]),
+                                    dtype=bool, count=self._size)
+        return mask
+
+    def quantize(self, kind: str, rescore: bool = True, **kwargs):
+        """Switch to ``kind`` quantization, encoding the vectors already stored."""
+        with self._lock:
+            vectors = self.vectors
+            self._vectors = np.array(vectors, dtype=np.float32)
+            self.quantizer = make_quantizer(kind, self.dim, **kwargs)
+            self.rescore = rescore
+            self._codes = None
+            self._train_quantizer()
+
+    def build_ann(self, nlist: int = DEFAULT_NLIST, nprobe: int = DEFAULT_NPROBE):
+        """Train an IVF index over the current vectors; later upserts are added incrementally."""
+        with self._lock:
+            vectors = self.vectors
+            ann = IVFIndex(self.dim, nlist=nlist, nprobe=nprobe)
+            ann.train(vectors)
+            ann.add(np.arange(self._size), vectors)
+            self.ann = ann
+
+    def search(self, vector, top_k: int = 5, exact: bool = False, nprobe: Optional[int] = None,
+               filters: Optional[Dict] = None, with_vectors: bool = False) -> List[Dict]:
+        """Top-k hits; ``with_vectors`` adds each hit's full-precision unit ``vector``."""
+        hits = self._search(vector, top_k, exact, nprobe, filters)
+        return self._with_vectors(hits) if with_vectors else hits
+
+    def _with_vectors(self, hits: List[Dict]) -> List[Dict]:
+        if hits:
+            rows = [self._rows[h["id"]] for h in hits]
+            vectors = self._vectors[rows] if self._vectors is not None else self.quantizer.decode(self._codes[rows])
+            for hit, vec in zip(hits, vectors):
+                hit["vector"] = vec
+        return hits
+
+    def _search(self, vector, top_k: int, exact: bool, nprobe: Optional[int],
+                filters: Optional[Dict]) -> List[Dict]:
+        if self._size == 0 or top_k <= 0:
+            return []
+        query = normalize(np.asarray(vector, dtype=np.float32).reshape(1, self.dim))[0]
+        mask = allowed = None
+        if filters:
+            mask = self.filter_mask(filters)
+            allowed = np.nonzero(mask)[0]
+            if not len(allowed):
+                return []
+        if exact and self._vectors is not None:
+            if allowed is None:
+                rows, scores = top_k_rows(self.vectors @ query, top_k)
+            else:
+                idx, scores = top_k_rows(self._vectors[allowed] @ query, top_k)
+                rows = allowed[idx]
+            return self._hits(rows, scores)
+        if not exact and self.ann is None and self.ann_threshold and self._size >= self.ann_threshold:
+            self.build_ann()
+        rescoring = self._codes is not None and self._vectors is not None
+        fetch = top_k * self.rescore_factor if rescoring else top_k
+        use_ann = not exact and self.ann is not None
+        if use_ann and allowed is not None:
+            # A selective filter leaves fewer rows than the probed cells hold: scan them all.
+            probed = self._size * min(nprobe or self.ann.nprobe, self.ann.nlist) / self.ann.nlist
+            use_ann = len(allowed) > probed
+        if use_ann:
+            rows, scores = self.ann.search(self._score_rows, query, fetch, nprobe, mask=mask)
+        elif allowed is not None:
+            idx, scores = top_k_rows(self._score_rows(allowed, query), fetch)
+            rows = allowed[idx]
+        else:
+            rows, scores = top_k_rows(self._score_all(query), fetch)
+        if rescoring:
+            exact_scores = self._vectors[rows] @ query
+            order = np.argsort(-exact_scores, kind="stable")[:top_k]
+            rows, scores = rows[order], exact_scores[order]
+        return self._hits(rows, scores)
+
+    def search_batch(self, vectors, top_k: int = 5, exact: bool = False, nprobe: Optional[int] = None,
+                     filters=None, with_vectors: bool = False) -> List[List[Dict]]:
+        """One ``search`` per row of ``vectors``; ``filters`` is one dict for all or a list per query.
+
+        Unfiltered searches over full-precision vectors without an IVF index
+        share one matrix product per chunk of queries.
+        """
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        per_query = filters if isinstance(filters, list) else [filters] * len(queries)
+        wants_ann = self.ann is not None or (self.ann_threshold and self._size >= self.ann_threshold)
+        if self._size == 0 or top_k <= 0 or self._vectors is None or self._codes is not None \
+                or any(per_query) or (wants_ann and not exact):
+            return [self.search(q, top_k, exact=exact, nprobe=nprobe, filters=f, with_vectors=with_vectors)
+                    for q, f in zip(queries, per_query)]
+        queries = normalize(queries)
+        vectors = self.vectors
+        chunk = max(1, _BATCH_SCORE_ELEMENTS // self._size)
+        results = []
+        for start in range(0, len(queries), chunk):
+            scores = vectors @ queries[start:start + chunk].T
+            for column in scores.T:
+                hits = self._hits(*top_k_rows(column, top_k))
+                results.append(self._with_vectors(hits) if with_vectors else hits)
+        return results
+
+    def save(self, prefix: str):
+        # Write beside and rename, so a memmap of the previous file stays valid.
+        with self._lock:
+            for name, arr in (("vectors", self._vectors), ("codes", self._codes)):
+                if arr is None:
+                    if os.path.exists(f"{prefix}.{name}.npy"):
+                        os.remove(f"{prefix}.{name}.npy")
+                    continue
+                out = np.lib.format.open_memmap(f"{prefix}.{name}.tmp", mode="w+", dtype=arr.dtype,
+                                                shape=(self._size,) + arr.shape[1:])
+                out[:] = arr[:self._size]
+                out.flush()
+                del out
+                os.replace(f"{prefix}.{name}.tmp", f"{prefix}.{name}.npy")
+            meta = {
+                "dim": self.dim,
+                "quantization": self.quantization,
+                "rescore": self.rescore,
+                "indexes": self._indexes,
+                "ids": self.ids,
+                "payloads": self.payloads,
+            }
+            with open(prefix + ".meta.tmp", "w", encoding="utf-8") as fh:
+                json.dump(meta, fh)
+            os.replace(prefix + ".meta.tmp", prefix + ".meta.json")
+            for name, state in (("ivf", self.ann.state() if self.ann is not None else None),
+                                ("quant", self.quantizer.state() if self._codes is not None else None)):
+                if state:
+                    with open(f"{prefix}.{name}.tmp", "wb") as fh:
+                        np.savez(fh, **state)
+                    os.replace(f"{prefix}.{name}.tmp", f"{prefix}.{name}.npz")
+
+    @classmethod
+    def load(cls, prefix: str) -> "LocalCollection":
+        with open(prefix + ".meta.json", "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        coll = cls(meta["dim"], rescore=meta.get("rescore", True))
+        coll.ids = meta["ids"]
+        coll.payloads = meta["payloads"]
+        coll._size = len(coll.ids)
+        coll._rows = {pid: i for i, pid in enumerate(coll.ids)}
+        # Read-only memmaps until the first upsert copies them into growable buffers.
+        coll._vectors = _load_array(prefix + ".vectors.npy")
+        coll._codes = _load_array(prefix + ".codes.npy")
+        if meta.get("quantization"):
+            state = None
+            if os.path.exists(prefix + ".quant.npz"):
+                with np.load(prefix + ".quant.npz") as data:
+                    state = dict(data)
+            coll.quantizer = make_quantizer(meta["quantization"], coll.dim, state=state)
+        if os.path.exists(prefix + ".ivf.npz"):
+            with np.load(prefix + ".ivf.npz") as state:
+                coll.ann = IVFIndex.from_state(state, coll._size)
+        for field, kind in meta.get("indexes", {}).items():
+            coll.create_payload_index(field, kind)
+        return coll
+
+    def _index_payloads(self, rows, fields=None):
+        for field in fields or self._indexes:
+            kind = self._indexes[field]
+            column = self._columns[field] = _grown(self._columns[field], self._size)
+            codes = self._keywords[field]
+            for row in rows:
+                value = self.payloads[row].get(field)
+                if kind == "float":
+                    try:
+                        column[row] = float(value) if value is not None else np.nan
+                    except (TypeError, ValueError):
+                        column[row] = np.nan
+                elif isinstance(value, (str, int, float, bool)):
+                    column[row] = codes.setdefault(value, len(codes))
+                else:
+                    column[row] = -1
+
+    def _train_quantizer(self):
+        if not self.quantizer.trained:
+            self.quantizer.fit(self._vectors[:self._size])
+        self._codes = self.quantizer.encode(self._vectors[:self._size])
+        if not self.rescore:
+            self._vectors = None
+
+    def _score_all(self, query: np.ndarray) -> np.ndarray:
+        if self._codes is not None:
+            return self.quantizer.scores(self._codes[:self._size], query)
+        return self._vectors[:self._size] @ query
+
+    def _score_rows(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self._codes is not None:
+            return self.quantizer.scores(self._codes[rows], query)
+        return self._vectors[rows] @ query
+
+    def _hits(self, rows, scores) -> List[Dict]:
+        return [{"id": self.ids[i], "score": float(s), "payload": self.payloads[i]} for i, s in zip(rows, scores)]
+
+
+class LocalIndex:
+    """Named ``LocalCollection``s, optionally persisted under directory ``path``."""
+
+    _shared: Dict[str, "LocalIndex"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: Optional[str] = None) -> "LocalIndex":
+        """Return a fresh in-memory index, or the process-wide index for ``path``."""
+        if not path:
+            return cls()
+        key = os.path.abspath(path)
+        with cls._shared_lock:
+            index = cls._shared.get(key)
+            if index is None:
+                index = cls._shared[key] = cls(path)
+            return index
+
+    def create_collection(self, name: str, dim: int, **kwargs) -> LocalCollection:
+        with self._lock:
+            coll = self.collections[name] = LocalCollection(dim, **kwargs)
+            return coll
+
+    def get(self, name: str) -> Optional[LocalCollection]:
+        coll = self.collections.get(name)
+        if coll is None and self.path and os.path.exists(self._prefix(name) + ".meta.json"):
+            with self._lock:
+                coll = self.collections.get(name)
+                if coll is None:
+                    coll = self.collections[name] = LocalCollection.load(self._prefix(name))
+        return coll
+
+    def names(self) -> List[str]:
+        """Collections in memory or persisted under ``path``."""
+        names = set(self.collections)
+        if self.path and os.path.isdir(self.path):
+            names.update(f[:-len(".meta.json")] for f in os.listdir(self.path)
+                         if f.endswith(".meta.json") and not f.endswith(".bm25.meta.json"))
+        return sorted(names)
+
+    def drop(self, name: str):
+        """Forget collection ``name`` and remove its files."""
+        with self._lock:
+            self.collections.pop(name, None)
+            if self.path:
+                for suffix in _COLLECTION_FILES:
+                    if os.path.exists(self._prefix(name) + suffix):
+                        os.remove(self._prefix(name) + suffix)
+
+    def get_or_create(self, name: str, dim: int) -> LocalCollection:
+        coll = self.get(name)
+        return coll if coll is not None else self.create_collection(name, dim)
+
+    def flush(self):
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for name, coll in list(self.collections.items()):
+            coll.save(self._prefix(name))
+
+    def _prefix(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length; zero rows stay zero."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _range_mask(column: np.ndarray, condition: Dict) -> np.ndarray:
+    mask = np.ones(len(column), dtype=bool)
+    for key, op in (("gte", np.greater_equal), ("gt", np.greater), ("lte", np.less_equal), ("lt", np.less)):
+        if key in condition:
+            mask &= op(column, condition[key])
+    return mask
+
+
+def _grown(arr: np.ndarray, size: int) -> np.ndarray:
+    """``arr`` with room for ``size`` rows, copied out of a read-only memmap if needed."""
+    if size <= arr.shape[0] and not isinstance(arr, np.memmap):
+        return arr
+    capacity = max(_INITIAL_CAPACITY, arr.shape[0])
+    while capacity < size:
+        capacity *= 2
+    grown = np.zeros((capacity,) + arr.shape[1:], dtype=arr.dtype)
+    grown[:arr.shape[0]] = arr
+    return grown
+
+
+def _load_array(path: str) -> Optional[np.ndarray]:
+    return np.load(path, mmap_mode="r") if os.path.exists(path) else None
@@ -0,0 +1,203 @@
+"""Per-stage timings, fallback/error counters and query traces.
+
+Pipeline stages are timed with ``span("embed")`` and friends. Every span feeds
+the ``logician_stage_seconds`` histogram; a failure inside one increments
+``logician_errors_total``. Code paths that swallow an error and degrade (local
+embeddings instead of the endpoint, the LLM placeholder) call ``fallback`` so
+they show up in ``logician_fallbacks_total`` instead of just looking fast.
+
+``render_prometheus`` returns everything in the Prometheus text format. Inside
+``with trace() as t:`` the spans and fallbacks of that one query are also
+collected on ``t`` (``t.format()`` prints a stage breakdown). When
+``opentelemetry-api`` is installed, spans are mirrored as OpenTelemetry spans.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+import bisect
+import threading
+import time
+
+
+try:
+    from opentelemetry import trace as otel_trace
+    _tracer = otel_trace.get_tracer("logician")
+except Exception:
+    _tracer = None
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    "logician_stage_seconds": "Time spent in each pipeline stage.",
+    "logician_errors_total": "Exceptions raised inside a pipeline stage.",
+    "logician_fallbacks_total": "Degraded results returned after a swallowed error.",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, _labels(labels)), 0.0)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        out: List[str] = []
+        with self._lock:
+            histograms = {name for name, _ in self.histograms}
+            for name in sorted({name for name, _ in self.counters} | histograms):
+                if name in _HELP:
+                    out.append(f"# HELP {name} {_HELP[name]}")
+                out.append(f"# TYPE {name} {'histogram' if name in histograms else 'counter'}")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        out.append(f"{name}{_format(labels)} {value:g}")
+                for (n, labels), hist in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        out.append(f"{name}_bucket{_format(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                    out.append(f"{name}_bucket{_format(labels + (('le', '+Inf'),))} {hist.count}")
+                    out.append(f"{name}_sum{_format(labels)} {hist.sum:.6f}")
+                    out.append(f"{name}_count{_format(labels)} {hist.count}")
+        return "\n".join(out) + "\n" if out else ""
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class Trace:
+    """Spans and fallbacks recorded while handling one query."""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float, Optional[str]]] = []
+        self.fallbacks: List[Tuple[str, str]] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def stages(self) -> Dict[str, float]:
+        """Total seconds per stage, in first-seen order."""
+        totals: Dict[str, float] = {}
+        for stage, seconds, _ in list(self.spans):
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def format(self) -> str:
+        total = self.elapsed or (time.perf_counter() - self.started)
+        lines = [f"{'stage':<10} {'ms':>9} {'share':>6}"]
+        for stage, seconds in self.stages().items():
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"{stage:<10} {seconds * 1000:>9.1f} {share:>5.0f}%")
+        lines.append(f"{'total':<10} {total * 1000:>9.1f}")
+        for stage, error in self.spans_with_errors():
+            lines.append(f"error in {stage}: {error}")
+        for stage, reason in self.fallbacks:
+            lines.append(f"fallback in {stage}: {reason}")
+        return "\n".join(lines)
+
+    def spans_with_errors(self) -> List[Tuple[str, str]]:
+        return [(stage, error) for stage, _, error in self.spans if error]
+
+
+registry = Registry()
+_current: ContextVar[Optional[Trace]] = ContextVar("logician_trace", default=None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as ``stage``."""
+    otel = _tracer.start_as_current_span(f"logician.{stage}") if _tracer is not None else None
+    if otel is not None:
+        otel.__enter__()
+    start = time.perf_counter()
+    error = None
+    exc_info = (None, None, None)
+    try:
+        yield
+    except BaseException as exc:
+        if not isinstance(exc, GeneratorExit):
+            error = type(exc).__name__
+            exc_info = (type(exc), exc, exc.__traceback__)
+            registry.inc("logician_errors_total", stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("logician_stage_seconds", elapsed, stage=stage)
+        current = _current.get()
+        if current is not None:
+            current.spans.append((stage, elapsed, error))
+        if otel is not None:
+            otel.__exit__(*exc_info)
+
+
+def fallback(stage: str, reason: object = ""):
+    """Record that ``stage`` swallowed an error (``reason``) and returned a degraded result."""
+    registry.inc("logician_fallbacks_total", stage=stage)
+    current = _current.get()
+    if current is not None:
+        current.fallbacks.append((stage, reason if isinstance(reason, str) else type(reason).__name__))
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Collect the spans and fallbacks of the enclosed block on the yielded ``Trace``."""
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        current.elapsed = time.perf_counter() - current.started
+        _current.reset(token)
+
+
+def render_prometheus() -> str:
+    return registry.render()
@@ -0,0 +1,109 @@
+"""Time-partitioned collections.
+
+With partitioning on, ingest routes each line to ``<collection>__<YYYYMMDD>``
+(``__<YYYYMMDDHH>`` for hourly partitions) by its timestamp, and a query only
+searches the partitions overlapping its ``timestamp`` filter, by default the
+last ``RAG_PARTITION_DAYS`` days. Search cost then follows the window asked
+about instead of the whole history. ``apply_retention`` drops partitions past
+the retention period and compacts (int8-quantizes) older ones that are kept.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import time
+
+
+GRANULARITIES = {"day": ("%Y%m%d", 86400), "hour": ("%Y%m%d%H", 3600)}
+SEPARATOR = "__"
+DEFAULT_SEARCH_DAYS = 7.0
+
+
+def _format(granularity: str) -> Tuple[str, int]:
+    try:
+        return GRANULARITIES[granularity]
+    except KeyError:
+        raise ValueError(f"unknown partition granularity {granularity!r}") from None
+
+
+def partition_name(collection: str, timestamp: float, granularity: str = "day") -> str:
+    fmt, _ = _format(granularity)
+    return collection + SEPARATOR + datetime.fromtimestamp(timestamp, timezone.utc).strftime(fmt)
+
+
+def partition_start(collection: str, name: str, granularity: str = "day") -> Optional[float]:
+    """Epoch seconds at which partition ``name`` of ``collection`` starts, or None if it isn't one."""
+    fmt, _ = _format(granularity)
+    prefix = collection + SEPARATOR
+    if not name.startswith(prefix):
+        return None
+    try:
+        start = datetime.strptime(name[len(prefix):], fmt)
+    except ValueError:
+        return None
+    return start.replace(tzinfo=timezone.utc).timestamp()
+
+
+def partitions_in(names: Sequence[str], collection: str, granularity: str = "day") -> List[Tuple[str, float]]:
+    """``(name, start)`` of the partitions of ``collection`` among ``names``, newest first."""
+    found = []
+    for name in names:
+        start = partition_start(collection, name, granularity)
+        if start is not None:
+            found.append((name, start))
+    return sorted(found, key=lambda item: item[1], reverse=True)
+
+
+def list_partitions(qdrant, collection: str, granularity: str = "day") -> List[Tuple[str, float]]:
+    """``(name, start)`` of every partition of ``collection``, newest first."""
+    return partitions_in(qdrant.list_collections(), collection, granularity)
+
+
+def time_range(filters: Optional[Dict]) -> Tuple[Optional[float], Optional[float]]:
+    """``(since, until)`` bounds of the ``timestamp`` condition in ``filters``."""
+    condition = (filters or {}).get("timestamp")
+    if not isinstance(condition, dict):
+        return None, None
+    since = condition.get("gte", condition.get("gt"))
+    until = condition.get("lte", condition.get("lt"))
+    return since, until
+
+
+def select_partitions(partitions: Sequence[Tuple[str, float]], granularity: str = "day",
+                      since: Optional[float] = None, until: Optional[float] = None) -> List[str]:
+    """Names of the ``partitions`` that overlap ``[since, until]``."""
+    _, width = _format(granularity)
+    return [name for name, start in partitions
+            if (since is None or start + width > since) and (until is None or start <= until)]
+
+
+def route(collection: str, payloads: Sequence[Dict], granularity: str = "day",
+          now: Optional[float] = None) -> Dict[str, List[int]]:
+    """Indices of ``payloads`` grouped by partition; lines without a timestamp go to ``now``'s."""
+    now = time.time() if now is None else now
+    groups: Dict[str, List[int]] = {}
+    for i, payload in enumerate(payloads):
+        ts = payload.get("timestamp")
+        groups.setdefault(partition_name(collection, ts if ts is not None else now, granularity), []).append(i)
+    return groups
+
+
+def apply_retention(qdrant, collection: str, keep_days: float, compact_days: Optional[float] = None,
+                    granularity: str = "day", now: Optional[float] = None) -> Dict[str, List[str]]:
+    """Drop partitions that ended more than ``keep_days`` ago; compact those older than ``compact_days``.
+
+    Returns the ``"dropped"`` and ``"compacted"`` partition names.
+    """
+    now = time.time() if now is None else now
+    _, width = _format(granularity)
+    result: Dict[str, List[str]] = {"dropped": [], "compacted": []}
+    for name, start in list_partitions(qdrant, collection, granularity):
+        age = now - (start + width)
+        if age > keep_days * 86400:
+            qdrant.delete_collection(name)
+            result["dropped"].append(name)
+        elif compact_days is not None and age > compact_days * 86400:
+            if qdrant.compact_collection(name):
+                result["compacted"].append(name)
+    if result["dropped"] or result["compacted"]:
+        qdrant.flush()
+        qdrant.invalidate(collection)
+    return result
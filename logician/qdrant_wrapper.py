@@ -1,44 +1,368 @@
 """Minimal Qdrant client wrapper.
 
 This wrapper uses qdrant-client when available. It provides simple helpers to
-create a collection, upsert vectors, and search.
+create a collection, upsert vectors, and search. Without qdrant-client the same
+calls go to an in-process NumPy index (``logician.local_index``), persisted
+under ``QDRANT_LOCAL_PATH`` when set; ``QDRANT_BACKEND=local`` selects that
+index even when qdrant-client is installed. Vectors may be lists or float32
+``ndarray``s; arrays only become lists at the Qdrant wire boundary.
+
+Upserted payload text is also indexed in a BM25 store (``logician.bm25``)
+for ``lexical_search``, persisted under ``BM25_INDEX_PATH`` (default
+``QDRANT_LOCAL_PATH``); set ``BM25_ENABLED=0`` to skip it. With a Qdrant
+server and neither path set there is no BM25 store at all.
 """
 from typing import List, Dict, Optional
+import asyncio
+import logging
 import os
+import threading
+import uuid
+import numpy as np
+from .bm25 import LexicalStore
+from .filters import PAYLOAD_INDEXES, matches, to_qdrant_filter
+from .local_index import LocalIndex
 
 
 try:
     from qdrant_client import QdrantClient
-    from qdrant_client.http.models import VectorParams, Distance
+    from qdrant_client.http.models import VectorParams, Distance, SearchParams
     _HAS_QDRANT = True
 except Exception:
     QdrantClient = None  # type: ignore
     _HAS_QDRANT = False
 
+try:
+    from qdrant_client import AsyncQdrantClient
+except Exception:
+    AsyncQdrantClient = None  # type: ignore
+
+try:
+    from qdrant_client.http.models import (
+        CompressionRatio,
+        Datatype,
+        ProductQuantization,
+        ProductQuantizationConfig,
+        QuantizationSearchParams,
+        ScalarQuantization,
+        ScalarQuantizationConfig,
+        ScalarType,
+    )
+except Exception:
+    ScalarQuantization = None  # type: ignore
+    Datatype = None  # type: ignore
+
+try:
+    from qdrant_client.http.models import PayloadSchemaType, SearchRequest
+except Exception:
+    PayloadSchemaType = None  # type: ignore
+    SearchRequest = None  # type: ignore
+
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_FILTER_FETCH = 10
+
+# Generation counters, bumped whenever a collection is recreated or re-ingested;
+# answers cached against an older generation are stale. They are stored with the
+# collection so a ``serve`` process sees bumps made by a separate ingest: in
+# ``<name>.generation`` under ``QDRANT_LOCAL_PATH``, or as one point per collection
+# in the ``GENERATIONS_COLLECTION`` of a Qdrant server. An in-memory local index
+# can't be shared, so its counters stay in this process.
+GENERATIONS_COLLECTION = "logician_generations"
+_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def _generation_id(name: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"logician-generation:{name}"))
+
+
+def _read_generation(path: str) -> int:
+    try:
+        with open(path) as fh:
+            return int(fh.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
 
 class QdrantWrapper:
     def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None):
         self.url = url or os.getenv("QDRANT_URL", "http://localhost:6333")
         self.api_key = api_key or os.getenv("QDRANT_API_KEY")
-        if _HAS_QDRANT:
+        if _HAS_QDRANT and os.getenv("QDRANT_BACKEND", "").lower() != "local":
             self.client = QdrantClient(url=self.url, api_key=self.api_key)
+            self.local = None
         else:
             self.client = None
+            self.local = LocalIndex.open(os.getenv("QDRANT_LOCAL_PATH"))
+        self.lexical = None
+        lexical_path = os.getenv("BM25_INDEX_PATH") or os.getenv("QDRANT_LOCAL_PATH")
+        # An in-memory BM25 index next to a Qdrant server would be lost at exit while the
+        # vectors stay, so it is only kept when persisted or next to in-memory vectors.
+        if os.getenv("BM25_ENABLED", "1") != "0" and (lexical_path or self.client is None):
+            self.lexical = LexicalStore.open(lexical_path)
+        self._async_client = None
+        # Collections known to exist, so ``ensure_collection`` asks Qdrant once per name.
+        self._known = set()
 
-    def create_collection(self, name: str, vector_size: int = 128):
-        if not _HAS_QDRANT:
+    def create_collection(self, name: str, vector_size: int = 128, quantization: Optional[str] = None):
+        """(Re)create ``name`` with payload indexes for ``filters.PAYLOAD_INDEXES``.
+        ``quantization`` is one of "float16", "int8" or "pq" (default
+        ``QDRANT_QUANTIZATION``); originals are kept for rescoring."""
+        quantization = quantization or os.getenv("QDRANT_QUANTIZATION") or None
+        self.invalidate(name)
+        self._known.add(name)
+        if self.lexical is not None:
+            self.lexical.create(name)
+        if self.client is None:
+            self._create_local(name, vector_size, quantization=quantization)
             return
         params = VectorParams(size=vector_size, distance=Distance.COSINE)
-        self.client.recreate_collection(collection_name=name, vectors_config=params)
+        kwargs = {}
+        if quantization == "float16":
+            # Datatype.FLOAT16 only exists in newer qdrant-client releases than the 1.9 we support.
+            float16 = getattr(Datatype, "FLOAT16", None)
+            if float16 is None:
+                logger.warning("qdrant-client has no float16 vectors; storing %s as float32", name)
+            else:
+                params = VectorParams(size=vector_size, distance=Distance.COSINE, datatype=float16)
+        elif quantization == "int8":
+            kwargs["quantization_config"] = ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+            )
+        elif quantization == "pq":
+            kwargs["quantization_config"] = ProductQuantization(
+                product=ProductQuantizationConfig(compression=CompressionRatio.X16, always_ram=True)
+            )
+        elif quantization:
+            raise ValueError(f"unknown quantization {quantization!r}")
+        self.client.recreate_collection(collection_name=name, vectors_config=params, **kwargs)
+        for field, kind in PAYLOAD_INDEXES.items():
+            schema = PayloadSchemaType.FLOAT if kind == "float" else PayloadSchemaType.KEYWORD
+            self.client.create_payload_index(collection_name=name, field_name=field, field_schema=schema)
+
+    def has_collection(self, name: str) -> bool:
+        if self.client is None:
+            return self.local.get(name) is not None
+        return self.client.collection_exists(collection_name=name)
+
+    def ensure_collection(self, name: str, vector_size: int = 128, quantization: Optional[str] = None) -> bool:
+        """Create ``name`` only if it doesn't exist (unlike ``create_collection``); True if created."""
+        if name in self._known or self.has_collection(name):
+            self._known.add(name)
+            return False
+        self.create_collection(name, vector_size=vector_size, quantization=quantization)
+        return True
+
+    def list_collections(self) -> List[str]:
+        if self.client is None:
+            return self.local.names()
+        return [c.name for c in self.client.get_collections().collections if c.name != GENERATIONS_COLLECTION]
+
+    def delete_collection(self, name: str):
+        """Drop ``name`` with its lexical index."""
+        self.invalidate(name)
+        self._known.discard(name)
+        if self.lexical is not None:
+            self.lexical.drop(name)
+        if self.client is None:
+            self.local.drop(name)
+        else:
+            self.client.delete_collection(collection_name=name)
+
+    def compact_collection(self, name: str, quantization: str = "int8") -> bool:
+        """Store ``name``'s vectors with ``quantization`` and merge its lexical segments.
+
+        Returns False if the collection is missing or already quantized that way.
+        """
+        if self.lexical is not None and self.lexical.get(name) is not None:
+            self.lexical.get(name).compact()
+        if self.client is None:
+            coll = self.local.get(name)
+            if coll is None or coll.quantization == quantization:
+                return False
+            coll.quantize(quantization, rescore=False)
+            return True
+        if quantization != "int8":
+            raise ValueError(f"only int8 compaction is supported on Qdrant, not {quantization!r}")
+        self.client.update_collection(collection_name=name, quantization_config=ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)))
+        return True
+
+    def invalidate(self, name: str):
+        """Mark answers cached for ``name`` as stale (see ``logician.answer_cache``)."""
+        with _generations_lock:
+            generation = self.generations([name])[0] + 1
+            if self.client is not None:
+                if not self._has_generations():
+                    self.client.create_collection(collection_name=GENERATIONS_COLLECTION,
+                                                  vectors_config=VectorParams(size=1, distance=Distance.COSINE))
+                    self._known.add(GENERATIONS_COLLECTION)
+                self.client.upsert(collection_name=GENERATIONS_COLLECTION, points=[
+                    {"id": _generation_id(name), "vector": [1.0],
+                     "payload": {"collection": name, "generation": generation}}])
+            elif self.local.path:
+                path = os.path.join(self.local.path, f"{name}.generation")
+                os.makedirs(self.local.path, exist_ok=True)
+                with open(path + ".tmp", "w") as fh:
+                    fh.write(str(generation))
+                os.replace(path + ".tmp", path)
+            else:
+                _generations[name] = generation
+
+    def generations(self, names: List[str]) -> List[int]:
+        """Current generation of each collection in ``names``, as stored with it (0 if never bumped)."""
+        if self.client is None:
+            if not self.local.path:
+                return [_generations.get(name, 0) for name in names]
+            return [_read_generation(os.path.join(self.local.path, f"{name}.generation")) for name in names]
+        if not self._has_generations():
+            return [0] * len(names)
+        records = self.client.retrieve(collection_name=GENERATIONS_COLLECTION,
+                                       ids=[_generation_id(name) for name in names], with_payload=True)
+        found = {r.payload["collection"]: r.payload["generation"] for r in records}
+        return [found.get(name, 0) for name in names]
+
+    def _has_generations(self) -> bool:
+        if GENERATIONS_COLLECTION not in self._known and self.has_collection(GENERATIONS_COLLECTION):
+            self._known.add(GENERATIONS_COLLECTION)
+        return GENERATIONS_COLLECTION in self._known
+
+    def _create_local(self, name: str, vector_size: int, **kwargs):
+        coll = self.local.create_collection(name, vector_size, **kwargs)
+        for field, kind in PAYLOAD_INDEXES.items():
+            coll.create_payload_index(field, kind)
+        return coll
 
     def upsert(self, collection: str, ids: List[str], vectors: List[List[float]], metadatas: List[Dict]):
-        if not _HAS_QDRANT:
+        if self.lexical is not None and len(ids):
+            self.lexical.get_or_create(collection).add(ids, [m.get("text", "") for m in metadatas])
+        if self.client is None:
+            if len(ids):
+                coll = self.local.get(collection)
+                if coll is None:  # not ``or``: an empty collection is falsy
+                    coll = self._create_local(collection, len(vectors[0]))
+                coll.upsert(ids, vectors, metadatas)
             return
+        if isinstance(vectors, np.ndarray):
+            # The wire format needs lists; convert the whole batch once.
+            vectors = vectors.tolist()
         points = [{"id": i, "vector": v, "payload": m} for i, v, m in zip(ids, vectors, metadatas)]
         self.client.upsert(collection_name=collection, points=points)
 
-    def search(self, collection: str, vector: List[float], top_k: int = 5):
-        if not _HAS_QDRANT:
-            return []
-        results = self.client.search(collection_name=collection, query_vector=vector, limit=top_k)
+    def search(self, collection: str, vector: List[float], top_k: int = 5, exact: bool = False,
+               nprobe: Optional[int] = None, hnsw_ef: Optional[int] = None,
+               rescore: Optional[bool] = None, oversampling: Optional[float] = None,
+               filters: Optional[Dict] = None, with_vectors: bool = False):
+        """Top-k search. ``exact`` skips the ANN index; ``nprobe`` tunes the local IVF
+        index and ``hnsw_ef`` Qdrant's HNSW search. ``rescore``/``oversampling``
+        control full-precision rescoring on quantized Qdrant collections.
+        ``filters`` (see ``logician.filters``) restrict the search to matching
+        payloads and are evaluated by Qdrant or the local payload indexes.
+        ``with_vectors`` returns each hit's stored vector (for re-ranking)."""
+        if self.client is None:
+            local = self.local.get(collection)
+            if local is None:
+                return []
+            kwargs = {"with_vectors": True} if with_vectors else {}
+            return local.search(vector, top_k, exact=exact, nprobe=nprobe, filters=filters, **kwargs)
+        if isinstance(vector, np.ndarray):
+            vector = vector.tolist()
+        kwargs = {"with_vectors": True} if with_vectors else {}
+        if filters:
+            kwargs["query_filter"] = to_qdrant_filter(filters)
+        if exact or hnsw_ef or rescore is not None or oversampling:
+            quantization = None
+            if rescore is not None or oversampling:
+                quantization = QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+            kwargs["search_params"] = SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+        results = self.client.search(collection_name=collection, query_vector=vector, limit=top_k, **kwargs)
         return results
+
+    def search_batch(self, collection: str, vectors, top_k: int = 5, filters=None,
+                     with_vectors: bool = False, rescore: Optional[bool] = None) -> List[List]:
+        """One search per row of ``vectors`` in a single call (Qdrant's ``search_batch``).
+
+        ``filters`` is one filter dict for every query or a list with one per query;
+        ``with_vectors`` and ``rescore`` are as for ``search``.
+        """
+        if self.client is None:
+            local = self.local.get(collection)
+            if local is None:
+                return [[] for _ in range(len(vectors))]
+            kwargs = {"with_vectors": True} if with_vectors else {}
+            return local.search_batch(vectors, top_k, filters=filters, **kwargs)
+        if isinstance(vectors, np.ndarray):
+            vectors = vectors.tolist()
+        per_query = filters if isinstance(filters, list) else [filters] * len(vectors)
+        kwargs = {"with_vector": True} if with_vectors else {}
+        if rescore is not None:
+            kwargs["params"] = SearchParams(quantization=QuantizationSearchParams(rescore=rescore))
+        requests = [
+            SearchRequest(vector=v, limit=top_k, filter=to_qdrant_filter(f), with_payload=True, **kwargs)
+            for v, f in zip(vectors, per_query)
+        ]
+        return self.client.search_batch(collection_name=collection, requests=requests)
+
+    def lexical_search(self, collection: str, query: str, top_k: int = 5,
+                       filters: Optional[Dict] = None) -> List[Dict]:
+        """BM25 search over payload text; hits are ``{"id", "score", "payload"}`` dicts.
+
+        The postings carry no payloads, so ``filters`` are applied to an
+        over-fetched candidate list.
+        """
+        index = self.lexical.get(collection) if self.lexical is not None else None
+        if index is None:
+            return []
+        found = index.search(query, top_k * LEXICAL_FILTER_FETCH if filters else top_k)
+        payloads = self.payloads(collection, [pid for pid, _ in found])
+        hits = [{"id": pid, "score": score, "payload": payloads.get(pid) or {}} for pid, score in found]
+        if filters:
+            hits = [h for h in hits if matches(h["payload"], filters)][:top_k]
+        return hits
+
+    def payloads(self, collection: str, ids: List) -> Dict:
+        """Payloads of the points ``ids`` that exist, keyed by id."""
+        if not ids:
+            return {}
+        if self.client is None:
+            local = self.local.get(collection)
+            if local is None:
+                return {}
+            return {pid: p for pid, p in ((pid, local.payload(pid)) for pid in ids) if p is not None}
+        records = self.client.retrieve(collection_name=collection, ids=list(ids), with_payload=True)
+        return {r.id: r.payload for r in records}
+
+    def flush(self):
+        """Persist the local and lexical indexes (vectors are a no-op with a Qdrant server)."""
+        if self.local is not None:
+            self.local.flush()
+        if self.lexical is not None:
+            self.lexical.flush()
+
+    async def asearch(self, collection: str, vector: List[float], top_k: int = 5, filters: Optional[Dict] = None,
+                      **options):
+        """Async ``search``: uses ``AsyncQdrantClient`` when available, else a worker thread.
+
+        ``options`` are ``search``'s ``with_vectors`` and ``rescore``.
+        """
+        if self.client is None or AsyncQdrantClient is None:
+            # The local index searches synchronously; keep it off the event loop.
+            return await asyncio.to_thread(self.search, collection, vector, top_k, filters=filters, **options)
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(url=self.url, api_key=self.api_key)
+        if isinstance(vector, np.ndarray):
+            vector = vector.tolist()
+        kwargs = {"query_filter": to_qdrant_filter(filters)} if filters else {}
+        if options.get("with_vectors"):
+            kwargs["with_vectors"] = True
+        if options.get("rescore") is not None:
+            kwargs["search_params"] = SearchParams(quantization=QuantizationSearchParams(rescore=options["rescore"]))
+        return await self._async_client.search(collection_name=collection, query_vector=vector, limit=top_k,
+                                               **kwargs)
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
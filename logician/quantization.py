@@ -0,0 +1,149 @@
+"""Compact encodings for unit-normalised vectors in the local backend.
+
+``float16`` halves memory, ``int8`` scalar quantization quarters it, and
+``pq`` (product quantization) stores one byte per subspace, e.g. 16 bytes for
+a 128-dim vector instead of 512. Each quantizer scores a query against codes
+directly, converting a bounded chunk of rows at a time.
+"""
+from typing import Dict, Optional
+import numpy as np
+
+
+QUANTIZATIONS = ("float16", "int8", "pq")
+
+_CHUNK_ROWS = 65536
+
+
+class Float16Quantizer:
+    kind = "float16"
+    dtype = np.float16
+    trained = True
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.code_size = dim
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return _chunked(codes, lambda chunk: chunk.astype(np.float32) @ query)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+
+class Int8Quantizer(Float16Quantizer):
+    """Symmetric scalar quantization; unit vectors need no training (components lie in [-1, 1])."""
+
+    kind = "int8"
+    dtype = np.int8
+    scale = 127.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(vectors) * self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32) / self.scale
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        q = query / self.scale
+        return _chunked(codes, lambda chunk: chunk.astype(np.float32) @ q)
+
+
+class ProductQuantizer:
+    """``m`` sub-vectors, each replaced by the id of one of ``ks`` (<=256) k-means centroids."""
+
+    kind = "pq"
+    dtype = np.uint8
+
+    def __init__(self, dim: int, m: int = 16, ks: int = 256, seed: int = 0):
+        if dim % m:
+            raise ValueError(f"dimension {dim} is not divisible into {m} subspaces")
+        self.dim = dim
+        self.m = m
+        self.ks = ks
+        self.seed = seed
+        self.code_size = m
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def fit(self, vectors: np.ndarray, niter: int = 10, max_samples: int = 65536):
+        rng = np.random.default_rng(self.seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > max_samples:
+            vectors = vectors[rng.choice(len(vectors), max_samples, replace=False)]
+        ks = min(self.ks, len(vectors))
+        sub = self.dim // self.m
+        books = np.zeros((self.m, ks, sub), dtype=np.float32)
+        for j in range(self.m):
+            x = vectors[:, j * sub:(j + 1) * sub]
+            centroids = x[rng.choice(len(x), ks, replace=False)].copy()
+            for _ in range(niter):
+                labels = _nearest(x, centroids)
+                counts = np.bincount(labels, minlength=ks).astype(np.float32)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, x)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            books[j] = centroids
+        self.ks = ks
+        self.codebooks = books
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        sub = self.dim // self.m
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest(vectors[:, j * sub:(j + 1) * sub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1) if parts else np.zeros((0, self.dim), dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        sub = self.dim // self.m
+        # Asymmetric distance: per-subspace lookup table of query-centroid dot products.
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.m, sub))
+        cols = np.arange(self.m)
+        return _chunked(codes, lambda chunk: table[cols, chunk].sum(axis=1))
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks, "pq": np.array([self.m, self.ks, self.seed])}
+
+
+def make_quantizer(kind: str, dim: int, state: Optional[Dict[str, np.ndarray]] = None, **kwargs):
+    """Return a quantizer for ``kind`` (one of ``QUANTIZATIONS``), restoring ``state`` if given."""
+    if kind == "float16":
+        return Float16Quantizer(dim)
+    if kind == "int8":
+        return Int8Quantizer(dim)
+    if kind == "pq":
+        if state is not None and "pq" in state:
+            m, ks, seed = (int(x) for x in state["pq"])
+            quantizer = ProductQuantizer(dim, m=m, ks=ks, seed=seed)
+            quantizer.codebooks = np.asarray(state["codebooks"], dtype=np.float32)
+            return quantizer
+        return ProductQuantizer(dim, **kwargs)
+    raise ValueError(f"unknown quantization {kind!r}; expected one of {QUANTIZATIONS}")
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ||x - c||^2 == argmax (x.c - |c|^2 / 2)
+    return np.argmax(x @ centroids.T - 0.5 * np.einsum("kd,kd->k", centroids, centroids), axis=1)
+
+
+def _chunked(codes: np.ndarray, score) -> np.ndarray:
+    if len(codes) <= _CHUNK_ROWS:
+        return np.asarray(score(codes), dtype=np.float32)
+    out = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), _CHUNK_ROWS):
+        out[start:start + _CHUNK_ROWS] = score(codes[start:start + _CHUNK_ROWS])
+    return out
@@ -1,58 +1,481 @@
 """Simple RAG orchestrator.
 
 This module demonstrates the retrieval + prompt assembly flow. It queries Qdrant for
-similar vectors, then calls a local LLM or returns a simple assembled answer.
+similar vectors and the BM25 index for exact tokens in parallel, fuses both rankings,
+then calls a local LLM or returns a simple assembled answer.
 """
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+import contextvars
+import json
+import logging
 import os
-from .embedder import get_embedding
+import threading
+import time
+from .answer_cache import SemanticAnswerCache, exact_terms, from_env as answer_cache_from_env
+from .context import DEFAULT_CONTEXT_TOKENS, build_context
+from .embedder import get_embedding, get_embeddings
+from .filters import parse_filters
+from .metrics import fallback, span
+from .partitions import DEFAULT_SEARCH_DAYS, partitions_in, select_partitions, time_range
 from .qdrant_wrapper import QdrantWrapper
-import requests
+from .rerank import Reranker, boost, boost_weights, from_env as reranker_from_env
+from .shards import DEFAULT_TIMEOUT_MS as DEFAULT_SHARD_TIMEOUT_MS, scatter, select_shards
+from . import http_client
+
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PREFIX = "[LLM placeholder]"
+
+
+def placeholder_answer(prompt: str) -> str:
+    return PLACEHOLDER_PREFIX + " Based on retrieved context: " + prompt[:200]
+
+
+def chunk_text(chunk: dict) -> str:
+    """Token text of one streamed NDJSON chunk."""
+    return chunk.get("response") or chunk.get("text") or ""
+
+
+DEFAULT_RRF_K = 60
+HYBRID_FETCH_FACTOR = 4
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_CONTEXT_HITS = 3
+MMR_FETCH_FACTOR = 3
+# Seconds a listing of the shards and partitions is reused before asking the backend again.
+COLLECTION_LIST_TTL = 5.0
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="logician-lexical")
+    return _pool
+
+
+def hit_id(hit):
+    return hit.get("id") if isinstance(hit, dict) else getattr(hit, "id", None)
+
+
+def hit_score(hit) -> float:
+    if isinstance(hit, dict):
+        return hit.get("score") or 0.0
+    return getattr(hit, "score", 0.0) or 0.0
+
+
+def hit_payload(hit) -> Dict:
+    payload = hit.get("payload") if isinstance(hit, dict) else getattr(hit, "payload", None)
+    return payload or {}
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List], weights: Optional[Sequence[float]] = None,
+                           k: int = DEFAULT_RRF_K, top_k: Optional[int] = None) -> List[Dict]:
+    """Fuse ranked hit lists: each hit scores ``sum(weight / (k + rank))`` over the lists it is in.
+
+    Returns ``{"id", "score", "payload"}`` dicts, best first.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict = {}
+    payloads: Dict = {}
+    for hits, weight in zip(rankings, weights):
+        for rank, hit in enumerate(hits, 1):
+            pid = hit_id(hit)
+            scores[pid] = scores.get(pid, 0.0) + weight / (k + rank)
+            payloads.setdefault(pid, hit_payload(hit))
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [{"id": pid, "score": score, "payload": payloads[pid]} for pid, score in fused]
 
 
 class RagOrchestrator:
-    def __init__(self, collection: str = "log_entries"):
+    def __init__(self, collection: str = "log_entries", collections: Optional[List[str]] = None):
         self.collection = collection
+        # Collections searched (``collections``, by default just ``collection``), each split
+        # into shards by payload ``shard_key`` (``RAG_SHARD_KEY``, see ``logician.shards``).
+        # Several are searched concurrently; one slower than ``shard_timeout_ms``
+        # (``RAG_SHARD_TIMEOUT_MS``) is left out of the merged hits.
+        self.collections = list(collections) if collections else [collection]
+        self.shard_key = os.getenv("RAG_SHARD_KEY") or None
+        self.shard_timeout_ms = float(os.getenv("RAG_SHARD_TIMEOUT_MS", DEFAULT_SHARD_TIMEOUT_MS))
+        self._collection_list = None
         self.qdrant = QdrantWrapper()
         self.llm_endpoint = os.getenv("LLM_ENDPOINT")
         self.llm_api_key = os.getenv("LLM_API_KEY")
+        # Reciprocal-rank-fusion weights (``RAG_VECTOR_WEIGHT``, ``RAG_LEXICAL_WEIGHT``);
+        # a lexical weight of 0 turns hybrid retrieval off, as does having no BM25 store
+        # (see ``logician.qdrant_wrapper``).
+        self.vector_weight = float(os.getenv("RAG_VECTOR_WEIGHT", 1.0))
+        self.lexical_weight = float(os.getenv("RAG_LEXICAL_WEIGHT") or 1.0)
+        if self.lexical_weight > 0 and self.qdrant.lexical is None:
+            if os.getenv("RAG_LEXICAL_WEIGHT"):
+                logger.warning("RAG_LEXICAL_WEIGHT is set but there is no BM25 index; hybrid retrieval is off "
+                               "(set BM25_INDEX_PATH when using a Qdrant server)")
+            self.lexical_weight = 0.0
+        self.rrf_k = int(os.getenv("RAG_RRF_K", DEFAULT_RRF_K))
+        # Concurrent LLM calls in ``answer_many`` (``RAG_MAX_CONCURRENCY``).
+        self.max_concurrency = int(os.getenv("RAG_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        # Semantic cache of answers (``RAG_ANSWER_CACHE_*``); None disables it.
+        self.answer_cache: Optional[SemanticAnswerCache] = answer_cache_from_env()
+        # Prompt context: at most ``context_hits`` hits (``RAG_CONTEXT_HITS``) within
+        # ``context_tokens`` estimated tokens (``RAG_CONTEXT_TOKENS``). Setting
+        # ``mmr_lambda`` (``RAG_MMR_LAMBDA``, 1.0 = pure relevance) retrieves extra
+        # candidates and picks diverse ones by MMR.
+        self.context_hits = int(os.getenv("RAG_CONTEXT_HITS", DEFAULT_CONTEXT_HITS))
+        self.context_tokens = int(os.getenv("RAG_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS))
+        self.mmr_lambda: Optional[float] = float(os.getenv("RAG_MMR_LAMBDA")) if os.getenv("RAG_MMR_LAMBDA") else None
+        # Two-stage retrieval (``RAG_RERANK_*``): over-fetch ``reranker.fetch`` candidates
+        # with their vectors and re-rank them locally (see ``logician.rerank``). None disables it.
+        self.reranker: Optional[Reranker] = reranker_from_env()
+        # Time partitions (``RAG_PARTITION`` = "day" or "hour", see ``logician.partitions``):
+        # search only the partitions the query's timestamp filter overlaps, by default the
+        # last ``partition_days`` (``RAG_PARTITION_DAYS``), merging hits with recency and
+        # severity ``boosts`` (``rerank.boost_weights``).
+        self.partition: Optional[str] = os.getenv("RAG_PARTITION") or None
+        self.partition_days = float(os.getenv("RAG_PARTITION_DAYS", DEFAULT_SEARCH_DAYS))
+        self.boosts: Dict[str, float] = boost_weights()
 
-    def retrieve(self, query: str, top_k: int = 3):
-        vec = get_embedding(query)
-        hits = self.qdrant.search(self.collection, vec, top_k=top_k)
+    def retrieve(self, query: str, top_k: int = 3, filters: Optional[Dict] = None, vec=None):
+        """Top hits for ``query``; ``filters`` (see ``logician.filters``) are pushed down to the search.
+
+        ``vec`` is the query's embedding when the caller already has it.
+        """
+        if self.reranker is not None:
+            return self.rerank_retrieve(query, top_k, filters, vec)
+        if self.lexical_weight <= 0:
+            return self.vector_retrieve(query, top_k, filters, vec)
+        fetch = top_k * HYBRID_FETCH_FACTOR
+        lexical = _executor().submit(contextvars.copy_context().run, self.lexical_retrieve, query, fetch, None, filters)
+        dense = self.vector_retrieve(query, fetch, filters, vec)
+        return self.fuse(dense, lexical.result(), top_k)
+
+    def retrieve_many(self, queries: List[str], top_k: int = 3, filters: Optional[List[Optional[Dict]]] = None,
+                      vectors=None):
+        """``retrieve`` for many queries: one embedding batch and one ``search_batch``.
+
+        ``vectors`` are the queries' embeddings when the caller already has them.
+        """
+        filters = filters or [None] * len(queries)
+        if self.fans_out():
+            # Each query may touch different shards and partitions.
+            if vectors is None:
+                return [self.retrieve(q, top_k, f) for q, f in zip(queries, filters)]
+            return [self.retrieve(q, top_k, f, vec) for q, f, vec in zip(queries, filters, vectors)]
+        hybrid = self.lexical_weight > 0
+        fetch = top_k * HYBRID_FETCH_FACTOR if hybrid else top_k
+        lexical = []
+        if hybrid:
+            lexical = [_executor().submit(contextvars.copy_context().run, self.lexical_retrieve, q, fetch, None, f)
+                       for q, f in zip(queries, filters)]
+        if vectors is None:
+            with span("embed"):
+                vectors = get_embeddings(queries, as_array=True)
+        if self.reranker is not None:
+            with span("search"):
+                dense = self.qdrant.search_batch(self.collection, vectors, top_k=max(self.reranker.fetch, top_k),
+                                                 filters=list(filters), with_vectors=True, rescore=False)
+            return [self.rerank(q, vec, list(hits or []), lexical[i].result() if hybrid else [], top_k)
+                    for i, (q, vec, hits) in enumerate(zip(queries, vectors, dense))]
+        with span("search"):
+            dense = self.qdrant.search_batch(self.collection, vectors, top_k=fetch, filters=list(filters))
+        if not hybrid:
+            return [list(hits or [])[:top_k] for hits in dense]
+        return [self.fuse(list(hits or []), lex.result(), top_k) for hits, lex in zip(dense, lexical)]
+
+    def vector_retrieve(self, query: str, top_k: int = 3, filters: Optional[Dict] = None, vec=None):
+        if vec is None:
+            with span("embed"):
+                vec = get_embedding(query, as_array=True)
+        if self.fans_out():
+            with span("search"):
+                return self.merge(self.dense_search(vec, top_k, filters), top_k)
+        with span("search"):
+            if filters:
+                hits = self.qdrant.search(self.collection, vec, top_k=top_k, filters=filters)
+            else:
+                hits = self.qdrant.search(self.collection, vec, top_k=top_k)
         # Normalize hits for replacement when qdrant-client missing
         if not hits:
             return []
         return hits
 
+    def rerank_retrieve(self, query: str, top_k: int = 3, filters: Optional[Dict] = None, vec=None) -> List[Dict]:
+        """Two-stage ``retrieve``: ``reranker.fetch`` candidates scored from quantized vectors
+        (plus BM25 hits when hybrid), re-ranked locally down to ``top_k``."""
+        lexical = None
+        if self.lexical_weight > 0:
+            lexical = _executor().submit(contextvars.copy_context().run, self.lexical_retrieve, query,
+                                         top_k * HYBRID_FETCH_FACTOR, None, filters)
+        if vec is None:
+            with span("embed"):
+                vec = get_embedding(query, as_array=True)
+        with span("search"):
+            dense = self.dense_search(vec, max(self.reranker.fetch, top_k), filters, with_vectors=True, rescore=False)
+        return self.rerank(query, vec, list(dense or []), lexical.result() if lexical else [], top_k)
+
+    def dense_search(self, vec, top_k: int, filters: Optional[Dict] = None, **options) -> List:
+        """``qdrant.search`` in each of ``search_collections`` (concurrently); hits are concatenated."""
+        if filters:
+            options["filters"] = filters
+        results = scatter(lambda name: self.qdrant.search(name, vec, top_k=top_k, **options),
+                          self.search_collections(filters), self.scatter_timeout())
+        return [h for hits in results for h in (hits or [])]
+
+    def fans_out(self) -> bool:
+        """Whether queries may search more than one collection."""
+        return bool(self.partition or self.shard_key or len(self.collections) > 1)
+
+    def scatter_timeout(self) -> Optional[float]:
+        """Per-collection search timeout; None (no limit) when there is only ever one collection."""
+        return self.shard_timeout_ms if self.fans_out() else None
+
+    def merge(self, hits: List, top_k: int) -> List:
+        """Best ``top_k`` of hits from several collections; partition hits get recency/severity boosts."""
+        if self.partition:
+            return boost(hits, top_k, **self.boosts)
+        return sorted(hits, key=hit_score, reverse=True)[:top_k]
+
+    def search_collections(self, filters: Optional[Dict] = None) -> List[str]:
+        """``collections``, narrowed to the shards the filters can match and the partitions
+        their time range overlaps."""
+        names = list(self.collections or [self.collection])
+        if not (self.shard_key or self.partition):
+            return names
+        listed = self._collection_list
+        if listed is None or listed[0] < time.monotonic():
+            listed = self._collection_list = (time.monotonic() + COLLECTION_LIST_TTL, self.qdrant.list_collections())
+        listed = listed[1]
+        if self.shard_key:
+            names = [s for c in names for s in select_shards(listed, c, self.shard_key, filters)]
+        if not self.partition:
+            return [n for n in names if n in listed]
+        since, until = time_range(filters)
+        if since is None:
+            since = time.time() - self.partition_days * 86400
+        return [p for c in names
+                for p in select_partitions(partitions_in(listed, c, self.partition), self.partition, since, until)]
+
+    def rerank(self, query: str, vec, dense: List, lexical: List, top_k: int) -> List[Dict]:
+        """Re-rank the dense candidates plus lexical hits not among them."""
+        seen = {hit_id(h) for h in dense}
+        candidates = dense + [h for h in lexical if hit_id(h) not in seen]
+        with span("rerank"):
+            return self.reranker.rerank(query, vec, candidates, top_k)
+
+    def lexical_retrieve(self, query: str, top_k: int = 3, collection: Optional[str] = None,
+                         filters: Optional[Dict] = None) -> List[Dict]:
+        """BM25 hits for ``query``; empty if the collection has no lexical index."""
+        try:
+            kwargs = {"filters": filters} if filters else {}
+            names = [collection] if collection else self.search_collections(filters)
+            with span("lexical"):
+                results = scatter(lambda name: list(self.qdrant.lexical_search(name, query, top_k=top_k, **kwargs)),
+                                  names, self.scatter_timeout())
+            if len(names) > 1:
+                return sorted((h for hits in results for h in hits), key=hit_score, reverse=True)[:top_k]
+            return results[0] if results else []
+        except Exception as exc:
+            fallback("lexical", exc)
+            return []
+
+    def context_candidates(self) -> int:
+        """Hits to retrieve for one prompt: extra ones when MMR picks among them."""
+        return self.context_hits * (MMR_FETCH_FACTOR if self.mmr_lambda is not None else 1)
+
+    def search_terms(self, query: str, filters: Optional[Dict] = None):
+        """``(search text, filters)`` for ``query``: explicit ``filters``, or ones parsed from the query."""
+        if filters is not None:
+            return query, filters
+        text, parsed = parse_filters(query)
+        return text or query, parsed
+
+    def fuse(self, dense: List, lexical: List, top_k: int) -> List:
+        if not lexical:
+            return list(dense)[:top_k]
+        return reciprocal_rank_fusion([dense, lexical], [self.vector_weight, self.lexical_weight],
+                                      k=self.rrf_k, top_k=top_k)
+
+    def cache_scope(self):
+        """``(collection key, generation)`` that cached answers are tied to."""
+        names = self.collections or [self.collection]
+        generations = self.qdrant.generations(names)
+        if len(names) == 1:
+            return names[0], generations[0]
+        return ",".join(names), tuple(generations)
+
+    def cache_lookup(self, vec, filters: Optional[Dict], text: str = ""):
+        """``(key, answer)``: the cache key for ``vec`` (query ``text``) and the cached answer, or None."""
+        name, generation = self.cache_scope()
+        terms = exact_terms(text)
+        key = (vec, name, filters, generation, terms)
+        with span("cache"):
+            return key, self.answer_cache.get(vec, name, filters, generation, terms)
+
+    def cache_store(self, key, answer: str, started: float):
+        if answer and not answer.startswith(PLACEHOLDER_PREFIX):
+            vec, name, filters, generation, terms = key
+            self.answer_cache.put(vec, answer, name, filters, generation, cost=time.perf_counter() - started,
+                                  terms=terms)
+
     def call_llm(self, prompt: str) -> str:
         if self.llm_endpoint:
             try:
-                resp = requests.post(
-                    f"{self.llm_endpoint.rstrip('/')}/api/generate",
-                    json={"prompt": prompt},
-                    headers={"Authorization": f"Bearer {self.llm_api_key}"} if self.llm_api_key else {},
-                    timeout=10,
-                )
-                resp.raise_for_status()
-                data = resp.json()
+                with span("llm"):
+                    resp = http_client.post(
+                        f"{self.llm_endpoint.rstrip('/')}/api/generate",
+                        {"prompt": prompt},
+                        "generate",
+                        self.llm_api_key,
+                    )
+                    data = resp.json()
                 return data.get("text", "")
-            except Exception:
-                pass
+            except Exception as exc:
+                fallback("llm", exc)
         # fallback
-        return "[LLM placeholder] Based on retrieved context: " + prompt[:200]
-
-    def answer(self, query: str) -> str:
-        hits = self.retrieve(query)
-        context_texts = []
-        for h in hits:
-            # If using qdrant-client models, items are objects with payload and score
-            if isinstance(h, dict):
-                payload = h.get("payload") or h.get("payload", {})
-                context_texts.append(str(payload))
-            else:
-                # Fallback string
-                context_texts.append(str(h))
+        return placeholder_answer(prompt)
+
+    def stream_llm(self, prompt: str, status: Optional[Dict] = None) -> Iterator[str]:
+        """Yield response tokens as the endpoint produces them.
+
+        Sends ``{"stream": true}`` and reads Ollama-style NDJSON chunks, taking
+        ``response`` (or ``text``) from each until ``done``. Falls back to the
+        placeholder if the stream can't be opened or fails before any token.
+        ``status["complete"]`` is set once the endpoint's answer ended normally.
+        """
+        if self.llm_endpoint:
+            started = False
+            try:
+                with span("llm"):
+                    resp = http_client.post(
+                        f"{self.llm_endpoint.rstrip('/')}/api/generate",
+                        {"prompt": prompt, "stream": True},
+                        "generate",
+                        self.llm_api_key,
+                        stream=True,
+                    )
+                    with resp:
+                        for line in resp.iter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            token = chunk_text(chunk)
+                            if token:
+                                started = True
+                                yield token
+                            if chunk.get("done"):
+                                break
+                if status is not None:
+                    status["complete"] = True
+                return
+            except Exception as exc:
+                fallback("llm", exc)
+                if started:
+                    return
+        yield placeholder_answer(prompt)
+
+    def build_prompt(self, query: str, hits) -> str:
+        """Prompt with the deduplicated, budgeted context from ``hits`` (see ``logician.context``)."""
+        with span("context"):
+            context = build_context(hits or [], max_tokens=self.context_tokens, max_hits=self.context_hits,
+                                    mmr_lambda=self.mmr_lambda)
+        return f"User query:\n{query}\n\nRetrieved context:\n" + "\n".join(context)
+
+    def _prompt_for(self, query: str, text: str, filters: Optional[Dict], vec=None) -> str:
+        """Prompt for ``query`` from the hits retrieved for its search ``text``."""
+        kwargs = {"vec": vec} if vec is not None else {}
+        hits = self.retrieve(text, top_k=self.context_candidates(), filters=filters, **kwargs)
+        return self.build_prompt(query, hits)
+
+    def answer(self, query: str, filters: Optional[Dict] = None) -> str:
+        """Answer ``query``; without ``filters``, ones like "in the last hour" are parsed from it."""
+        text, filters = self.search_terms(query, filters)
+        if self.answer_cache is None:
+            return self.call_llm(self._prompt_for(query, text, filters))
+        started = time.perf_counter()
+        with span("embed"):
+            vec = get_embedding(text, as_array=True)
+        key, cached = self.cache_lookup(vec, filters, text)
+        if cached is not None:
+            return cached
+        result = self.call_llm(self._prompt_for(query, text, filters, vec))
+        self.cache_store(key, result, started)
+        return result
+
+    def answer_many(self, queries: List[str], filters: Optional[Dict] = None,
+                    max_concurrency: Optional[int] = None) -> List:
+        """Answer ``queries`` together; answers come back in input order.
+
+        Cached answers are looked up first (one embedding batch). Retrieval for
+        the rest is batched (see ``retrieve_many``) and reuses the lookup's
+        embeddings, then LLM calls run on up to
+        ``max_concurrency`` threads. A query that fails gets its exception in
+        its slot instead of failing the others.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        terms = [self.search_terms(q, filters) for q in queries]
+        answers: List = [None] * len(queries)
+        keys: List = [None] * len(queries)
+        vectors = None
+        started = time.perf_counter()
+        if self.answer_cache is not None:
+            with span("embed"):
+                vectors = get_embeddings([text for text, _ in terms], as_array=True)
+            for i, (vec, (text, f)) in enumerate(zip(vectors, terms)):
+                keys[i], answers[i] = self.cache_lookup(vec, f, text)
+        todo = [i for i, answer in enumerate(answers) if answer is None]
+        if not todo:
+            return answers
+        try:
+            hits = dict(zip(todo, self.retrieve_many([terms[i][0] for i in todo], self.context_candidates(),
+                                                     [terms[i][1] for i in todo],
+                                                     vectors[todo] if vectors is not None else None)))
+        except Exception:
+            hits = {}  # retried per query so one bad query can't sink the batch
+
+        def run(i):
+            found = hits.get(i)
+            if found is None:
+                vec = vectors[i] if vectors is not None else None
+                found = self.retrieve(terms[i][0], self.context_candidates(), terms[i][1], vec)
+            result = self.call_llm(self.build_prompt(queries[i], found))
+            if keys[i] is not None:
+                self.cache_store(keys[i], result, started)
+            return result
+
+        workers = max(1, min(max_concurrency or self.max_concurrency, len(todo)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(run, i) for i in todo}
+        for i, fut in futures.items():
+            try:
+                answers[i] = fut.result()
+            except Exception as exc:
+                answers[i] = exc
+        return answers
 
-        prompt = f"User query:\n{query}\n\nRetrieved context:\n" + "\n---\n".join(context_texts)
-        return self.call_llm(prompt)
+    def stream_answer(self, query: str, filters: Optional[Dict] = None) -> Iterator[str]:
+        """Stream the answer to ``query``; a cached answer comes back as one chunk."""
+        text, filters = self.search_terms(query, filters)
+        if self.answer_cache is None:
+            yield from self.stream_llm(self._prompt_for(query, text, filters))
+            return
+        started = time.perf_counter()
+        with span("embed"):
+            vec = get_embedding(text, as_array=True)
+        key, cached = self.cache_lookup(vec, filters, text)
+        if cached is not None:
+            yield cached
+            return
+        tokens = []
+        status: Dict = {}
+        for token in self.stream_llm(self._prompt_for(query, text, filters, vec), status):
+            tokens.append(token)
+            yield token
+        if status.get("complete"):
+            # A stream cut off midway must not be served later as the whole answer.
+            self.cache_store(key, "".join(tokens), started)
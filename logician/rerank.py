@@ -0,0 +1,172 @@
+"""Second stage of two-stage retrieval: re-rank over-fetched candidates on the CPU.
+
+The first stage fetches ``fetch`` candidates cheaply (quantized scores, no
+server-side rescoring) with their stored vectors. ``Reranker`` then scores all
+of them at once as a weighted sum of features:
+
+* ``dense``: exact float32 cosine between the query and candidate vectors;
+* ``lexical``: fraction of the query's tokens (``bm25.tokenize``) in the text;
+* ``recency``: ``0.5 ** (age / half_life)`` from the ``timestamp`` payload;
+* ``severity``: ``LEVEL_WEIGHTS`` of the ``level`` payload.
+
+Features after the dense one are skipped once ``budget_ms`` is spent, so a
+slow batch degrades to cosine order instead of delaying the answer.
+"""
+from typing import Dict, List, Optional, Sequence
+import os
+import time
+import numpy as np
+from .bm25 import tokenize
+from .metrics import fallback
+
+
+DEFAULT_FETCH = 100
+DEFAULT_BUDGET_MS = 20.0
+DEFAULT_LEXICAL_WEIGHT = 0.3
+DEFAULT_RECENCY_WEIGHT = 0.1
+DEFAULT_SEVERITY_WEIGHT = 0.1
+DEFAULT_HALF_LIFE = 86400.0
+
+LEVEL_WEIGHTS = {
+    "FATAL": 1.0, "CRITICAL": 1.0, "ERROR": 0.8, "WARN": 0.5,
+    "NOTICE": 0.3, "INFO": 0.2, "DEBUG": 0.1, "TRACE": 0.0,
+}
+
+
+def _field(hit, name: str):
+    return hit.get(name) if isinstance(hit, dict) else getattr(hit, name, None)
+
+
+def _payload(hit) -> Dict:
+    payload = _field(hit, "payload")
+    return payload if isinstance(payload, dict) else {}
+
+
+def cosine_scores(query, vectors: Sequence) -> np.ndarray:
+    """Cosine of ``query`` with each candidate vector; NaN where a candidate has none."""
+    q = np.asarray(query, dtype=np.float32).ravel()
+    q = q / (np.linalg.norm(q) or 1.0)
+    scores = np.full(len(vectors), np.nan, dtype=np.float32)
+    present = [i for i, v in enumerate(vectors) if v is not None and len(v) == len(q)]
+    if present:
+        matrix = np.asarray([vectors[i] for i in present], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        scores[present] = (matrix @ q) / norms
+    return scores
+
+
+def lexical_overlap(query: str, texts: Sequence[str]) -> np.ndarray:
+    """Share of the distinct query tokens that occur in each text."""
+    terms = set(tokenize(query))
+    if not terms:
+        return np.zeros(len(texts), dtype=np.float32)
+    return np.array([len(terms.intersection(tokenize(t))) for t in texts], dtype=np.float32) / len(terms)
+
+
+def recency_scores(timestamps: np.ndarray, now: float, half_life: float) -> np.ndarray:
+    """``0.5 ** (age / half_life)``, 1.0 for future timestamps and 0 where unknown (NaN)."""
+    age = np.maximum(now - np.asarray(timestamps, dtype=np.float64), 0.0)
+    return np.nan_to_num(np.exp2(-age / half_life), nan=0.0).astype(np.float32)
+
+
+def severity_scores(levels: Sequence[Optional[str]]) -> np.ndarray:
+    return np.array([LEVEL_WEIGHTS.get(str(level).upper(), 0.0) if level else 0.0 for level in levels],
+                    dtype=np.float32)
+
+
+def boost(hits: Sequence, top_k: int, recency: float = DEFAULT_RECENCY_WEIGHT,
+          severity: float = DEFAULT_SEVERITY_WEIGHT, half_life: float = DEFAULT_HALF_LIFE,
+          now: Optional[float] = None) -> List[Dict]:
+    """Best ``top_k`` of ``hits`` by their own score plus recency and severity boosts.
+
+    The single-stage counterpart of ``Reranker``, for merging hits searched
+    separately (e.g. per time partition); returns ``{"id", "score", "payload"}`` dicts.
+    """
+    if not hits:
+        return []
+    payloads = [_payload(h) for h in hits]
+    scores = np.array([float(_field(h, "score") or 0.0) for h in hits], dtype=np.float32)
+    if severity:
+        scores += severity * severity_scores([p.get("level") for p in payloads])
+    if recency:
+        scores += recency * recency_scores(np.array([_timestamp(p) for p in payloads]),
+                                           time.time() if now is None else now, half_life)
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [{"id": _field(hits[i], "id"), "score": float(scores[i]), "payload": payloads[i]} for i in order]
+
+
+class Reranker:
+    """Weighted-feature re-ranker; ``fetch`` is how many first-stage candidates to score."""
+
+    def __init__(self, fetch: int = DEFAULT_FETCH, budget_ms: float = DEFAULT_BUDGET_MS,
+                 lexical: float = DEFAULT_LEXICAL_WEIGHT, recency: float = DEFAULT_RECENCY_WEIGHT,
+                 severity: float = DEFAULT_SEVERITY_WEIGHT, half_life: float = DEFAULT_HALF_LIFE):
+        self.fetch = fetch
+        self.budget_ms = budget_ms
+        self.weights = {"lexical": lexical, "recency": recency, "severity": severity}
+        self.half_life = half_life
+
+    def rerank(self, query: str, query_vector, candidates: Sequence, top_k: int,
+               now: Optional[float] = None) -> List[Dict]:
+        """The best ``top_k`` of ``candidates`` as ``{"id", "score", "payload"}`` dicts, best first.
+
+        Candidates without a vector (e.g. lexical-only hits) get the lowest
+        cosine of the others, so the remaining features decide their place.
+        """
+        if not candidates:
+            return []
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        payloads = [_payload(c) for c in candidates]
+        scores = cosine_scores(query_vector, [_field(c, "vector") for c in candidates])
+        if np.isnan(scores).all():
+            # No vectors came back: keep the first-stage score as the dense feature.
+            scores = np.array([float(_field(c, "score") or 0.0) for c in candidates], dtype=np.float32)
+        else:
+            scores = np.nan_to_num(scores, nan=float(np.nanmin(scores)))
+        features = (
+            ("severity", lambda: severity_scores([p.get("level") for p in payloads])),
+            ("recency", lambda: recency_scores(
+                np.array([_timestamp(p) for p in payloads]), time.time() if now is None else now, self.half_life)),
+            ("lexical", lambda: lexical_overlap(query, [str(p.get("text") or p.get("template") or "")
+                                                        for p in payloads])),
+        )
+        for name, compute in features:
+            weight = self.weights[name]
+            if not weight:
+                continue
+            if time.perf_counter() > deadline:
+                fallback("rerank", f"budget of {self.budget_ms:g} ms spent before {name}")
+                break
+            scores = scores + weight * compute()
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [{"id": _field(candidates[i], "id"), "score": float(scores[i]), "payload": payloads[i]}
+                for i in order]
+
+
+def _timestamp(payload: Dict) -> float:
+    ts = payload.get("timestamp", payload.get("last_seen"))
+    try:
+        return float(ts)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def boost_weights() -> Dict[str, float]:
+    """``recency``/``severity``/``half_life`` from ``RAG_RECENCY_WEIGHT``, ``RAG_SEVERITY_WEIGHT``
+    and ``RAG_RECENCY_HALF_LIFE``; shared by ``Reranker`` and ``boost``."""
+    return {"recency": float(os.getenv("RAG_RECENCY_WEIGHT", DEFAULT_RECENCY_WEIGHT)),
+            "severity": float(os.getenv("RAG_SEVERITY_WEIGHT", DEFAULT_SEVERITY_WEIGHT)),
+            "half_life": float(os.getenv("RAG_RECENCY_HALF_LIFE", DEFAULT_HALF_LIFE))}
+
+
+def from_env() -> Optional[Reranker]:
+    """Re-ranker configured by ``RAG_RERANK_FETCH`` (0 disables), ``RAG_RERANK_BUDGET_MS``,
+    ``RAG_RERANK_LEXICAL`` and the ``boost_weights``."""
+    fetch = int(os.getenv("RAG_RERANK_FETCH", "0") or 0)
+    if fetch <= 0:
+        return None
+    return Reranker(fetch=fetch,
+                    budget_ms=float(os.getenv("RAG_RERANK_BUDGET_MS", DEFAULT_BUDGET_MS)),
+                    lexical=float(os.getenv("RAG_RERANK_LEXICAL", DEFAULT_LEXICAL_WEIGHT)),
+                    **boost_weights())
@@ -0,0 +1,237 @@
+"""Long-running ``logician serve`` daemon.
+
+One process keeps a ``RagOrchestrator`` warm (HTTP pools, embedding and answer
+caches, loaded indexes, qdrant-client imported once) and answers JSON requests
+over TCP or a Unix socket, so each query costs a round trip instead of
+interpreter startup. ``logician --server ADDRESS`` is the matching thin client
+(see ``logician.client``).
+
+Endpoints::
+
+    POST /answer       {"query", "filters"? | "service"/"host"/"level"/"since"?, "stream"?, "trace"?}
+    POST /answer_many  {"queries", ...same filter options}
+    GET  /health       GET /stats       GET /metrics (Prometheus text)
+
+At most ``max_concurrency`` requests run at once; others wait up to
+``queue_timeout`` seconds and then get ``503``. A batch counts once per query
+answered concurrently, using only the slots free when it starts.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+import contextlib
+import json
+import logging
+import os
+import socketserver
+import threading
+from . import metrics
+from .filters import option_filters
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_QUEUE_TIMEOUT = 30.0
+MAX_BODY_BYTES = 1 << 20
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LogicianServer:
+    """Request handling around one shared orchestrator."""
+
+    def __init__(self, orchestrator=None, max_concurrency: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        if orchestrator is None:
+            from .rag import RagOrchestrator
+            orchestrator = RagOrchestrator()
+        self.orchestrator = orchestrator
+        self.max_concurrency = max_concurrency or int(os.getenv("LOGICIAN_SERVE_CONCURRENCY",
+                                                                DEFAULT_MAX_CONCURRENCY))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(
+            os.getenv("LOGICIAN_SERVE_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._httpd = None
+
+    def warm(self):
+        """Pay first-use costs (embedder, HTTP pool, index load) before the first request."""
+        try:
+            self.orchestrator.retrieve("warmup", top_k=1)
+        except Exception as exc:
+            logger.warning("warmup failed: %s", exc)
+
+    @contextlib.contextmanager
+    def slot(self, wanted: int = 1):
+        """Waits for one slot, then takes up to ``wanted`` in total from those free; yields how many it holds."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise RequestError(503, "server busy")
+        held = 1
+        while held < wanted and self._slots.acquire(blocking=False):
+            held += 1
+        try:
+            yield held
+        finally:
+            for _ in range(held):
+                self._slots.release()
+
+    def stats(self) -> Dict:
+        cache = getattr(self.orchestrator, "answer_cache", None)
+        return {
+            "collection": self.orchestrator.collection,
+            "max_concurrency": self.max_concurrency,
+            "answer_cache": cache.stats() if cache is not None else None,
+        }
+
+    def answer(self, body: Dict) -> Dict:
+        query = body.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise RequestError(400, "missing query")
+        filters = request_filters(body)
+        with self.slot(), (metrics.trace() if body.get("trace") else contextlib.nullcontext()) as trace:
+            result = {"answer": self.orchestrator.answer(query, filters=filters)}
+        if trace is not None:
+            result["trace"] = trace.format()
+        return result
+
+    def answer_many(self, body: Dict) -> Dict:
+        queries = body.get("queries")
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            raise RequestError(400, "queries must be a list of strings")
+        filters = request_filters(body)
+        # Each concurrent LLM call holds a slot, so a batch can't exceed max_concurrency on its own.
+        with self.slot(len(queries)) as held:
+            answers = self.orchestrator.answer_many(queries, filters=filters, max_concurrency=held)
+        return {"answers": [a if isinstance(a, str) else {"error": repr(a)} for a in answers]}
+
+    def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+        """Serve until interrupted; ``socket_path`` listens on a Unix socket instead of TCP."""
+        self._httpd = self.make_server(host, port, socket_path)
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def make_server(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            return _UnixHTTPServer(socket_path, _handler(self, tcp=False))
+        return ThreadingHTTPServer((host, port), _handler(self, tcp=True))
+
+    def shutdown(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+
+
+def request_filters(body: Dict) -> Optional[Dict]:
+    """Explicit ``filters`` from a request, else ones built from its CLI-style options."""
+    if isinstance(body.get("filters"), dict):
+        return body["filters"]
+    try:
+        return option_filters(body.get("service"), body.get("host"), body.get("level"), body.get("since"))
+    except ValueError as exc:
+        raise RequestError(400, str(exc))
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _handler(server: LogicianServer, tcp: bool):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; avoid Nagle/delayed-ACK stalls (TCP only).
+        disable_nagle_algorithm = tcp
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.reply(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self.reply(200, server.stats())
+            elif self.path == "/metrics":
+                self.send_body(200, metrics.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self.reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                body = self.read_json()
+                if self.path == "/answer" and body.get("stream"):
+                    self.stream_answer(body)
+                elif self.path == "/answer":
+                    self.reply(200, server.answer(body))
+                elif self.path == "/answer_many":
+                    self.reply(200, server.answer_many(body))
+                else:
+                    self.reply(404, {"error": "not found"})
+            except RequestError as exc:
+                self.reply(exc.status, {"error": str(exc)})
+            except Exception as exc:
+                logger.exception("request failed")
+                self.reply(500, {"error": repr(exc)})
+
+        def read_json(self) -> Dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                raise RequestError(413, "request too large")
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                raise RequestError(400, "invalid JSON")
+            if not isinstance(body, dict):
+                raise RequestError(400, "expected a JSON object")
+            return body
+
+        def stream_answer(self, body: Dict):
+            query = body.get("query")
+            if not isinstance(query, str) or not query.strip():
+                raise RequestError(400, "missing query")
+            filters = request_filters(body)
+            with server.slot(), (metrics.trace() if body.get("trace") else contextlib.nullcontext()) as trace:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for token in server.orchestrator.stream_answer(query, filters=filters):
+                        self.write_line({"token": token})
+                except Exception as exc:
+                    # Headers are already sent; report the failure in-band.
+                    logger.exception("stream failed")
+                    self.write_line({"error": repr(exc)})
+            done = {"done": True}
+            if trace is not None:
+                done["trace"] = trace.format()
+            self.write_line(done)
+
+        def write_line(self, data: Dict):
+            self.wfile.write(json.dumps(data).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+        def reply(self, status: int, data: Dict):
+            self.send_body(status, json.dumps(data).encode("utf-8"), "application/json")
+
+        def send_body(self, status: int, raw: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def address_string(self):
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, fmt, *args):
+            logger.debug("%s " + fmt, self.address_string(), *args)
+
+    return Handler
@@ -0,0 +1,117 @@
+"""Collections sharded by a payload key.
+
+With a shard key (``RAG_SHARD_KEY``, e.g. ``service``) ingest writes each line
+to ``<collection>__<key>-<value>`` and lines without the key to the collection
+itself, so upserts and searches for one service touch one small collection.
+A query whose filters pin the key only searches those shards; any other query
+fans out over all of them concurrently (``scatter``), each shard bounded by a
+timeout from when its search starts, so a slow one drops out of the merged
+top-k instead of delaying it.
+Shards combine with time partitions: ``<collection>__service-api__20240101``.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence
+import contextvars
+import re
+import time
+from .metrics import fallback
+from .partitions import SEPARATOR
+
+
+DEFAULT_TIMEOUT_MS = 500.0
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9.-]+")
+
+
+def _prefix(collection: str, key: str) -> str:
+    return f"{collection}{SEPARATOR}{key}-"
+
+
+def shard_name(collection: str, key: str, value) -> str:
+    return _prefix(collection, key) + (_UNSAFE.sub("-", str(value)).strip("-") or "none")
+
+
+def shard_of(collection: str, key: str, name: str) -> Optional[str]:
+    """The shard of ``collection`` that ``name`` (a shard or one of its partitions) belongs to, if any."""
+    prefix = _prefix(collection, key)
+    if not name.startswith(prefix):
+        return None
+    return prefix + name[len(prefix):].split(SEPARATOR)[0]
+
+
+def select_shards(names: Sequence[str], collection: str, key: str, filters: Optional[Dict] = None) -> List[str]:
+    """Shards of ``collection`` among ``names`` that can hold hits for ``filters``.
+
+    The collection itself (lines without ``key``) comes first unless the
+    filters pin ``key`` to one or more values.
+    """
+    shards = sorted({s for s in (shard_of(collection, key, n) for n in names) if s})
+    condition = (filters or {}).get(key)
+    if condition is None or isinstance(condition, dict):
+        return [collection] + shards
+    values = condition if isinstance(condition, (list, tuple)) else [condition]
+    wanted = {shard_name(collection, key, v) for v in values}
+    return [s for s in shards if s in wanted]
+
+
+def route_by_key(collection: str, key: str, payloads: Sequence[Dict]) -> Dict[str, List[int]]:
+    """Indices of ``payloads`` grouped by shard; payloads without ``key`` go to ``collection``."""
+    groups: Dict[str, List[int]] = {}
+    for i, payload in enumerate(payloads):
+        value = payload.get(key)
+        name = collection if value is None or value == "" else shard_name(collection, key, value)
+        groups.setdefault(name, []).append(i)
+    return groups
+
+
+def scatter(fn: Callable[[str], object], names: Sequence[str],
+            timeout_ms: Optional[float] = DEFAULT_TIMEOUT_MS) -> List:
+    """``fn(name)`` for every name concurrently, in order, without the ones that failed or timed out.
+
+    Each query gets its own threads, one per name, and each call gets
+    ``timeout_ms`` from when it starts running, so concurrent queries don't
+    queue behind each other's shards. Calls that miss it are counted as
+    ``shard`` fallbacks and left out, as are ones that raise unless a lone
+    name was asked for, whose error is raised. With ``timeout_ms`` None a
+    lone name is called directly.
+    """
+    if timeout_ms is None and len(names) == 1:
+        return [fn(names[0])]
+    limit = None if timeout_ms is None else timeout_ms / 1000.0
+    started: Dict[int, float] = {}
+
+    def run(i: int, name: str):
+        started[i] = time.monotonic()
+        return fn(name)
+
+    pool = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="logician-shard")
+    try:
+        futures = [pool.submit(contextvars.copy_context().run, run, i, name) for i, name in enumerate(names)]
+        pending, late = set(futures), set()
+        while pending:
+            timeout = None
+            if limit is not None:
+                now = time.monotonic()
+                running = {futures[i]: begun + limit - now for i, begun in list(started.items())
+                           if futures[i] in pending}
+                expired = {f for f, left in running.items() if left <= 0}
+                late |= expired
+                pending -= expired
+                if not pending:
+                    break
+                timeout = min([left for left in running.values() if left > 0], default=limit)
+            _, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    results = []
+    for name, future in zip(names, futures):
+        if future in late:
+            future.cancel()
+            fallback("shard", f"{name}: no answer within {timeout_ms:g} ms")
+        elif future.exception() is not None:
+            if len(names) == 1:
+                raise future.exception()
+            fallback("shard", f"{name}: {future.exception()}")
+        else:
+            results.append(future.result())
+    return results
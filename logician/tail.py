@@ -0,0 +1,338 @@
+"""Follow mode for ingestion: keep a collection current with live log files.
+
+``Follower`` tails files like ``tail -F``: it reads only complete new lines,
+notices rotation (the path now names a different inode; the old file is read
+to its end first) and truncation (the file shrank below the read offset), and
+upserts lines in micro-batches once ``batch_size`` lines are pending or the
+oldest pending line is ``flush_interval`` seconds old.
+
+Flushed points are searchable at once but only written to disk (local index
+and BM25 files, ``QdrantWrapper.flush``) every ``persist_interval`` seconds
+and on exit, since that rewrites whole files. Right after each persist the
+byte offset of each file is written to a JSON checkpoint, so a restarted
+follower resumes where the last persist ended instead of re-embedding. Point
+ids are derived from the file, its rotation generation and the line number,
+so lines replayed after a crash overwrite their own points; generation 0 uses ``ingest.point_id`` and so matches a
+batch ingest of the same file. The collection is only created if missing.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from .embedder import get_embeddings
+from .ingest import DEFAULT_BATCH_SIZE, IngestStats, line_payload, point_id, upsert_points
+from .qdrant_wrapper import QdrantWrapper
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = "logician-tail.json"
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_PERSIST_INTERVAL = 30.0
+DEFAULT_POLL_INTERVAL = 0.25
+# Globs are re-expanded this often (in seconds) to pick up new files.
+RESCAN_INTERVAL = 5.0
+
+_ROTATED_NAME = re.compile(r"\.\d+$")
+
+PendingLine = Tuple[str, str, int, str]
+
+
+def tail_point_id(source: str, generation: int, lineno: int) -> str:
+    """Deterministic id of line ``lineno`` in rotation ``generation`` of ``source``."""
+    if generation == 0:
+        return point_id(source, lineno)
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{os.path.abspath(source)}#{generation}:{lineno}"))
+
+
+class Checkpoints:
+    """Per-file read positions, persisted as JSON with an atomic rename."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    self.files = json.load(fh).get("files", {})
+            except (OSError, ValueError) as exc:
+                logger.warning("ignoring unreadable checkpoint %s: %s", path, exc)
+
+    def get(self, source: str) -> Optional[Dict]:
+        return self.files.get(os.path.abspath(source))
+
+    def set(self, source: str, state: Dict):
+        self.files[os.path.abspath(source)] = state
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"files": self.files}, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+
+class TailedFile:
+    """Read position in one followed path: the open file, its offset and line count."""
+
+    def __init__(self, path: str, state: Optional[Dict] = None):
+        self.path = path
+        state = state or {}
+        self.dev = state.get("dev")
+        self.ino = state.get("ino")
+        self.offset = state.get("offset", 0)
+        self.line = state.get("line", 0)
+        self.generation = state.get("generation", 0)
+        self.fh = None
+
+    def state(self) -> Dict:
+        return {"dev": self.dev, "ino": self.ino, "offset": self.offset,
+                "line": self.line, "generation": self.generation}
+
+    def open(self, path: Optional[str] = None) -> bool:
+        """Open ``path`` (default the followed path) at the current offset; False if it is missing."""
+        try:
+            fh = open(path or self.path, "rb")
+        except OSError:
+            return False
+        st = os.fstat(fh.fileno())
+        self.dev, self.ino = st.st_dev, st.st_ino
+        fh.seek(self.offset)
+        self.fh = fh
+        return True
+
+    def restart(self):
+        """Start the next generation from the top (after rotation or truncation)."""
+        self.close()
+        self.generation += 1
+        self.offset = 0
+        self.line = 0
+
+    def read_lines(self, limit: int) -> List[PendingLine]:
+        """Up to ``limit`` complete new lines; a partial last line waits for its newline."""
+        lines: List[PendingLine] = []
+        if self.fh is None:
+            return lines
+        while len(lines) < limit:
+            raw = self.fh.readline()
+            if not raw.endswith(b"\n"):
+                self.fh.seek(self.offset)
+                break
+            self.offset += len(raw)
+            self.line += 1
+            text = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if text.strip():
+                lines.append((tail_point_id(self.path, self.generation, self.line), self.path, self.line, text))
+        return lines
+
+    def changed(self) -> Optional[str]:
+        """``"rotated"`` or ``"truncated"`` if the path no longer matches the open file."""
+        if self.fh is None:
+            return None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # Moved away and not yet recreated: keep reading the old file.
+            return None
+        if (st.st_dev, st.st_ino) != (self.dev, self.ino):
+            return "rotated"
+        if st.st_size < self.offset:
+            return "truncated"
+        return None
+
+    def rotated_copy(self) -> Optional[str]:
+        """The rotated sibling (``path.1`` ...) that is still the checkpointed file, if any."""
+        for candidate in glob.glob(glob.escape(self.path) + ".*"):
+            if not _ROTATED_NAME.fullmatch(candidate[len(self.path):]):
+                continue
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) == (self.dev, self.ino) and st.st_size >= self.offset:
+                return candidate
+        return None
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+
+class Follower:
+    """Tail ``paths`` (globs allowed) into ``collection`` with micro-batched upserts.
+
+    Collections created along the way are stored with ``quantization``.
+    """
+
+    def __init__(self, paths: Iterable[str], collection: str = "log_entries",
+                 qdrant: Optional[QdrantWrapper] = None, checkpoint: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 on_flush: Optional[Callable[[IngestStats], None]] = None, partition: Optional[str] = None,
+                 shard_key: Optional[str] = None, persist_interval: float = DEFAULT_PERSIST_INTERVAL,
+                 quantization: Optional[str] = None):
+        self.patterns = list(paths)
+        self.collection = collection
+        self.partition = partition
+        self.shard_key = shard_key
+        self.quantization = quantization
+        self.qdrant = qdrant or QdrantWrapper()
+        self.checkpoints = Checkpoints(checkpoint)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.persist_interval = persist_interval
+        self.on_flush = on_flush
+        self.stats = IngestStats()
+        self.files: Dict[str, TailedFile] = {}
+        self.pending: List[PendingLine] = []
+        self._pending_since: Optional[float] = None
+        self._persisted = time.monotonic()
+        # Read positions moved (lines upserted or a file restarted) since the last persist.
+        self._unsaved = False
+        self._scanned = 0.0
+        self._ensured = False
+
+    def scan(self):
+        """Start following paths matching the globs; rotated siblings are not followed."""
+        for pattern in self.patterns:
+            for path in sorted(glob.glob(pattern)) or [pattern]:
+                if path in self.files or path.endswith(".gz") or _ROTATED_NAME.search(path):
+                    continue
+                self.files[path] = TailedFile(path, self.checkpoints.get(path))
+                self._open(self.files[path])
+        self._scanned = time.monotonic()
+
+    def _open(self, f: TailedFile) -> bool:
+        """Open ``f`` where its checkpoint left off, catching up on a rotation or truncation missed meanwhile."""
+        if f.ino is None:
+            return f.open()
+        try:
+            st = os.stat(f.path)
+        except OSError:
+            return False
+        if (st.st_dev, st.st_ino) == (f.dev, f.ino) and st.st_size >= f.offset:
+            return f.open()
+        if (st.st_dev, st.st_ino) == (f.dev, f.ino):
+            logger.info("%s was truncated while stopped", f.path)
+        else:
+            # Rotated while stopped: finish the checkpointed file under its new name first.
+            rotated = f.rotated_copy()
+            if rotated is None:
+                logger.warning("%s was rotated while stopped and the old file is gone; "
+                               "lines after offset %d were not ingested", f.path, f.offset)
+            elif f.open(rotated):
+                self._drain(f)
+        self.flush()
+        f.restart()
+        self._unsaved = True
+        return f.open()
+
+    def poll(self) -> int:
+        """Read what is new in every file, flushing on the size/time triggers; returns lines read."""
+        if time.monotonic() - self._scanned >= RESCAN_INTERVAL:
+            self.scan()
+        read = 0
+        for f in self.files.values():
+            if f.fh is None and not self._open(f):
+                continue
+            read += self._drain(f)
+            change = f.changed()
+            if change:
+                logger.info("%s was %s", f.path, change)
+                if change == "rotated":
+                    read += self._drain(f)
+                self.flush()
+                f.restart()
+                self._unsaved = True
+                f.open()
+                read += self._drain(f)
+        if self.pending and time.monotonic() - self._pending_since >= self.flush_interval:
+            self.flush()
+        elif self._unsaved and time.monotonic() - self._persisted >= self.persist_interval:
+            self.flush(persist=True)
+        return read
+
+    def _drain(self, f: TailedFile) -> int:
+        read = 0
+        while True:
+            lines = f.read_lines(self.batch_size - len(self.pending))
+            if not lines:
+                return read
+            if not self.pending:
+                self._pending_since = time.monotonic()
+            self.pending.extend(lines)
+            read += len(lines)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self, persist: bool = False):
+        """Upsert pending lines; persist and checkpoint if ``persist`` or ``persist_interval`` has passed."""
+        if self.pending:
+            batch, self.pending = self.pending, []
+            vectors = get_embeddings([text for _, _, _, text in batch], as_array=True)
+            if not self._ensured and not (self.partition or self.shard_key):
+                self.qdrant.ensure_collection(self.collection, vector_size=len(vectors[0]),
+                                              quantization=self.quantization)
+                self._ensured = True
+            upsert_points(self.qdrant, self.collection, [pid for pid, _, _, _ in batch], vectors,
+                          [line_payload(source, lineno, text) for _, source, lineno, text in batch],
+                          self.partition, self.shard_key, self.quantization)
+            self.qdrant.invalidate(self.collection)
+            self._unsaved = True
+            self.stats.lines += len(batch)
+            self.stats.batches += 1
+            if self.on_flush:
+                self.on_flush(self.stats)
+        if persist or time.monotonic() - self._persisted >= self.persist_interval:
+            self.qdrant.flush()
+            self._checkpoint()
+            self._persisted = time.monotonic()
+            self._unsaved = False
+
+    def _checkpoint(self):
+        # Only called right after persisting with nothing pending, so every read position is on disk.
+        for f in self.files.values():
+            if f.ino is not None:
+                self.checkpoints.set(f.path, f.state())
+        self.checkpoints.save()
+
+    def run(self, stop: Optional[threading.Event] = None,
+            poll_interval: float = DEFAULT_POLL_INTERVAL) -> IngestStats:
+        """Follow until ``stop`` is set (or KeyboardInterrupt), then poll once more and flush."""
+        stop = stop or threading.Event()
+        self.scan()
+        try:
+            while True:
+                read = self.poll()
+                if stop.is_set():
+                    break
+                if not read:
+                    stop.wait(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.flush(persist=True)
+            self.close()
+            self.stats.elapsed = time.perf_counter() - self.stats.started
+        return self.stats
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def follow_files(paths: Iterable[str], collection: str = "log_entries", qdrant: Optional[QdrantWrapper] = None,
+                 checkpoint: Optional[str] = None, stop: Optional[threading.Event] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, **kwargs) -> IngestStats:
+    """Tail ``paths`` into ``collection`` until ``stop``; see ``Follower`` for the other arguments."""
+    checkpoint = checkpoint or os.getenv("LOGICIAN_TAIL_CHECKPOINT", DEFAULT_CHECKPOINT)
+    follower = Follower(paths, collection=collection, qdrant=qdrant, checkpoint=checkpoint, **kwargs)
+    return follower.run(stop, poll_interval=poll_interval)
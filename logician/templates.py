@@ -0,0 +1,173 @@
+"""Drain-style log template mining.
+
+Variable tokens (timestamps, ids, IPs, numbers) are masked and lines are routed
+through a fixed-depth parse tree (token count, then leading tokens) to a small
+set of candidate clusters. A line joins the most similar cluster, turning the
+positions that differ into ``<*>``, or starts a new one. Ingest can then embed
+each template once instead of every line.
+
+A template's payload carries its most common ``level``, ``service`` and
+``host`` (so payload filters apply to templates as to lines), with per-value
+counts that ``merge_payloads`` adds up when a later ingest meets the same
+template again.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import re
+import uuid
+
+
+WILDCARD = "<*>"
+DEFAULT_MAX_SAMPLES = 3
+# Line payload fields (see ``ingest.line_payload``) summarised per template.
+TEMPLATE_FIELDS = ("level", "service", "host")
+
+DEFAULT_MASKS: List[Tuple[str, str]] = [
+    (r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?", WILDCARD),
+    (r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b", WILDCARD),
+    (r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b", WILDCARD),
+    (r"\b0x[0-9a-fA-F]+\b", WILDCARD),
+    (r"\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b", WILDCARD),
+    (r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?:[a-zA-Z%]{1,3})?(?![\w.])", WILDCARD),
+]
+
+
+class LogCluster:
+    """One template with its occurrence count, time range and sample line references."""
+
+    __slots__ = ("cluster_id", "tokens", "count", "first_seen", "last_seen", "samples", "fields")
+
+    def __init__(self, cluster_id: str, tokens: List[str]):
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+        self.count = 0
+        self.first_seen: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.samples: List[Dict] = []
+        self.fields: Dict[str, Counter] = {}
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+    def payload(self) -> Dict:
+        payload = {
+            "text": self.template,
+            "template": self.template,
+            "count": self.count,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "samples": list(self.samples),
+            "field_counts": {field: dict(counts) for field, counts in self.fields.items()},
+        }
+        return _summarise(payload)
+
+
+def _summarise(payload: Dict) -> Dict:
+    for field, counts in payload["field_counts"].items():
+        if counts:
+            payload[field] = max(counts, key=counts.get)
+    if payload.get("last_seen") is not None:
+        # Most recent occurrence, so time-range filters find templates still being logged.
+        payload["timestamp"] = payload["last_seen"]
+    return payload
+
+
+def merge_payloads(old: Dict, new: Dict, max_samples: int = DEFAULT_MAX_SAMPLES) -> Dict:
+    """``new`` template payload combined with the ``old`` one stored for the same template.
+
+    Counts and per-field value counts add up, the time range widens and old
+    samples come first.
+    """
+    merged = dict(new, count=old.get("count", 0) + new["count"])
+    for key, pick in (("first_seen", min), ("last_seen", max)):
+        seen = [v for v in (old.get(key), new.get(key)) if v is not None]
+        merged[key] = pick(seen) if seen else None
+    samples = list(old.get("samples") or [])
+    merged["samples"] = (samples + [s for s in new["samples"] if s not in samples])[:max_samples]
+    field_counts = {field: Counter(counts) for field, counts in (old.get("field_counts") or {}).items()}
+    for field, counts in new["field_counts"].items():
+        field_counts.setdefault(field, Counter()).update(counts)
+    merged["field_counts"] = {field: dict(counts) for field, counts in field_counts.items()}
+    return _summarise(merged)
+
+
+class TemplateMiner:
+    """Incremental Drain parse tree.
+
+    ``depth`` leading tokens route a line to a leaf; ``sim_threshold`` is the
+    fraction of matching tokens needed to join a cluster there. Nodes holding
+    ``max_children`` children route further tokens through ``<*>``.
+    """
+
+    def __init__(self, depth: int = 2, sim_threshold: float = 0.5, max_children: int = 100,
+                 max_samples: int = DEFAULT_MAX_SAMPLES, masks: Optional[List[Tuple[str, str]]] = None):
+        self.depth = depth
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.max_samples = max_samples
+        self._masks = [(re.compile(p), r) for p, r in (masks if masks is not None else DEFAULT_MASKS)]
+        self._root: Dict[int, Dict] = {}
+        self.clusters: List[LogCluster] = []
+        self.lines = 0
+
+    def mask(self, line: str) -> str:
+        for pattern, repl in self._masks:
+            line = pattern.sub(repl, line)
+        return line
+
+    def add(self, line: str, source: Optional[str] = None, lineno: Optional[int] = None,
+            timestamp: Optional[float] = None, fields: Optional[Dict[str, str]] = None) -> LogCluster:
+        """Add ``line`` to its cluster; ``fields`` are its ``TEMPLATE_FIELDS`` values (see ``ingest.line_payload``)."""
+        tokens = self.mask(line).split()
+        leaf = self._leaf(tokens)
+        cluster = self._best_match(leaf, tokens)
+        if cluster is None:
+            cluster_id = str(uuid.uuid5(uuid.NAMESPACE_URL, "template:" + " ".join(tokens)))
+            cluster = LogCluster(cluster_id, tokens)
+            leaf.append(cluster)
+            self.clusters.append(cluster)
+        else:
+            cluster.tokens = [a if a == b else WILDCARD for a, b in zip(cluster.tokens, tokens)]
+        self.lines += 1
+        cluster.count += 1
+        if timestamp is not None:
+            if cluster.first_seen is None or timestamp < cluster.first_seen:
+                cluster.first_seen = timestamp
+            if cluster.last_seen is None or timestamp > cluster.last_seen:
+                cluster.last_seen = timestamp
+        for field, value in (fields or {}).items():
+            cluster.fields.setdefault(field, Counter())[value] += 1
+        if source is not None and len(cluster.samples) < self.max_samples:
+            cluster.samples.append({"source": source, "line": lineno})
+        return cluster
+
+    def _leaf(self, tokens: List[str]) -> List[LogCluster]:
+        node = self._root.setdefault(len(tokens), {})
+        prefix = tokens[:self.depth]
+        for i, token in enumerate(prefix):
+            if any(ch.isdigit() for ch in token):
+                token = WILDCARD
+            if token not in node and len(node) >= self.max_children:
+                token = WILDCARD
+            last = i == len(prefix) - 1
+            node = node.setdefault(token, [] if last else {})
+        if isinstance(node, dict):
+            # Lines shorter than depth (including empty) stop at an inner node.
+            node = node.setdefault(None, [])
+        return node
+
+    def _best_match(self, leaf: List[LogCluster], tokens: List[str]) -> Optional[LogCluster]:
+        best, best_key = None, None
+        for cluster in leaf:
+            same = wildcards = 0
+            for a, b in zip(cluster.tokens, tokens):
+                if a == WILDCARD:
+                    wildcards += 1
+                elif a == b:
+                    same += 1
+            sim = same / len(tokens) if tokens else 1.0
+            key = (sim, wildcards)
+            if sim >= self.sim_threshold and (best_key is None or key > best_key):
+                best, best_key = cluster, key
+        return best
@@ -1,6 +1,62 @@
 """Utility helpers for logician."""
+from datetime import datetime, timezone
+from typing import Dict, Optional
 import logging
+import re
+
+
+_TIMESTAMP = re.compile(
+    r"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(\.\d+)?(Z|[+-]\d{2}:?\d{2})?"
+)
+
+_LEVEL = re.compile(r"\b(TRACE|DEBUG|INFO|NOTICE|WARN|WARNING|ERROR|ERR|CRITICAL|CRIT|FATAL|PANIC)\b"
+                    r"|\blevel=\"?(\w+)", re.I)
+_FIELDS = re.compile(r"\b(service|svc|app|host|hostname)=\"?([\w.:-]+)")
+_LEVEL_ALIASES = {"WARNING": "WARN", "ERR": "ERROR", "CRIT": "CRITICAL", "PANIC": "FATAL"}
+_FIELD_ALIASES = {"svc": "service", "app": "service", "hostname": "host"}
 
 
 def configure_logging(level=logging.INFO):
     logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(message)s")
+
+
+def parse_timestamp(line: str) -> Optional[float]:
+    """Epoch seconds of the first ISO-8601 timestamp in ``line`` (UTC if no offset), or None."""
+    m = _TIMESTAMP.search(line)
+    if not m:
+        return None
+    date, clock, frac, tz = m.groups()
+    text = f"{date}T{clock}{frac or ''}"
+    if tz:
+        text += "+00:00" if tz == "Z" else (tz if ":" in tz else f"{tz[:3]}:{tz[3:]}")
+    try:
+        ts = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def normalize_level(level: str) -> str:
+    level = level.upper()
+    return _LEVEL_ALIASES.get(level, level)
+
+
+def parse_fields(line: str) -> Dict[str, str]:
+    """``level``, ``service`` and ``host`` found in ``line``.
+
+    The level is the first upper-case level word (or ``level=...``);
+    service/host come from ``service=``/``svc=``/``app=`` and
+    ``host=``/``hostname=`` pairs.
+    """
+    fields: Dict[str, str] = {}
+    for m in _LEVEL.finditer(line):
+        word = m.group(1)
+        if word and not word.isupper():
+            continue
+        fields["level"] = normalize_level(word or m.group(2))
+        break
+    for key, value in _FIELDS.findall(line):
+        fields.setdefault(_FIELD_ALIASES.get(key, key), value)
+    return fields
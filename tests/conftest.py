@@ -0,0 +1,39 @@
+import pytest
+
+from logician import http_client, metrics
+from logician.cache import set_cache
+from logician.local_embedder import set_local_embedder
+
+
+@pytest.fixture(autouse=True)
+def fresh_embedding_cache():
+    """Give every test an empty process-wide embedding cache"""
+    set_cache(None)
+    yield
+    set_cache(None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_http_client():
+    """Give every test a new pooled session and env-derived policies"""
+    http_client.reset_session()
+    http_client._policies.clear()
+    yield
+    http_client.reset_session()
+    http_client._policies.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_local_embedder():
+    """Rebuild the process-wide local embedder from env for every test"""
+    set_local_embedder(None)
+    yield
+    set_local_embedder(None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Start every test with empty counters and histograms"""
+    metrics.registry.reset()
+    yield
+    metrics.registry.reset()
@@ -0,0 +1,65 @@
+"""Tests for the IVF approximate index."""
+import numpy as np
+import pytest
+from logician.ann import IVFIndex, clustered_vectors, evaluate_recall
+from logician.local_index import LocalCollection, LocalIndex
+
+
+def _collection(n=5000, dim=32, nlist=32):
+    vectors = clustered_vectors(n, dim, clusters=50, seed=1)
+    coll = LocalCollection(dim, ann_threshold=0)
+    coll.upsert(list(range(n)), vectors, [{"i": i} for i in range(n)])
+    coll.build_ann(nlist=nlist, nprobe=4)
+    return coll, vectors
+
+
+class TestIVFIndex:
+    """Test training, incremental inserts and recall"""
+
+    def test_recall_increases_with_nprobe(self):
+        """Test recall@10 is high and all-cell probing is exact"""
+        coll, vectors = _collection()
+        queries = clustered_vectors(20, 32, clusters=50, seed=1)[:20] + 0.01
+        results = {r["nprobe"]: r["recall"] for r in evaluate_recall(coll, queries, k=10, nprobes=(1, 4, 32))}
+        assert results[4] >= 0.8
+        assert results[32] == pytest.approx(1.0)
+        assert results[1] <= results[32]
+
+    def test_incremental_insert_is_searchable(self):
+        """Test rows upserted after training are found"""
+        coll, _ = _collection()
+        new = np.full((1, 32), 5.0, dtype=np.float32)
+        coll.upsert(["new"], new, [{"i": "new"}])
+        assert coll.search(new[0], top_k=1)[0]["id"] == "new"
+
+    def test_overwritten_row_moves_cell(self):
+        """Test re-upserting an id doesn't leave a stale candidate behind"""
+        coll, vectors = _collection()
+        coll.upsert([0], -vectors[:1], [{"i": 0}])
+        ids = [h["id"] for h in coll.search(-vectors[0], top_k=5, nprobe=32)]
+        assert ids.count(0) == 1
+        assert ids[0] == 0
+
+    def test_auto_build_at_threshold(self):
+        """Test the index is built once the collection reaches ann_threshold"""
+        coll = LocalCollection(8, ann_threshold=100)
+        coll.upsert(list(range(100)), clustered_vectors(100, 8, clusters=5), [{}] * 100)
+        coll.search(np.ones(8), top_k=3)
+        assert coll.ann is not None and coll.ann.trained
+
+    def test_exact_bypasses_index(self):
+        """Test exact=True matches brute force"""
+        coll, vectors = _collection()
+        exact = [h["id"] for h in coll.search(vectors[7], top_k=5, exact=True)]
+        assert exact[0] == 7
+
+    def test_persists_with_collection(self, tmp_path):
+        """Test the IVF state is saved and restored with the collection"""
+        index = LocalIndex(str(tmp_path))
+        coll, vectors = _collection()
+        index.collections["logs"] = coll
+        index.flush()
+
+        reloaded = LocalIndex(str(tmp_path)).get("logs")
+        assert reloaded.ann is not None
+        assert reloaded.search(vectors[3], top_k=1, nprobe=32)[0]["id"] == 3
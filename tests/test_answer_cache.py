@@ -0,0 +1,78 @@
+"""Tests for the semantic answer cache."""
+from unittest.mock import patch
+import numpy as np
+from logician.answer_cache import SemanticAnswerCache, filters_key, from_env
+
+
+def unit(*values):
+    vec = np.array(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class TestSemanticAnswerCache:
+    """Test lookup, expiry, invalidation and metrics"""
+
+    def test_near_duplicate_hits(self):
+        """Test a query within the threshold gets the cached answer"""
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.put(unit(1, 0, 0), "disk full", "logs", cost=2.0)
+        assert cache.get(unit(1, 0.05, 0), "logs") == "disk full"
+        assert cache.get(unit(0, 1, 0), "logs") is None
+
+    def test_key_separates_collection_filters_and_generation(self):
+        """Test entries only match the same collection, filters and generation"""
+        cache = SemanticAnswerCache()
+        cache.put(unit(1, 0), "a", "logs", {"service": "api"}, generation=1)
+        assert cache.get(unit(1, 0), "logs", {"service": "api"}, generation=1) == "a"
+        assert cache.get(unit(1, 0), "other", {"service": "api"}, generation=1) is None
+        assert cache.get(unit(1, 0), "logs", {"service": "web"}, generation=1) is None
+        assert cache.get(unit(1, 0), "logs", {"service": "api"}, generation=2) is None
+
+    def test_ttl_expiry(self):
+        """Test entries older than the TTL are dropped"""
+        cache = SemanticAnswerCache(ttl=10)
+        with patch("logician.answer_cache.time.monotonic", return_value=100.0):
+            cache.put(unit(1, 0), "old", "logs")
+        with patch("logician.answer_cache.time.monotonic", return_value=105.0):
+            cache.put(unit(0, 1), "new", "logs")
+        with patch("logician.answer_cache.time.monotonic", return_value=111.0):
+            assert cache.get(unit(1, 0), "logs") is None
+            assert cache.get(unit(0, 1), "logs") == "new"
+        assert len(cache) == 1
+
+    def test_invalidate_and_eviction(self):
+        """Test per-collection invalidation and oldest-first eviction at capacity"""
+        cache = SemanticAnswerCache(max_entries=2)
+        cache.put(unit(1, 0, 0), "a", "logs")
+        cache.put(unit(0, 1, 0), "b", "other")
+        cache.put(unit(0, 0, 1), "c", "logs")
+        assert cache.get(unit(1, 0, 0), "logs") is None
+        cache.invalidate("logs")
+        assert cache.get(unit(0, 1, 0), "other") == "b"
+        assert cache.get(unit(0, 0, 1), "logs") is None
+
+    def test_stats(self):
+        """Test hit rate and latency saved"""
+        cache = SemanticAnswerCache()
+        cache.put(unit(1, 0), "a", "logs", cost=1.5)
+        cache.get(unit(1, 0), "logs")
+        cache.get(unit(0, 1), "logs")
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+        assert 1.4 < stats["saved_seconds"] <= 1.5
+
+    def test_filters_key_rounds_time_ranges(self):
+        """Test relative time ranges a few seconds apart share a key"""
+        assert filters_key({"timestamp": {"gte": 1000.0}}) == filters_key({"timestamp": {"gte": 1010.0}})
+        assert filters_key({"level": ["WARN", "ERROR"]}) == filters_key({"level": ["ERROR", "WARN"]})
+        assert filters_key(None) == ""
+
+    def test_from_env(self, monkeypatch):
+        """Test the cache is opt-in via a TTL and disabled again with zero"""
+        assert from_env() is None
+        monkeypatch.setenv("RAG_ANSWER_CACHE_TTL", "300")
+        monkeypatch.setenv("RAG_ANSWER_CACHE_THRESHOLD", "0.9")
+        assert from_env().threshold == 0.9
+        monkeypatch.setenv("RAG_ANSWER_CACHE_TTL", "0")
+        assert from_env() is None
@@ -0,0 +1,170 @@
+"""Tests for the asyncio RAG orchestrator."""
+import asyncio
+import time
+import pytest
+from unittest.mock import patch, AsyncMock
+from logician.async_rag import AsyncRagOrchestrator, hit_score
+
+
+class TestAsyncRagOrchestrator:
+    """Test async retrieval and generation"""
+
+    def test_init_defaults(self):
+        """Test a single collection is used by default"""
+        rag = AsyncRagOrchestrator()
+        assert rag.collections == ["log_entries"]
+
+    def test_aanswer_without_endpoint(self):
+        """Test aanswer falls back to the placeholder without an LLM endpoint"""
+        rag = AsyncRagOrchestrator()
+        answer = asyncio.run(rag.aanswer("Why did my deployment fail?"))
+        assert "[LLM placeholder]" in answer
+
+    def test_multi_collection_searches_run_concurrently(self):
+        """Test collections are searched concurrently and merged by score"""
+        rag = AsyncRagOrchestrator(collections=["a", "b", "c"])
+
+        async def slow_search(collection, vector, top_k=5):
+            await asyncio.sleep(0.1)
+            return [{"id": collection, "score": {"a": 0.2, "b": 0.9, "c": 0.5}[collection]}]
+
+        rag.qdrant.asearch = slow_search
+        start = time.perf_counter()
+        hits = asyncio.run(rag.aretrieve("q", top_k=2))
+        elapsed = time.perf_counter() - start
+
+        assert [h["id"] for h in hits] == ["b", "c"]
+        assert elapsed < 0.25
+
+    def test_slow_shard_is_left_out(self):
+        """Test a shard missing its timeout degrades the hits instead of delaying them"""
+        from logician import metrics
+
+        rag = AsyncRagOrchestrator(collections=["fast", "slow"])
+        rag.lexical_weight = 0
+        rag.shard_timeout_ms = 50
+
+        async def search(collection, vector, top_k=5):
+            await asyncio.sleep(1.0 if collection == "slow" else 0)
+            return [{"id": collection, "score": 0.5}]
+
+        rag.qdrant.asearch = search
+        start = time.perf_counter()
+        hits = asyncio.run(rag.aretrieve("q", top_k=2))
+
+        assert [h["id"] for h in hits] == ["fast"]
+        assert time.perf_counter() - start < 0.5
+        assert metrics.registry.counter("logician_fallbacks_total", stage="shard") == 1
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_local_searches_leave_event_loop_free(self):
+        """Test local-backend searches run off the loop, so shard timeouts can fire"""
+        from logician import metrics
+
+        rag = AsyncRagOrchestrator(collections=["s1", "s2", "s3"])
+        rag.lexical_weight = 0
+        rag.shard_timeout_ms = 50
+
+        def search(collection, vector, top_k=5, **kwargs):
+            time.sleep(0.3)
+            return [{"id": collection, "score": 0.5}]
+
+        rag.qdrant.search = search
+
+        async def timed():
+            start = time.perf_counter()
+            hits = await rag.aretrieve("q")
+            return hits, time.perf_counter() - start
+
+        hits, elapsed = asyncio.run(timed())
+        assert hits == [] and elapsed < 0.25
+        assert metrics.registry.counter("logician_fallbacks_total", stage="shard") == 3
+
+    def test_streams_respect_concurrency_limit(self):
+        """Test astream_answer holds a slot for the whole stream"""
+        rag = AsyncRagOrchestrator(max_concurrency=1)
+        active, peak = [0], [0]
+
+        async def stream(prompt, status=None):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            yield "token"
+            active[0] -= 1
+
+        rag.astream_llm = stream
+
+        async def consume(q):
+            return [t async for t in rag.astream_answer(q)]
+
+        async def run():
+            return await asyncio.gather(consume("a"), consume("b"))
+
+        assert asyncio.run(run()) == [["token"], ["token"]]
+        assert peak[0] == 1
+
+    def test_many_queries_on_one_loop(self):
+        """Test many in-flight queries share one event loop"""
+        rag = AsyncRagOrchestrator(max_concurrency=50)
+
+        async def run():
+            return await asyncio.gather(*(rag.aanswer(f"q{i}") for i in range(200)))
+
+        answers = asyncio.run(run())
+        assert len(answers) == 200
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.async_rag.http_client.apost', new_callable=AsyncMock)
+    def test_acall_llm_with_endpoint(self, mock_apost):
+        """Test acall_llm returns the endpoint text"""
+        mock_apost.return_value = {"text": "async response"}
+        rag = AsyncRagOrchestrator()
+        assert asyncio.run(rag.acall_llm("prompt")) == "async response"
+        assert mock_apost.call_args[0][3] == "generate"
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.async_rag.http_client.apost', new_callable=AsyncMock)
+    def test_acall_llm_failure_fallback(self, mock_apost):
+        """Test acall_llm falls back to the placeholder on errors"""
+        mock_apost.side_effect = Exception("Connection failed")
+        rag = AsyncRagOrchestrator()
+        assert "[LLM placeholder]" in asyncio.run(rag.acall_llm("prompt"))
+
+    def test_hit_score(self):
+        """Test scores are read from dicts and objects"""
+        class Hit:
+            score = 0.4
+        assert hit_score({"score": 0.7}) == 0.7
+        assert hit_score(Hit()) == 0.4
+        assert hit_score("plain") == 0.0
+
+
+class TestAsyncStreaming:
+    """Test async streamed generation"""
+
+    def test_astream_without_endpoint(self):
+        """Test the placeholder is yielded as one chunk without an endpoint"""
+        rag = AsyncRagOrchestrator()
+
+        async def run():
+            return [t async for t in rag.astream_answer("q")]
+
+        tokens = asyncio.run(run())
+        assert len(tokens) == 1
+        assert "[LLM placeholder]" in tokens[0]
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    def test_astream_llm_ndjson(self):
+        """Test NDJSON chunks are streamed through httpx"""
+        httpx = pytest.importorskip("httpx")
+        body = b'{"response": "a"}\n{"response": "b"}\n{"done": true}\n'
+
+        rag = AsyncRagOrchestrator()
+        rag._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, content=body)))
+
+        async def run():
+            tokens = [t async for t in rag.astream_llm("prompt")]
+            await rag.aclose()
+            return tokens
+
+        assert asyncio.run(run()) == ["a", "b"]
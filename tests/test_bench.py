@@ -0,0 +1,64 @@
+"""Tests for the benchmark harness."""
+import json
+import requests
+from logician.bench import StandInServer, compare, main, percentiles, run_benchmarks, synthetic_lines
+
+
+class TestStandInServer:
+    """Test the stand-in embeddings/generate endpoints"""
+
+    def test_embeddings_and_generate(self):
+        """Test single, batch and generate responses"""
+        with StandInServer(dim=16, answer_tokens=3) as server:
+            single = requests.post(server.url + "/api/embeddings", json={"input": "a"}).json()
+            batch = requests.post(server.url + "/api/embeddings", json={"input": ["a", "b"]}).json()
+            text = requests.post(server.url + "/api/generate", json={"prompt": "p"}).json()["text"]
+            lines = requests.post(server.url + "/api/generate", json={"prompt": "p", "stream": True}).text
+        assert len(single["embedding"]) == 16
+        assert len(batch["embeddings"]) == 2 and batch["embeddings"][0] == single["embedding"]
+        assert text == "token0 token1 token2 "
+        assert json.loads(lines.splitlines()[-1])["done"] is True
+        assert server.requests == 4
+
+
+class TestHarness:
+    """Test measurement helpers, a tiny run and regression comparison"""
+
+    def test_percentiles(self):
+        """Test percentiles are reported in milliseconds"""
+        result = percentiles([0.001] * 98 + [0.1, 0.2])
+        assert result["p50_ms"] == 1.0
+        assert result["p99_ms"] > 90
+        assert percentiles([])["p95_ms"] == 0.0
+
+    def test_synthetic_lines_deterministic(self):
+        """Test the corpus is reproducible from its seed"""
+        assert synthetic_lines(5, seed=1) == synthetic_lines(5, seed=1)
+        source, lineno, text = synthetic_lines(1)[0]
+        assert lineno == 1 and "service=" in text and source.endswith(".log")
+
+    def test_tiny_run(self):
+        """Test every benchmark reports throughput and latency"""
+        results = run_benchmarks(sizes=[50], concurrency=[1, 2], queries=5, answers=2,
+                                 embed_latency=0, generate_latency=0)
+        names = [(row["benchmark"], row.get("concurrency")) for row in results["results"]]
+        assert names == [("embedding", 1), ("embedding", 2), ("ingest", None), ("search", 1), ("search", 2),
+                         ("answer", 1), ("answer", 2)]
+        assert all(row["throughput"] > 0 for row in results["results"])
+        assert results["results"][2]["n"] == 50
+
+    def test_compare_and_main_exit_code(self, tmp_path, monkeypatch):
+        """Test regressions beyond the tolerance are reported and fail the run"""
+        old = {"results": [{"benchmark": "search", "corpus": 10, "concurrency": 1, "throughput": 1000.0,
+                            "p95_ms": 1.0}]}
+        new = {"results": [{"benchmark": "search", "corpus": 10, "concurrency": 1, "throughput": 500.0,
+                            "p95_ms": 1.1}]}
+        assert compare(old, new, tolerance=0.2) == ["search/10/1: throughput 1000.0 -> 500.0/s"]
+        assert compare(old, old) == []
+
+        monkeypatch.setattr("logician.bench.run_benchmarks", lambda *a, **k: dict(new, meta={}))
+        baseline = tmp_path / "old.json"
+        baseline.write_text(json.dumps(old))
+        out = tmp_path / "new.json"
+        assert main(["--output", str(out), "--baseline", str(baseline)]) == 1
+        assert json.loads(out.read_text())["results"] == new["results"]
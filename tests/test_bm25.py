@@ -0,0 +1,180 @@
+"""Tests for the BM25 lexical index and hybrid retrieval."""
+import os
+import numpy as np
+from unittest.mock import patch, MagicMock
+from logician.bm25 import BM25Index, LexicalStore, tokenize
+from logician.qdrant_wrapper import QdrantWrapper
+from logician.rag import RagOrchestrator, reciprocal_rank_fusion
+
+
+LINES = {
+    "a": "ERROR pod api-7f9c8d-xk2 crashed with ERR_CONN_REFUSED",
+    "b": "INFO request req-1234abcd completed in 20ms",
+    "c": "WARN pod worker-55d crashed, restarting",
+    "d": "INFO health check ok",
+}
+
+
+def make_index(**kwargs):
+    index = BM25Index(**kwargs)
+    index.add(list(LINES), list(LINES.values()))
+    return index
+
+
+class TestTokenize:
+    """Test log-aware tokenization"""
+
+    def test_compound_tokens_kept_and_split(self):
+        """Test compound tokens are indexed whole and as parts"""
+        tokens = tokenize("pod api-7f9c8d-xk2 ERR_CONN_REFUSED.")
+        assert "api-7f9c8d-xk2" in tokens and "7f9c8d" in tokens
+        assert "err_conn_refused" in tokens and "refused" in tokens
+
+
+class TestBM25Index:
+    """Test BM25 scoring, updates and persistence"""
+
+    def test_exact_token_ranks_first(self):
+        """Test an exact request ID finds its line"""
+        assert make_index().search("req-1234abcd", top_k=1)[0][0] == "b"
+
+    def test_rare_terms_outweigh_common(self):
+        """Test IDF favours the rarer matching term"""
+        ids = [pid for pid, _ in make_index().search("crashed refused", top_k=3)]
+        assert ids[0] == "a" and set(ids) == {"a", "c"}
+
+    def test_readd_replaces_document(self):
+        """Test re-adding an id drops its old text"""
+        index = make_index()
+        index.add(["b"], ["DEBUG cache warmed"])
+        assert index.search("req-1234abcd") == []
+        assert index.search("cache")[0][0] == "b"
+        assert len(index) == 4
+
+    def test_segments_match_buffer(self):
+        """Test sealed segments score like the unsealed buffer"""
+        buffered = make_index().search("pod crashed", top_k=4)
+        segmented = BM25Index(segment_docs=1)
+        segmented.add(list(LINES), list(LINES.values()))
+        assert len(segmented._segments) == 4
+        assert segmented.search("pod crashed", top_k=4) == buffered
+
+    def test_save_load_and_incremental_append(self, tmp_path):
+        """Test persisted postings are memory-mapped and appends add new segments"""
+        prefix = str(tmp_path / "logs.bm25")
+        make_index().save(prefix)
+        loaded = BM25Index.load(prefix)
+        assert isinstance(loaded._segments[0].docs, np.memmap)
+        assert loaded.search("req-1234abcd")[0][0] == "b"
+
+        loaded.add(["e", "a"], ["ERROR disk full on node-3", "INFO pod api-7f9c8d-xk2 ready"])
+        loaded.save(prefix)
+        again = BM25Index.load(prefix)
+        assert len(again._segments) == 2
+        assert again.search("disk full")[0][0] == "e"
+        assert [pid for pid, _ in again.search("err_conn_refused")] == []
+
+    def test_compact_drops_replaced(self, tmp_path):
+        """Test compaction merges segments, drops dead postings and old files"""
+        prefix = str(tmp_path / "logs.bm25")
+        index = BM25Index(segment_docs=1, max_segments=2)
+        index.add(list(LINES), list(LINES.values()))
+        index.add(["c"], ["WARN pod worker-55d ready"])
+        index.save(prefix)
+        assert len(index._segments) == 1
+        assert sum(f.endswith(".docs.npy") for f in os.listdir(tmp_path)) == 1
+        assert [pid for pid, _ in BM25Index.load(prefix).search("crashed")] == ["a"]
+
+    def test_compact_shrinks_document_arrays(self, tmp_path):
+        """Test compaction renumbers live documents and drops replaced ones from the arrays"""
+        prefix = str(tmp_path / "logs.bm25")
+        index = make_index()
+        index.add(["a", "b"], ["ERROR disk full", "INFO pod api-7f9c8d-xk2 ready"])
+        index.compact()
+        assert index.ids == ["c", "d", "a", "b"]
+        assert len(index._lengths) == len(index._live) == 4 and index._live.all()
+        index.save(prefix)
+        loaded = BM25Index.load(prefix)
+        assert loaded.search("disk full")[0][0] == "a"
+        assert loaded.search("crashed")[0][0] == "c"
+        assert sum(f.endswith(".lengths.npy") for f in os.listdir(tmp_path)) == 1
+
+    def test_recreate_replaces_meta_before_removing_files(self, tmp_path):
+        """Test recreating an index leaves a loadable empty index and no old files"""
+        store = LexicalStore(str(tmp_path))
+        store.get_or_create("logs").add(list(LINES), list(LINES.values()))
+        store.flush()
+        store.create("logs")
+        assert len(BM25Index.load(store._prefix("logs"))) == 0
+        assert sorted(f.split(".")[-2] for f in os.listdir(tmp_path)) == ["lengths", "live", "meta"]
+
+
+class TestHybridRetrieval:
+    """Test lexical search through the wrapper and fused retrieval"""
+
+    def test_rrf_fuses_and_weights(self):
+        """Test RRF rewards hits found by both rankings and honours weights"""
+        dense = [{"id": "x", "payload": {}}, {"id": "y", "payload": {}}]
+        lexical = [{"id": "y", "payload": {}}, {"id": "z", "payload": {}}]
+        assert [h["id"] for h in reciprocal_rank_fusion([dense, lexical])][0] == "y"
+        heavy = reciprocal_rank_fusion([dense, lexical], weights=[0.0, 1.0], top_k=1)
+        assert heavy[0]["id"] == "y"
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_wrapper_lexical_search_and_persistence(self, tmp_path, monkeypatch):
+        """Test upserted text is lexically searchable, with payloads, across processes"""
+        monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+        wrapper = QdrantWrapper()
+        ids = list(LINES)
+        wrapper.upsert("logs", ids, np.eye(4, dtype=np.float32), [{"text": LINES[i]} for i in ids])
+        hits = wrapper.lexical_search("logs", "ERR_CONN_REFUSED", top_k=1)
+        assert hits[0]["id"] == "a" and hits[0]["payload"]["text"] == LINES["a"]
+        wrapper.flush()
+
+        LexicalStore._shared.clear()
+        from logician.local_index import LocalIndex
+        LocalIndex._shared.clear()
+        assert QdrantWrapper().lexical_search("logs", "req-1234abcd")[0]["id"] == "b"
+
+    @patch.dict('os.environ', {'BM25_ENABLED': '0'})
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_disabled(self):
+        """Test BM25_ENABLED=0 skips lexical indexing"""
+        wrapper = QdrantWrapper()
+        wrapper.upsert("logs", ["a"], [[1.0, 0.0]], [{"text": "hello"}])
+        assert wrapper.lexical_search("logs", "hello") == []
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_retrieve_finds_exact_token(self):
+        """Test hybrid retrieve surfaces a lexical-only match"""
+        rag = RagOrchestrator()
+        ids = list(LINES)
+        # Vectors that rank "d" first for any query, so only BM25 can find "b".
+        vectors = np.array([[0.1, 1.0], [0.0, 1.0], [0.2, 1.0], [1.0, 0.0]], dtype=np.float32)
+        rag.qdrant.upsert(rag.collection, ids, vectors, [{"text": LINES[i]} for i in ids])
+        with patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32)):
+            hits = rag.retrieve("req-1234abcd", top_k=2)
+            assert "b" in [h["id"] for h in hits]
+            rag.lexical_weight = 0.0
+            assert "b" not in [h["id"] for h in rag.retrieve("req-1234abcd", top_k=2)]
+
+    @patch('logician.qdrant_wrapper.QdrantClient', create=True)
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    def test_no_store_without_persistence(self, mock_client, tmp_path, monkeypatch, caplog):
+        """Test a Qdrant server without BM25_INDEX_PATH gets no BM25 store, so upserts skip it and hybrid is off"""
+        for name in ("BM25_INDEX_PATH", "QDRANT_LOCAL_PATH", "QDRANT_BACKEND", "RAG_LEXICAL_WEIGHT"):
+            monkeypatch.delenv(name, raising=False)
+        wrapper = QdrantWrapper()
+        assert wrapper.lexical is None
+        wrapper.upsert("logs", ["a"], [[1.0, 0.0]], [{"text": "hello"}])
+        assert wrapper.lexical_search("logs", "hello") == []
+        assert RagOrchestrator().lexical_weight == 0.0
+
+        monkeypatch.setenv("RAG_LEXICAL_WEIGHT", "1.0")
+        assert RagOrchestrator().lexical_weight == 0.0
+        assert "BM25_INDEX_PATH" in caplog.text
+
+        monkeypatch.delenv("RAG_LEXICAL_WEIGHT")
+        monkeypatch.setenv("BM25_INDEX_PATH", str(tmp_path))
+        assert QdrantWrapper().lexical is not None
+        assert RagOrchestrator().lexical_weight == 1.0
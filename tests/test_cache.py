@@ -0,0 +1,124 @@
+"""Tests for the embedding cache."""
+import pytest
+from logician.cache import EmbeddingCache, get_cache, set_cache
+
+
+class TestEmbeddingCache:
+    """Test memory and disk tiers"""
+
+    def test_miss_then_hit(self):
+        """Test counters track misses and hits"""
+        cache = EmbeddingCache()
+        assert cache.get("text", "m") is None
+        cache.put("text", "m", [0.1, 0.2])
+        assert cache.get("text", "m") == [0.1, 0.2]
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_keyed_by_model(self):
+        """Test the same text under another model is a miss"""
+        cache = EmbeddingCache()
+        cache.put("text", "m1", [1.0])
+        assert cache.get("text", "m2") is None
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first"""
+        cache = EmbeddingCache(max_entries=2)
+        cache.put("a", "m", [1.0])
+        cache.put("b", "m", [2.0])
+        cache.get("a", "m")
+        cache.put("c", "m", [3.0])
+        assert cache.get("b", "m") is None
+        assert cache.get("a", "m") == [1.0]
+        assert cache.get("c", "m") == [3.0]
+
+    def test_use_model_invalidates_other_models(self):
+        """Test switching models drops vectors from the old model"""
+        cache = EmbeddingCache(model="m1")
+        cache.put("text", "m1", [1.0])
+        cache.use_model("m2")
+        assert cache.get("text", "m1") is None
+        assert cache.stats()["memory_entries"] == 0
+
+    def test_disk_tier_survives_reopen(self, tmp_path):
+        """Test vectors persist in the SQLite tier across instances"""
+        path = str(tmp_path / "emb.sqlite")
+        cache = EmbeddingCache(path=path)
+        cache.put("text", "m", [0.5, 0.25])
+        cache.close()
+
+        reopened = EmbeddingCache(path=path)
+        assert reopened.get("text", "m") == [0.5, 0.25]
+        assert reopened.stats()["disk_hits"] == 1
+        reopened.close()
+
+    def test_disk_tier_size_limit(self, tmp_path):
+        """Test the disk tier is bounded by max_disk_entries"""
+        cache = EmbeddingCache(max_entries=0, path=str(tmp_path / "emb.sqlite"), max_disk_entries=2)
+        for i in range(5):
+            cache.put(f"t{i}", "m", [float(i)])
+        assert cache.stats()["disk_entries"] == 2
+        assert cache.get("t0", "m") is None
+        assert cache.get("t4", "m") == [4.0]
+        cache.close()
+
+    def test_reopen_with_new_model_invalidates_disk(self, tmp_path):
+        """Test opening the disk tier for a new model drops stale vectors"""
+        path = str(tmp_path / "emb.sqlite")
+        cache = EmbeddingCache(path=path, model="m1")
+        cache.put("text", "m1", [1.0])
+        cache.close()
+
+        reopened = EmbeddingCache(path=path, model="m2")
+        assert reopened.stats()["disk_entries"] == 0
+        reopened.close()
+
+    def test_batch_round_trip(self, tmp_path):
+        """Test put_many/get_many store and fetch a batch, counting hits and misses"""
+        cache = EmbeddingCache(max_entries=0, path=str(tmp_path / "emb.sqlite"))
+        cache.put_many(["a", "b", "a"], "m", [[1.0], [2.0], [1.0]])
+        assert cache.stats()["disk_entries"] == 2
+        assert cache.get_many(["b", "x", "a"], "m") == [[2.0], None, [1.0]]
+        assert (cache.hits, cache.misses, cache.disk_hits) == (2, 1, 2)
+        cache.close()
+
+    def test_access_times_written_lazily(self, tmp_path):
+        """Test disk hits don't write until the next put, which still keeps LRU order"""
+        path = str(tmp_path / "emb.sqlite")
+        cache = EmbeddingCache(max_entries=0, path=path, max_disk_entries=2)
+        cache.put("old", "m", [1.0])
+        cache.put("new", "m", [2.0])
+        atime = cache._db.execute("SELECT MIN(atime) FROM embeddings").fetchone()[0]
+        cache.get("old", "m")
+        assert cache._db.execute("SELECT MIN(atime) FROM embeddings").fetchone()[0] == atime
+
+        cache.put("third", "m", [3.0])
+        assert cache.get("new", "m") is None
+        assert cache.get("old", "m") == [1.0]
+        cache.close()
+
+    def test_invalidate_all(self):
+        """Test invalidate without a model clears everything"""
+        cache = EmbeddingCache()
+        cache.put("a", "m1", [1.0])
+        cache.put("b", "m2", [2.0])
+        cache.invalidate()
+        assert cache.stats()["memory_entries"] == 0
+
+
+class TestDefaultCache:
+    """Test the process-wide cache"""
+
+    def test_built_from_env(self, monkeypatch):
+        """Test env vars configure the default cache"""
+        monkeypatch.setenv("LLM_EMBED_CACHE_SIZE", "7")
+        set_cache(None)
+        assert get_cache().max_entries == 7
+
+    def test_set_cache_replaces_default(self):
+        """Test set_cache installs a custom cache"""
+        cache = EmbeddingCache(max_entries=3)
+        set_cache(cache)
+        assert get_cache() is cache
@@ -8,7 +8,7 @@ import sys
 class TestCLI:
     """Test CLI functionality"""
     
-    @patch('logician.cli.RagOrchestrator')
+    @patch('logician.rag.RagOrchestrator')
     @patch('sys.argv', ['logician', 'What is the weather?'])
     def test_main_basic_query(self, mock_rag_class):
         """Test main with basic query"""
@@ -20,7 +20,7 @@ class TestCLI:
             main()
             mock_print.assert_called_once_with("It's sunny today")
     
-    @patch('logician.cli.RagOrchestrator')
+    @patch('logician.rag.RagOrchestrator')
     @patch('sys.argv', ['logician', 'Tell me about Python'])
     def test_main_different_query(self, mock_rag_class):
         """Test main with different query"""
@@ -39,7 +39,7 @@ class TestCLI:
         with pytest.raises(SystemExit):
             main()
     
-    @patch('logician.cli.RagOrchestrator')
+    @patch('logician.rag.RagOrchestrator')
     @patch('sys.argv', ['logician', 'Query with multiple words'])
     def test_main_multiword_query(self, mock_rag_class):
         """Test main with multi-word query"""
@@ -50,3 +50,148 @@ class TestCLI:
         with patch('builtins.print'):
             main()
             assert mock_rag.answer.call_args[0][0] == "Query with multiple words"
+
+
+class TestCLIStream:
+    """Test --stream output"""
+
+    @patch('logician.rag.RagOrchestrator')
+    @patch('sys.argv', ['logician', '--stream', 'Why?'])
+    def test_stream_prints_tokens_and_ttft(self, mock_rag_class, capsys):
+        """Test tokens are printed incrementally and TTFT is reported"""
+        mock_rag = Mock()
+        mock_rag.stream_answer.return_value = iter(["Because ", "reasons"])
+        mock_rag_class.return_value = mock_rag
+
+        main()
+
+        captured = capsys.readouterr()
+        assert captured.out == "Because reasons\n"
+        assert "time to first token" in captured.err
+        mock_rag.answer.assert_not_called()
+
+
+class TestCLIFilters:
+    """Test filter flags"""
+
+    @patch('logician.rag.RagOrchestrator')
+    def test_filter_flags(self, mock_rag_class):
+        """Test --service/--level/--since become explicit filters"""
+        mock_rag = Mock()
+        mock_rag.answer.return_value = "ok"
+        mock_rag_class.return_value = mock_rag
+
+        main(["why?", "--service", "api", "--level", "warning", "--since", "2h"])
+
+        filters = mock_rag.answer.call_args[1]["filters"]
+        assert filters["service"] == "api"
+        assert filters["level"] == "WARN"
+        assert "gte" in filters["timestamp"]
+
+    @patch('logician.rag.RagOrchestrator')
+    def test_no_flags_parse_query(self, mock_rag_class):
+        """Test no flags leaves filters to query parsing"""
+        mock_rag = Mock()
+        mock_rag.answer.return_value = "ok"
+        mock_rag_class.return_value = mock_rag
+        main(["why?"])
+        assert mock_rag.answer.call_args[1]["filters"] is None
+
+
+class TestCLIIngest:
+    """Test the ingest subcommand"""
+
+    @patch('logician.ingest.ingest_files')
+    def test_ingest_subcommand(self, mock_ingest, capsys):
+        """Test ingest arguments are passed to the pipeline"""
+        mock_ingest.return_value = Mock(lines=10, elapsed=1.0, lines_per_sec=10.0)
+
+        main(["ingest", "app.log", "--workers", "2", "--collection", "c"])
+
+        args, kwargs = mock_ingest.call_args
+        assert args[0] == ["app.log"]
+        assert kwargs["workers"] == 2
+        assert kwargs["collection"] == "c"
+        assert "10 lines" in capsys.readouterr().out
+
+    @patch('logician.embed_pool.set_embed_pool')
+    @patch('logician.embed_pool.EmbeddingPool')
+    @patch('logician.ingest.ingest_files')
+    def test_embed_workers(self, mock_ingest, mock_pool, mock_set_pool):
+        """Test --embed-workers installs a process pool for local embedding"""
+        mock_ingest.return_value = Mock(lines=1, elapsed=1.0, lines_per_sec=1.0)
+        main(["ingest", "app.log", "--embed-workers", "4", "--embed-batch", "512"])
+        mock_pool.assert_called_once_with(4, batch_size=512)
+        mock_set_pool.assert_called_once_with(mock_pool.return_value)
+
+    @patch('logician.tail.follow_files')
+    @patch('logician.ingest.ingest_files')
+    def test_follow(self, mock_ingest, mock_follow, capsys):
+        """Test --follow tails the files instead of a one-off ingest"""
+        mock_follow.return_value = Mock(lines=3, elapsed=1.0, lines_per_sec=3.0)
+
+        main(["ingest", "app.log", "--follow", "--checkpoint", "cp.json", "--flush-interval", "0.5"])
+
+        mock_ingest.assert_not_called()
+        kwargs = mock_follow.call_args[1]
+        assert kwargs["checkpoint"] == "cp.json"
+        assert kwargs["flush_interval"] == 0.5
+        assert "3 new lines" in capsys.readouterr().out
+
+    @patch('logician.partitions.apply_retention')
+    @patch('logician.qdrant_wrapper.QdrantWrapper')
+    def test_retention_subcommand(self, mock_wrapper, mock_retention, capsys):
+        """Test retention drops and compacts partitions and reports them"""
+        mock_retention.return_value = {"dropped": ["logs__20240101"], "compacted": ["logs__20240110"]}
+
+        main(["retention", "--collection", "logs", "--keep-days", "30", "--compact-days", "7"])
+
+        args, kwargs = mock_retention.call_args
+        assert args[1:] == ("logs", 30.0)
+        assert kwargs == {"compact_days": 7.0, "granularity": "day"}
+        out = capsys.readouterr().out
+        assert "dropped logs__20240101" in out and "compacted logs__20240110" in out
+
+    @patch('logician.server.LogicianServer')
+    @patch('logician.rag.RagOrchestrator')
+    def test_serve_subcommand(self, mock_rag_class, mock_server, capsys):
+        """Test serve warms a server around an orchestrator for the collection"""
+        main(["serve", "--collection", "logs", "--port", "9000"])
+        mock_rag_class.assert_called_once_with(collection="logs")
+        assert mock_server.call_args[0][0] is mock_rag_class.return_value
+        mock_server.return_value.warm.assert_called_once()
+        assert "serving logs on http://127.0.0.1:9000" in capsys.readouterr().err
+
+    def test_follow_rejects_recreate(self):
+        """Test --follow refuses to wipe the collection it keeps current"""
+        with pytest.raises(SystemExit):
+            main(["ingest", "app.log", "--follow", "--recreate"])
+
+
+class TestCLITrace:
+    """Test the --trace stage breakdown"""
+
+    @patch('logician.rag.RagOrchestrator')
+    def test_trace_prints_breakdown(self, mock_rag_class, capsys):
+        """Test --trace prints each stage and the total on stderr"""
+        from logician.metrics import span
+
+        def answer(query, filters=None):
+            with span("embed"):
+                pass
+            with span("llm"):
+                pass
+            return "done"
+
+        mock_rag_class.return_value = Mock(answer=answer)
+        main(["why", "--trace"])
+        out = capsys.readouterr()
+        assert out.out.strip() == "done"
+        assert "embed" in out.err and "llm" in out.err and "total" in out.err
+
+    @patch('logician.rag.RagOrchestrator')
+    def test_no_trace_by_default(self, mock_rag_class, capsys):
+        """Test nothing is printed on stderr without --trace"""
+        mock_rag_class.return_value = Mock(answer=Mock(return_value="done"))
+        main(["why"])
+        assert capsys.readouterr().err == ""
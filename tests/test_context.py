@@ -0,0 +1,87 @@
+"""Tests for prompt context assembly."""
+import numpy as np
+from logician.context import build_context, estimate_tokens, format_hit, mmr_order, truncate_tokens
+
+
+def hit(text, score=0.0, **payload):
+    return {"id": text, "score": score, "payload": dict(payload, text=text)}
+
+
+class TestTokens:
+    """Test the token estimate and truncation"""
+
+    def test_estimate_tokens(self):
+        """Test words count per 4 characters and punctuation separately"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("disk full") == 2
+        assert estimate_tokens("connection") == 3
+        assert estimate_tokens("a=1, b") == 5
+
+    def test_truncate_tokens(self):
+        """Test truncation keeps about the budget and marks the cut"""
+        text = " ".join(f"w{i}" for i in range(100))
+        cut = truncate_tokens(text, 10)
+        assert cut.endswith(" ...")
+        assert estimate_tokens(cut) <= 10
+        assert truncate_tokens("short", 10) == "short"
+
+
+class TestFormatHit:
+    """Test payload compaction"""
+
+    def test_fields_source_and_text(self):
+        """Test relevant fields are kept and the rest dropped"""
+        line = format_hit(hit("db timeout", source="api.log", line=7, level="ERROR", service="api",
+                              samples=[["x", 1]] * 50))
+        assert line == "[api.log:7] service=api level=ERROR | db timeout"
+
+    def test_non_dict_hits(self):
+        """Test hits without a payload fall back to str()"""
+        assert format_hit("plain") == "plain"
+        assert format_hit({"payload": {"text": "only text"}}) == "only text"
+
+
+class TestBuildContext:
+    """Test dedup, MMR and the token budget"""
+
+    def test_dedups_repeated_events(self):
+        """Test lines differing only in timestamp or UUID collapse to the best one"""
+        hits = [hit("2024-01-01T10:00:00Z request 0f8fad5b-d9cb-469f-a165-70867728950e failed", 0.9,
+                    source="api.log", line=1, timestamp="2024-01-01T10:00:00Z"),
+                hit("2024-01-01T10:00:05Z request 7c9e6679-7425-40de-944b-e07fc1f90ae7 failed", 0.8,
+                    source="api.log", line=9, timestamp="2024-01-01T10:00:05Z"),
+                hit("disk quota exceeded on volume data", 0.7)]
+        context = build_context(hits)
+        assert len(context) == 2 and context[0].startswith("[api.log:1]")
+        assert context[1] == "disk quota exceeded on volume data"
+
+    def test_keeps_distinct_codes_and_hosts(self):
+        """Test lines differing in status code or host are all kept"""
+        hits = [hit("GET /orders status 500", 0.9, host="web-01"),
+                hit("GET /orders status 404", 0.8, host="web-01"),
+                hit("GET /orders status 500", 0.7, host="web-02")]
+        assert len(build_context(hits)) == 3
+        assert len(build_context(hits + [hit("GET /orders status 500", 0.6, host="web-01")])) == 3
+
+    def test_token_budget(self):
+        """Test context stops or truncates at the budget"""
+        hits = [hit(f"event {name} " + "payload " * 40, 1.0) for name in ("alpha", "beta", "gamma")]
+        context = build_context(hits, max_tokens=100)
+        assert sum(estimate_tokens(line) for line in context) <= 100
+        assert len(context) == 2 and context[1].endswith(" ...")
+
+    def test_max_hits_and_mmr(self):
+        """Test MMR prefers a different event over a similar, slightly better one"""
+        hits = [hit("payment service timeout calling bank gateway", 0.9),
+                hit("payment service timeout calling bank gateway retry", 0.85),
+                hit("kafka consumer lag growing on orders topic", 0.8)]
+        plain = build_context(hits, max_hits=2)
+        diverse = build_context(hits, max_hits=2, mmr_lambda=0.5)
+        assert plain[1].endswith("retry")
+        assert diverse[1].startswith("kafka")
+
+    def test_mmr_order(self):
+        """Test pure relevance ordering with lambda 1"""
+        sim = np.eye(3, dtype=np.float32)
+        assert mmr_order(sim, np.array([0.1, 0.9, 0.5]), 1.0) == [1, 2, 0]
+        assert mmr_order(sim, np.array([]), 0.5) == []
@@ -0,0 +1,59 @@
+"""Tests for the multi-process embedding pool."""
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from logician.embed_pool import EmbeddingPool, get_embed_pool, set_embed_pool
+from logician.embedder import get_embeddings
+from logician.local_embedder import HashingEmbedder
+
+
+@pytest.fixture(autouse=True)
+def no_default_pool():
+    set_embed_pool(None)
+    yield
+    set_embed_pool(None)
+
+
+class TestEmbeddingPool:
+    """Test sharded embedding through worker processes"""
+
+    def test_matches_in_process_embedding(self):
+        """Test workers fill the shared buffer with the same vectors, in order"""
+        embedder = HashingEmbedder(dim=32)
+        texts = [f"request {i} failed: connection refused by db-{i % 7}" for i in range(300)]
+        pool = EmbeddingPool(2, batch_size=64, embedder=embedder)
+        try:
+            pool.warm()
+            out = pool.embed(texts)
+        finally:
+            pool.shutdown()
+        assert out.dtype == np.float32 and out.shape == (300, 32)
+        np.testing.assert_array_equal(out, embedder.embed(texts))
+
+    def test_small_batches_stay_in_process(self):
+        """Test calls below min_texts skip the workers"""
+        pool = EmbeddingPool.__new__(EmbeddingPool)
+        pool.embedder, pool.min_texts, pool._executor = HashingEmbedder(dim=8), 10, Mock()
+        assert pool.embed(["a", "b"]).shape == (2, 8)
+        pool._executor.submit.assert_not_called()
+
+
+class TestDefaultPool:
+    """Test env configuration and use from get_embeddings"""
+
+    def test_disabled_by_default(self, monkeypatch):
+        """Test no pool without LLM_EMBED_WORKERS above 1"""
+        monkeypatch.delenv("LLM_EMBED_WORKERS", raising=False)
+        assert get_embed_pool() is None
+        set_embed_pool(None)
+        monkeypatch.setenv("LLM_EMBED_WORKERS", "1")
+        assert get_embed_pool() is None
+
+    def test_get_embeddings_uses_pool(self, monkeypatch):
+        """Test the local embedding path goes through the pool"""
+        monkeypatch.delenv("LLM_ENDPOINT", raising=False)
+        pool = Mock(spec=EmbeddingPool)
+        pool.embed.return_value = np.zeros((2, 4), dtype=np.float32)
+        set_embed_pool(pool)
+        assert get_embeddings(["a", "b"], as_array=True).shape == (2, 4)
+        pool.embed.assert_called_once_with(["a", "b"])
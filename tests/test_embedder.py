@@ -1,7 +1,10 @@
 """Comprehensive tests for embedder module."""
 import pytest
-from unittest.mock import patch, Mock
-from logician.embedder import get_embedding
+import asyncio
+import numpy as np
+from unittest.mock import patch, Mock, AsyncMock
+from concurrent.futures import ThreadPoolExecutor
+from logician.embedder import get_embedding, get_embeddings, aget_embedding, EmbeddingCoalescer
 
 
 class TestGetEmbedding:
@@ -34,7 +37,7 @@ class TestGetEmbedding:
         assert all(isinstance(v, float) for v in embedding)
     
     @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
-    @patch('logician.embedder.requests.post')
+    @patch('logician.http_client.requests.Session.post')
     def test_with_llm_endpoint_success(self, mock_post):
         """Test embedding with successful LLM endpoint"""
         mock_response = Mock()
@@ -48,7 +51,7 @@ class TestGetEmbedding:
         mock_post.assert_called_once()
     
     @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080', 'LLM_API_KEY': 'test-key'})
-    @patch('logician.embedder.requests.post')
+    @patch('logician.http_client.requests.Session.post')
     def test_with_llm_endpoint_with_api_key(self, mock_post):
         """Test embedding with LLM endpoint and API key"""
         mock_response = Mock()
@@ -65,7 +68,7 @@ class TestGetEmbedding:
         assert call_kwargs["headers"]["Authorization"] == "Bearer test-key"
     
     @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
-    @patch('logician.embedder.requests.post')
+    @patch('logician.http_client.requests.Session.post')
     def test_with_llm_endpoint_failure_fallback(self, mock_post):
         """Test fallback to pseudo embedding when LLM endpoint fails"""
         mock_post.side_effect = Exception("Connection failed")
@@ -91,3 +94,191 @@ class TestGetEmbedding:
         
         assert len(embedding) == 128
         assert all(isinstance(v, float) for v in embedding)
+
+
+class TestGetEmbeddings:
+    """Test batch embedding generation"""
+
+    def test_empty_input(self):
+        """Test empty list returns empty list"""
+        assert get_embeddings([]) == []
+
+    def test_matches_single_without_endpoint(self):
+        """Test batch results match single-text results and keep order"""
+        texts = ["a", "b", "c"]
+        assert get_embeddings(texts) == [get_embedding(t) for t in texts]
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_batches_by_batch_size(self, mock_post):
+        """Test texts are split into batch_size requests in order"""
+        def respond(url, json, **kwargs):
+            resp = Mock()
+            resp.raise_for_status = Mock()
+            resp.json.return_value = {"embeddings": [[float(len(t))] for t in json["input"]]}
+            return resp
+        mock_post.side_effect = respond
+
+        result = get_embeddings(["a", "bb", "ccc", "dddd", "eeeee"], batch_size=2)
+
+        assert result == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert mock_post.call_count == 3
+        assert mock_post.call_args_list[0][1]["json"] == {"input": ["a", "bb"]}
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_malformed_batch_falls_back_per_item(self, mock_post):
+        """Test a batch with the wrong number of vectors is retried per item"""
+        def respond(url, json, **kwargs):
+            resp = Mock()
+            resp.raise_for_status = Mock()
+            if isinstance(json["input"], list):
+                resp.json.return_value = {"embeddings": [[0.0]]}
+            else:
+                resp.json.return_value = {"embedding": [0.5]}
+            return resp
+        mock_post.side_effect = respond
+
+        result = get_embeddings(["x", "y"])
+
+        assert result == [[0.5], [0.5]]
+        assert mock_post.call_count == 3
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_endpoint_failure_falls_back_to_pseudo(self, mock_post):
+        """Test endpoint failures fall back to pseudo embeddings"""
+        mock_post.side_effect = Exception("Connection failed")
+
+        result = get_embeddings(["x", "y"])
+
+        assert len(result) == 2
+        assert all(len(v) == 128 for v in result)
+
+
+class TestEmbeddingCoalescer:
+    """Test coalescing of concurrent single-text calls"""
+
+    @patch('logician.embedder.get_embeddings')
+    def test_concurrent_calls_share_one_batch(self, mock_batch):
+        """Test calls within the window are merged into one batch"""
+        mock_batch.side_effect = lambda texts, **kw: [[float(len(t))] for t in texts]
+        coalescer = EmbeddingCoalescer(window=0.2, max_batch=4)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(coalescer.embed, ["a", "bb", "ccc", "dddd"]))
+
+        assert results == [[1.0], [2.0], [3.0], [4.0]]
+        assert mock_batch.call_count == 1
+
+    @patch('logician.embedder.get_embeddings')
+    def test_single_call_flushed_after_window(self, mock_batch):
+        """Test a lone call is flushed once the window expires"""
+        mock_batch.side_effect = lambda texts, **kw: [[1.0] for _ in texts]
+        coalescer = EmbeddingCoalescer(window=0.01)
+
+        assert coalescer.embed("only") == [1.0]
+
+    @patch('logician.embedder.get_embeddings')
+    def test_errors_propagate_to_callers(self, mock_batch):
+        """Test batch failures are raised in every waiting caller"""
+        mock_batch.side_effect = RuntimeError("boom")
+        coalescer = EmbeddingCoalescer(window=0.01)
+
+        with pytest.raises(RuntimeError):
+            coalescer.embed("x")
+
+
+class TestEmbeddingCacheIntegration:
+    """Test the embedder uses the embedding cache"""
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_repeated_text_hits_cache(self, mock_post):
+        """Test a repeated text is only sent to the endpoint once"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"embedding": [0.3] * 4}
+        mock_response.raise_for_status = Mock()
+        mock_post.return_value = mock_response
+
+        assert get_embedding("same") == get_embedding("same")
+        mock_post.assert_called_once()
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_batch_only_sends_misses(self, mock_post):
+        """Test get_embeddings skips texts already cached"""
+        def respond(url, json, **kwargs):
+            resp = Mock()
+            resp.raise_for_status = Mock()
+            if isinstance(json["input"], list):
+                resp.json.return_value = {"embeddings": [[2.0] for _ in json["input"]]}
+            else:
+                resp.json.return_value = {"embedding": [1.0]}
+            return resp
+        mock_post.side_effect = respond
+
+        get_embedding("cached")
+        result = get_embeddings(["cached", "new"])
+
+        assert result == [[1.0], [2.0]]
+        assert mock_post.call_args[1]["json"] == {"input": ["new"]}
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_fallback_vectors_not_cached(self, mock_post):
+        """Test pseudo-embeddings from a failed call are not cached"""
+        mock_post.side_effect = Exception("Connection failed")
+        get_embedding("text")
+        get_embedding("text")
+        assert mock_post.call_count == 2
+
+
+class TestAsyncGetEmbedding:
+    """Test async embedding generation"""
+
+    def test_matches_sync_without_endpoint(self):
+        """Test aget_embedding matches get_embedding without an endpoint"""
+        assert asyncio.run(aget_embedding("hello")) == get_embedding("hello")
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.embedder.http_client.apost', new_callable=AsyncMock)
+    def test_with_endpoint_and_cache(self, mock_apost):
+        """Test endpoint results are returned and cached"""
+        mock_apost.return_value = {"embedding": [0.4] * 4}
+        assert asyncio.run(aget_embedding("t")) == [0.4] * 4
+        assert asyncio.run(aget_embedding("t")) == [0.4] * 4
+        mock_apost.assert_called_once()
+
+
+class TestArrayOutput:
+    """Test the float32 ndarray return path"""
+
+    def test_batch_array_matches_lists(self):
+        """Test as_array returns one contiguous float32 matrix with the list values"""
+        texts = ["a", "b", "c"]
+        matrix = get_embeddings(texts, as_array=True)
+        assert matrix.dtype == np.float32
+        assert matrix.shape == (3, 128)
+        assert matrix.flags["C_CONTIGUOUS"]
+        np.testing.assert_allclose(matrix, np.array(get_embeddings(texts), dtype=np.float32))
+
+    def test_single_array(self):
+        """Test get_embedding/aget_embedding as_array return 1-D float32 vectors"""
+        vec = get_embedding("x", as_array=True)
+        assert vec.dtype == np.float32 and vec.shape == (128,)
+        np.testing.assert_array_equal(asyncio.run(aget_embedding("x", as_array=True)), vec)
+
+    def test_empty_batch(self):
+        """Test an empty batch gives an empty matrix"""
+        assert get_embeddings([], as_array=True).shape[0] == 0
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.embedder.http_client.post')
+    def test_endpoint_batch_array(self, mock_post):
+        """Test endpoint batches convert once to a float32 matrix"""
+        mock_response = Mock()
+        mock_response.json.return_value = {"embeddings": [[0.5, 0.25], [1.0, 2.0]]}
+        mock_post.return_value = mock_response
+        matrix = get_embeddings(["p", "q"], as_array=True)
+        np.testing.assert_array_equal(matrix, np.array([[0.5, 0.25], [1.0, 2.0]], dtype=np.float32))
@@ -0,0 +1,85 @@
+"""Tests for search filters."""
+from unittest.mock import patch, MagicMock
+from logician.filters import matches, parse_filters, to_qdrant_filter
+from logician.rag import RagOrchestrator
+
+
+class TestParseFilters:
+    """Test filter extraction from queries"""
+
+    def test_natural_language(self):
+        """Test service and relative time phrases; "errors" stays search text, not a level filter"""
+        text, filters = parse_filters("errors in service checkout in the last hour", now=10000.0)
+        assert filters == {"timestamp": {"gte": 6400.0}, "service": "checkout"}
+        assert text == "errors in service checkout"
+
+    def test_field_tokens(self):
+        """Test field:value tokens are removed from the search text"""
+        text, filters = parse_filters("timeouts host:db-2 level:warn since:30m", now=10000.0)
+        assert text == "timeouts"
+        assert filters == {"host": "db-2", "level": "WARN", "timestamp": {"gte": 8200.0}}
+        assert parse_filters("disk level:warning")[1] == {"level": "WARN"}
+
+    def test_plain_query_untouched(self):
+        """Test queries without filter phrases pass through"""
+        assert parse_filters("last login failures") == ("last login failures", {})
+
+
+class TestMatches:
+    """Test payload matching"""
+
+    def test_conditions(self):
+        """Test values, lists and ranges"""
+        payload = {"service": "api", "level": "ERROR", "timestamp": 50.0}
+        assert matches(payload, {"service": "api", "level": ["ERROR", "FATAL"], "timestamp": {"gt": 10}})
+        assert not matches(payload, {"timestamp": {"lt": 50.0}})
+        assert not matches(payload, {"host": "web-1"})
+
+
+class TestQdrantFilter:
+    """Test conversion to qdrant-client models"""
+
+    @patch('logician.filters.Range', create=True)
+    @patch('logician.filters.MatchAny', create=True)
+    @patch('logician.filters.MatchValue', create=True)
+    @patch('logician.filters.FieldCondition', create=True)
+    @patch('logician.filters.Filter', create=True)
+    def test_to_qdrant_filter(self, mock_filter, mock_condition, mock_value, mock_any, mock_range):
+        """Test each condition type maps to the matching Qdrant model"""
+        to_qdrant_filter({"service": "api", "level": ["ERROR"], "timestamp": {"gte": 1.0}})
+        mock_value.assert_called_once_with(value="api")
+        mock_any.assert_called_once_with(any=["ERROR"])
+        mock_range.assert_called_once_with(gte=1.0)
+        assert len(mock_filter.call_args[1]["must"]) == 3
+        assert to_qdrant_filter({}) is None
+
+
+class TestOrchestratorFilters:
+    """Test filters flow from queries into retrieval"""
+
+    def test_answer_parses_filters(self):
+        """Test answer passes parsed filters and the stripped query to retrieve"""
+        rag = RagOrchestrator()
+        rag.retrieve = MagicMock(return_value=[])
+        rag.answer("errors in service api in the last 2 hours")
+        args, kwargs = rag.retrieve.call_args
+        assert args[0] == "errors in service api"
+        assert kwargs["filters"]["service"] == "api"
+        assert "timestamp" in kwargs["filters"]
+
+    def test_explicit_filters_win(self):
+        """Test explicit filters skip query parsing"""
+        rag = RagOrchestrator()
+        rag.retrieve = MagicMock(return_value=[])
+        rag.answer("errors in the last hour", filters={"host": "h"})
+        assert rag.retrieve.call_args == (("errors in the last hour",), {"top_k": 3, "filters": {"host": "h"}})
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_retrieve_pushes_filters_down(self):
+        """Test retrieve only returns hits matching the filters"""
+        rag = RagOrchestrator()
+        payloads = [{"text": "disk full", "service": "api"}, {"text": "disk full", "service": "db"}]
+        rag.qdrant.upsert(rag.collection, ["a", "b"], [[1.0, 0.0], [1.0, 0.1]], payloads)
+        with patch('logician.rag.get_embedding', return_value=[1.0, 0.0]):
+            hits = rag.retrieve("disk full", filters={"service": "db"})
+        assert [h["id"] for h in hits] == ["b"]
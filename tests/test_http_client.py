@@ -0,0 +1,152 @@
+"""Tests for the shared pooled HTTP client."""
+import asyncio
+import pytest
+import requests
+from unittest.mock import patch, Mock
+from logician import http_client
+from logician.http_client import EndpointPolicy
+
+
+def _response(status=200, payload=None):
+    resp = Mock()
+    resp.status_code = status
+    resp.json.return_value = payload or {}
+    if status >= 400:
+        resp.raise_for_status.side_effect = requests.HTTPError(str(status))
+    return resp
+
+
+class TestSession:
+    """Test session pooling"""
+
+    def test_session_is_shared(self):
+        """Test the same session is reused across calls"""
+        assert http_client.get_session() is http_client.get_session()
+
+    @patch.dict('os.environ', {'LLM_POOL_SIZE': '4'})
+    def test_pool_size_from_env(self):
+        """Test the adapter pool size comes from LLM_POOL_SIZE"""
+        adapter = http_client.get_session().get_adapter("http://localhost")
+        assert adapter._pool_maxsize == 4
+
+    def test_reset_session(self):
+        """Test reset_session builds a new session"""
+        first = http_client.get_session()
+        http_client.reset_session()
+        assert http_client.get_session() is not first
+
+
+class TestPolicy:
+    """Test per-endpoint policies"""
+
+    @patch.dict('os.environ', {'LLM_EMBED_TIMEOUT': '3', 'LLM_EMBED_RETRIES': '5'})
+    def test_policy_from_env(self):
+        """Test policies are read from LLM_<ENDPOINT>_* env vars"""
+        policy = http_client.get_policy("embed")
+        assert policy.timeout == 3.0
+        assert policy.retries == 5
+        assert http_client.get_policy("generate") == EndpointPolicy(timeout=60.0, retry_read_timeouts=False)
+
+    def test_set_policy(self):
+        """Test set_policy overrides an endpoint"""
+        http_client.set_policy("generate", EndpointPolicy(timeout=60, retries=0))
+        assert http_client.get_policy("generate").timeout == 60
+
+
+class TestPost:
+    """Test POST with retries"""
+
+    @patch('logician.http_client.requests.Session.post')
+    def test_uses_policy_timeout_and_auth(self, mock_post):
+        """Test timeout and Authorization header are applied"""
+        mock_post.return_value = _response()
+        http_client.set_policy("embed", EndpointPolicy(timeout=7))
+
+        http_client.post("http://x/api/embeddings", {"input": "t"}, "embed", "key")
+
+        kwargs = mock_post.call_args[1]
+        assert kwargs["timeout"] == 7
+        assert kwargs["headers"] == {"Authorization": "Bearer key"}
+
+    @patch('logician.http_client.time.sleep')
+    @patch('logician.http_client.requests.Session.post')
+    def test_retries_connection_errors(self, mock_post, mock_sleep):
+        """Test connection errors are retried with backoff"""
+        mock_post.side_effect = [requests.ConnectionError(), _response(payload={"ok": 1})]
+        http_client.set_policy("embed", EndpointPolicy(retries=2, backoff=0.1))
+
+        resp = http_client.post("http://x", {}, "embed")
+
+        assert resp.json() == {"ok": 1}
+        mock_sleep.assert_called_once_with(0.1)
+
+    @patch('logician.http_client.time.sleep')
+    @patch('logician.http_client.requests.Session.post')
+    def test_retries_gateway_status(self, mock_post, mock_sleep):
+        """Test 503 responses are retried"""
+        mock_post.side_effect = [_response(503), _response(503), _response(200)]
+        http_client.set_policy("embed", EndpointPolicy(retries=2, backoff=0.1))
+
+        http_client.post("http://x", {}, "embed")
+
+        assert mock_post.call_count == 3
+        assert [c[0][0] for c in mock_sleep.call_args_list] == [0.1, 0.2]
+
+    @patch('logician.http_client.time.sleep')
+    @patch('logician.http_client.requests.Session.post')
+    def test_gives_up_after_retries(self, mock_post, mock_sleep):
+        """Test the last failure is raised once retries are exhausted"""
+        mock_post.side_effect = requests.Timeout()
+        http_client.set_policy("embed", EndpointPolicy(retries=1))
+
+        with pytest.raises(requests.Timeout):
+            http_client.post("http://x", {}, "embed")
+        assert mock_post.call_count == 2
+
+    @patch('logician.http_client.time.sleep')
+    @patch('logician.http_client.requests.Session.post')
+    def test_generate_read_timeout_not_retried(self, mock_post, mock_sleep):
+        """Test a slow generation is not resent, while connection failures still are"""
+        mock_post.side_effect = requests.ReadTimeout()
+        with pytest.raises(requests.ReadTimeout):
+            http_client.post("http://x", {}, "generate")
+        mock_post.assert_called_once()
+
+        mock_post.side_effect = [requests.ConnectTimeout(), _response(payload={"response": "ok"})]
+        assert http_client.post("http://x", {}, "generate").json() == {"response": "ok"}
+
+    @patch('logician.http_client.requests.Session.post')
+    def test_client_errors_not_retried(self, mock_post):
+        """Test 4xx responses raise immediately"""
+        mock_post.return_value = _response(400)
+
+        with pytest.raises(requests.HTTPError):
+            http_client.post("http://x", {}, "embed")
+        mock_post.assert_called_once()
+
+
+class TestAsyncPost:
+    """Test async POST"""
+
+    def test_without_client_uses_thread(self):
+        """Test apost falls back to the blocking client in a thread"""
+        with patch('logician.http_client.post') as mock_post:
+            mock_post.return_value = _response(payload={"ok": 1})
+            assert asyncio.run(http_client.apost(None, "http://x", {}, "embed")) == {"ok": 1}
+
+    def test_with_httpx_client_retries(self):
+        """Test apost retries gateway errors on an httpx client"""
+        httpx = pytest.importorskip("httpx")
+        statuses = [503, 200]
+
+        def handler(request):
+            return httpx.Response(statuses.pop(0), json={"embedding": [1.0]})
+
+        http_client.set_policy("embed", EndpointPolicy(retries=1, backoff=0))
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await http_client.apost(client, "http://x/api/embeddings", {}, "embed")
+
+        assert asyncio.run(run()) == {"embedding": [1.0]}
+        assert statuses == []
@@ -0,0 +1,198 @@
+"""Tests for the log ingestion pipeline."""
+import gzip
+import threading
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from logician.embedder import get_embeddings
+from logician.ingest import (
+    expand_log_paths,
+    ingest_files,
+    ingest_lines,
+    iter_batches,
+    iter_log_lines,
+    line_payload,
+    point_id,
+    source_service,
+)
+from logician.local_embedder import get_local_embedder, set_local_embedder
+from logician.qdrant_wrapper import QdrantWrapper
+
+
+def _write(path, lines, compress=False):
+    data = "".join(line + "\n" for line in lines)
+    if compress:
+        with gzip.open(path, "wt") as fh:
+            fh.write(data)
+    else:
+        path.write_text(data)
+
+
+class TestReading:
+    """Test streaming of log files"""
+
+    def test_rotated_files_ordered_oldest_first(self, tmp_path):
+        """Test rotated siblings are found and ordered oldest to newest"""
+        for name in ["app.log", "app.log.1", "app.log.2.gz", "app.log.bak"]:
+            (tmp_path / name).write_text("x\n")
+        paths = expand_log_paths([str(tmp_path / "app.log")])
+        assert [p.rsplit("/", 1)[1] for p in paths] == ["app.log.2.gz", "app.log.1", "app.log"]
+
+    def test_glob_deduplicates(self, tmp_path):
+        """Test overlapping globs don't ingest a file twice"""
+        for name in ["a.log", "a.log.1"]:
+            (tmp_path / name).write_text("x\n")
+        paths = expand_log_paths([str(tmp_path / "*.log*")])
+        assert len(paths) == 2
+
+    def test_iter_log_lines_plain_and_gzip(self, tmp_path):
+        """Test plain and gzip files are streamed and blank lines skipped"""
+        _write(tmp_path / "a.log", ["one", "", "two"])
+        _write(tmp_path / "b.log.gz", ["three"], compress=True)
+        lines = list(iter_log_lines([str(tmp_path / "a.log"), str(tmp_path / "b.log.gz")]))
+        assert [(ln, text) for _, ln, text in lines] == [(1, "one"), (3, "two"), (1, "three")]
+
+    def test_iter_batches(self):
+        """Test batching keeps a short final batch"""
+        assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_point_id_is_deterministic(self):
+        """Test point ids are stable per source line"""
+        assert point_id("a.log", 1) == point_id("a.log", 1)
+        assert point_id("a.log", 1) != point_id("a.log", 2)
+
+
+class TestPipeline:
+    """Test batching, parallel upserts and backpressure"""
+
+    def test_ingest_files_upserts_all_lines(self, tmp_path):
+        """Test every line is embedded and upserted with payload"""
+        _write(tmp_path / "app.log", [f"line {i}" for i in range(10)])
+        qdrant = MagicMock()
+
+        stats = ingest_files([str(tmp_path / "app.log")], qdrant=qdrant, batch_size=4, workers=2)
+
+        assert stats.lines == 10
+        assert stats.batches == 3
+        assert stats.lines_per_sec > 0
+        upserted = [p for call in qdrant.upsert.call_args_list for p in call[0][3]]
+        assert sorted(p["line"] for p in upserted) == list(range(1, 11))
+        assert all(len(v) == 128 for call in qdrant.upsert.call_args_list for v in call[0][2])
+
+    def test_recreate_creates_collection(self, tmp_path):
+        """Test recreate sizes the collection from the embedding model"""
+        _write(tmp_path / "app.log", ["x"])
+        qdrant = MagicMock()
+        ingest_files([str(tmp_path / "app.log")], qdrant=qdrant, recreate=True)
+        qdrant.create_collection.assert_called_once_with("log_entries", vector_size=128)
+
+    def test_recreate_fits_local_idf(self, tmp_path, monkeypatch):
+        """Test recreate fits IDF on the input and saves it where LLM_LOCAL_EMBED_IDF points"""
+        _write(tmp_path / "app.log", ["request ok"] * 5 + ["payment refused"])
+        idf_path = tmp_path / "idf.npy"
+        monkeypatch.setenv("LLM_LOCAL_EMBED_IDF", str(idf_path))
+        qdrant = MagicMock()
+        ingest_files([str(tmp_path / "app.log")], qdrant=qdrant)
+        assert not idf_path.exists()
+
+        ingest_files([str(tmp_path / "app.log")], qdrant=qdrant, recreate=True)
+        assert idf_path.exists()
+        set_local_embedder(None)
+        loaded = get_local_embedder()
+        assert loaded.idf is not None
+        upserted = qdrant.upsert.call_args_list[-1][0][2]
+        np.testing.assert_allclose(upserted[-1], loaded.embed(["payment refused"])[0], rtol=1e-6)
+
+    def test_bounded_queue_applies_backpressure(self):
+        """Test the reader never runs more than queue_size batches ahead"""
+        read = []
+        done = []
+        gate = threading.Event()
+
+        def lines():
+            for i in range(100):
+                read.append(i)
+                yield ("src", i, "text")
+
+        def handler(qdrant, collection, batch):
+            gate.wait()
+            done.append(len(batch))
+
+        t = threading.Thread(target=ingest_lines, args=(lines(),),
+                             kwargs=dict(qdrant=MagicMock(), batch_size=1, workers=1, queue_size=2, handler=handler))
+        t.start()
+        time.sleep(0.1)
+        assert len(read) <= 5
+        gate.set()
+        t.join()
+        assert sum(done) == 100
+
+    def test_worker_error_is_raised(self):
+        """Test a failing upsert stops the pipeline and raises"""
+        def handler(qdrant, collection, batch):
+            raise RuntimeError("qdrant down")
+
+        with pytest.raises(RuntimeError):
+            ingest_lines((("s", i, "t") for i in range(10)), qdrant=MagicMock(), batch_size=2, handler=handler)
+
+
+class TestTemplateIngest:
+    """Test template-deduplicated ingest"""
+
+    def test_one_point_per_template(self, tmp_path):
+        """Test repetitive lines are embedded once per template"""
+        lines = [f"2024-01-01T00:00:{i:02d}Z request {i} served in {i * 3}ms" for i in range(50)]
+        lines += ["worker crashed with signal 9"] * 3
+        _write(tmp_path / "app.log", lines)
+        qdrant = MagicMock()
+        qdrant.payloads.return_value = {}
+
+        stats = ingest_files([str(tmp_path / "app.log")], qdrant=qdrant, templates=True)
+
+        assert stats.lines == 53
+        assert stats.templates == 2
+        payloads = [p for call in qdrant.upsert.call_args_list for p in call[0][3]]
+        counts = sorted(p["count"] for p in payloads)
+        assert counts == [3, 50]
+        served = next(p for p in payloads if p["count"] == 50)
+        assert served["last_seen"] - served["first_seen"] == 49
+
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_reingest_merges_statistics(self, tmp_path, monkeypatch):
+        """Test a second ingest adds to a template's count and widens its time range"""
+        monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path / "index"))
+        _write(tmp_path / "a.log", ["2024-01-01T00:00:00Z ERROR connection refused to db",
+                                    "2024-01-01T00:05:00Z ERROR connection refused to db"])
+        _write(tmp_path / "b.log", ["2024-01-02T00:00:00Z ERROR connection refused to db"])
+        qdrant = QdrantWrapper()
+        ingest_files([str(tmp_path / "a.log")], collection="tpl_merge", qdrant=qdrant, templates=True)
+        ingest_files([str(tmp_path / "b.log")], collection="tpl_merge", qdrant=qdrant, templates=True)
+
+        hits = qdrant.search("tpl_merge", get_embeddings(["connection refused"])[0], top_k=5)
+        assert len(hits) == 1
+        payload = hits[0]["payload"]
+        assert payload["count"] == 3
+        assert (payload["first_seen"], payload["last_seen"]) == (1704067200.0, 1704153600.0)
+        assert payload["field_counts"]["service"] == {"a": 2, "b": 1}
+        assert payload["service"] == "a" and payload["level"] == "ERROR"
+        assert qdrant.search("tpl_merge", get_embeddings(["connection refused"])[0],
+                             filters={"level": ["ERROR", "FATAL"]})
+
+
+class TestPayload:
+    """Test filterable payload fields"""
+
+    def test_line_payload_fields(self):
+        """Test service, level, host and timestamp are extracted"""
+        payload = line_payload("/var/log/api.log", 3, "2024-01-01T00:00:00Z ERROR host=web-1 boom")
+        assert payload["service"] == "api"
+        assert payload["level"] == "ERROR"
+        assert payload["host"] == "web-1"
+        assert payload["timestamp"] == 1704067200.0
+
+    def test_source_service(self):
+        """Test rotated and gzip suffixes are stripped from the service name"""
+        assert source_service("/var/log/checkout.log.2.gz") == "checkout"
+        assert source_service("syslog") == "syslog"
@@ -0,0 +1,87 @@
+"""Tests for the local hashing embedder."""
+import os
+import subprocess
+import sys
+import numpy as np
+from unittest.mock import patch
+from logician.embedder import get_embedding, get_embeddings
+from logician.local_embedder import HashingEmbedder, get_local_embedder
+
+
+class TestHashingEmbedder:
+    """Test feature hashing and projection"""
+
+    def test_unit_float32_rows(self):
+        """Test embed returns L2-normalised float32 rows"""
+        matrix = HashingEmbedder().embed(["disk full on /var", "user admin logged in"])
+        assert matrix.dtype == np.float32 and matrix.shape == (2, 128)
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+
+    def test_similar_lines_score_higher(self):
+        """Test lines sharing vocabulary are closer than unrelated ones"""
+        a, b, c = HashingEmbedder().embed([
+            "connection timeout to database host",
+            "database connection timed out",
+            "user logged in successfully",
+        ])
+        assert a @ b > a @ c + 0.3
+
+    def test_numbers_collapse(self):
+        """Test lines differing only in numbers embed identically"""
+        a, b = HashingEmbedder().embed(["retry 3 of 5 failed", "retry 4 of 10 failed"])
+        np.testing.assert_allclose(a, b)
+
+    def test_batch_matches_single(self):
+        """Test a row does not depend on the rest of its batch"""
+        embedder = HashingEmbedder(dim=64)
+        batch = embedder.embed(["alpha beta", "gamma", ""])
+        np.testing.assert_allclose(batch[1], embedder.embed(["gamma"])[0])
+        assert not batch[2].any()
+
+    def test_idf_downweights_common_terms(self, tmp_path):
+        """Test fitted IDF makes rare terms dominate, and survives save/load"""
+        corpus = [f"request handled status ok path /api/{w}" for w in ("users", "orders", "items")] * 10
+        plain = HashingEmbedder()
+        fitted = HashingEmbedder().fit(corpus + ["payment gateway refused card"])
+        q, d1, d2 = ("payment request", "payment gateway refused card", corpus[0])
+        pq, p1, p2 = plain.embed([q, d1, d2])
+        fq, f1, f2 = fitted.embed([q, d1, d2])
+        assert (fq @ f1 - fq @ f2) > (pq @ p1 - pq @ p2)
+
+        path = str(tmp_path / "idf.npy")
+        fitted.save(path)
+        np.testing.assert_array_equal(HashingEmbedder().load(path).embed([q]), fitted.embed([q]))
+
+    def test_stable_across_processes(self):
+        """Test vectors do not depend on PYTHONHASHSEED"""
+        code = "from logician.local_embedder import HashingEmbedder; print(HashingEmbedder().embed(['kernel panic'])[0].tolist())"
+        outputs = set()
+        for seed in ("1", "2"):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            outputs.add(subprocess.run([sys.executable, "-c", code], env=env, capture_output=True,
+                                       text=True, check=True).stdout)
+        assert len(outputs) == 1
+        assert outputs.pop().strip() == str(HashingEmbedder().embed(["kernel panic"])[0].tolist())
+
+
+class TestEmbedderIntegration:
+    """Test the embedder falls back to and can force the local backend"""
+
+    def test_fallback_uses_local_embedder(self):
+        """Test get_embeddings without an endpoint uses the local embedder"""
+        expected = get_local_embedder().embed(["a b", "c d"])
+        np.testing.assert_allclose(get_embeddings(["a b", "c d"], as_array=True), expected)
+        np.testing.assert_allclose(get_embedding("a b"), expected[0], rtol=1e-6)
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080', 'LLM_EMBED_BACKEND': 'local'})
+    @patch('logician.embedder.http_client.post')
+    def test_backend_local_skips_endpoint(self, mock_post):
+        """Test LLM_EMBED_BACKEND=local never calls the endpoint"""
+        get_embedding("x")
+        get_embeddings(["y", "z"])
+        mock_post.assert_not_called()
+
+    @patch.dict('os.environ', {'LLM_LOCAL_EMBED_DIM': '32'})
+    def test_dim_from_env(self):
+        """Test LLM_LOCAL_EMBED_DIM sets the local vector size"""
+        assert len(get_embedding("x")) == 32
@@ -0,0 +1,145 @@
+"""Tests for the in-process NumPy vector index."""
+import numpy as np
+import pytest
+from logician.local_index import LocalCollection, LocalIndex
+
+
+def _random(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+class TestLocalCollection:
+    """Test upsert and cosine top-k"""
+
+    def test_search_matches_exact_ranking(self):
+        """Test argpartition top-k equals a full sort by cosine"""
+        vectors = _random(500)
+        coll = LocalCollection(16)
+        coll.upsert(list(range(500)), vectors, [{"i": i} for i in range(500)])
+        query = _random(1, seed=1)[0]
+
+        hits = coll.search(query, top_k=10)
+
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(unit @ (query / np.linalg.norm(query))))[:10]
+        assert [h["id"] for h in hits] == list(expected)
+        assert hits[0]["payload"] == {"i": int(expected[0])}
+        assert hits[0]["score"] >= hits[-1]["score"]
+
+    def test_upsert_overwrites_existing_id(self):
+        """Test re-upserting an id replaces its vector and payload"""
+        coll = LocalCollection(2)
+        coll.upsert(["a"], [[1.0, 0.0]], [{"v": 1}])
+        coll.upsert(["a"], [[0.0, 1.0]], [{"v": 2}])
+        assert len(coll) == 1
+        hit = coll.search([0.0, 1.0], top_k=1)[0]
+        assert hit["payload"] == {"v": 2}
+        assert hit["score"] == pytest.approx(1.0)
+
+    def test_grows_past_initial_capacity(self):
+        """Test the matrix grows as vectors are appended"""
+        coll = LocalCollection(4)
+        for start in range(0, 3000, 500):
+            coll.upsert(list(range(start, start + 500)), _random(500, 4, start), [{}] * 500)
+        assert len(coll) == 3000
+        assert coll.vectors.dtype == np.float32
+        assert coll.vectors.flags["C_CONTIGUOUS"]
+
+    def test_top_k_larger_than_collection(self):
+        """Test top_k above the size returns everything"""
+        coll = LocalCollection(2)
+        coll.upsert(["a", "b"], [[1.0, 0.0], [0.0, 1.0]], [{}, {}])
+        assert len(coll.search([1.0, 0.0], top_k=10)) == 2
+
+    def test_empty_search(self):
+        """Test searching an empty collection returns nothing"""
+        assert LocalCollection(2).search([1.0, 0.0]) == []
+
+
+class TestLocalIndexPersistence:
+    """Test memory-mapped persistence"""
+
+    def test_flush_and_reload(self, tmp_path):
+        """Test a flushed collection reloads as a memmap and stays writable"""
+        index = LocalIndex(str(tmp_path))
+        index.create_collection("logs", 2).upsert(["a"], [[1.0, 0.0]], [{"text": "x"}])
+        index.flush()
+
+        reloaded = LocalIndex(str(tmp_path)).get("logs")
+        assert isinstance(reloaded._vectors, np.memmap)
+        assert reloaded.search([1.0, 0.0], top_k=1)[0]["payload"] == {"text": "x"}
+
+        reloaded.upsert(["b"], [[0.0, 1.0]], [{"text": "y"}])
+        assert len(reloaded) == 2
+
+    def test_open_shares_index_per_path(self, tmp_path):
+        """Test open returns one index per path and fresh ones without a path"""
+        assert LocalIndex.open(str(tmp_path)) is LocalIndex.open(str(tmp_path))
+        assert LocalIndex.open() is not LocalIndex.open()
+
+    def test_missing_collection(self, tmp_path):
+        """Test unknown collections return None"""
+        assert LocalIndex(str(tmp_path)).get("nope") is None
+
+
+class TestPayloadFilters:
+    """Test filtered search over payload indexes"""
+
+    def _collection(self, n=2000, **kwargs):
+        rng = np.random.default_rng(0)
+        coll = LocalCollection(8, ann_threshold=0, **kwargs)
+        coll.create_payload_index("service", "keyword")
+        coll.create_payload_index("timestamp", "float")
+        payloads = [{"service": f"s{i % 4}", "timestamp": float(i)} for i in range(n)]
+        coll.upsert(list(range(n)), rng.standard_normal((n, 8)), payloads)
+        return coll
+
+    @pytest.mark.parametrize("ann", [False, True])
+    def test_filtered_results_match(self, ann):
+        """Test exact, brute-force and IVF paths only return matching rows"""
+        coll = self._collection()
+        if ann:
+            coll.build_ann(nlist=16, nprobe=16)
+        query = np.ones(8)
+        filters = {"service": ["s1", "s2"], "timestamp": {"gte": 1000.0, "lt": 1500.0}}
+        hits = coll.search(query, top_k=10, filters=filters)
+        exact = coll.search(query, top_k=10, exact=True, filters=filters)
+        assert [h["id"] for h in hits] == [h["id"] for h in exact]
+        assert all(h["payload"]["service"] in ("s1", "s2") and 1000 <= h["payload"]["timestamp"] < 1500
+                   for h in hits)
+
+    def test_unindexed_field_and_overwrite(self):
+        """Test unindexed fields are matched by scan and indexes follow overwrites"""
+        coll = self._collection(n=10)
+        coll.upsert([3], [np.ones(8)], [{"service": "moved", "kind": "x"}])
+        assert [h["id"] for h in coll.search(np.ones(8), filters={"service": "moved"})] == [3]
+        assert [h["id"] for h in coll.search(np.ones(8), filters={"kind": "x"})] == [3]
+        assert 3 not in [h["id"] for h in coll.search(np.ones(8), top_k=10, filters={"service": "s3"})]
+
+    def test_indexes_persist(self, tmp_path):
+        """Test payload indexes are rebuilt on load"""
+        prefix = str(tmp_path / "logs")
+        self._collection(n=20).save(prefix)
+        loaded = LocalCollection.load(prefix)
+        assert loaded._indexes == {"service": "keyword", "timestamp": "float"}
+        hits = loaded.search(np.ones(8), top_k=20, filters={"timestamp": {"lte": 4.0}})
+        assert sorted(h["id"] for h in hits) == [0, 1, 2, 3, 4]
+
+
+class TestSearchBatch:
+    """Test batched local search"""
+
+    def test_matches_single_searches(self):
+        """Test batched results equal per-query results, with and without filters"""
+        rng = np.random.default_rng(1)
+        coll = LocalCollection(8, ann_threshold=0)
+        coll.upsert(list(range(50)), rng.standard_normal((50, 8)), [{"n": i % 2} for i in range(50)])
+        queries = rng.standard_normal((5, 8))
+        ids = lambda results: [[h["id"] for h in hits] for hits in results]
+        batched = coll.search_batch(queries, top_k=3)
+        single = [coll.search(q, top_k=3) for q in queries]
+        assert ids(batched) == ids(single)
+        assert [h["score"] for h in batched[0]] == pytest.approx([h["score"] for h in single[0]], abs=1e-6)
+        filters = [{"n": 0}, None, {"n": 1}, None, None]
+        assert ids(coll.search_batch(queries, top_k=3, filters=filters)) == ids(
+            [coll.search(q, top_k=3, filters=f) for q, f in zip(queries, filters)])
@@ -0,0 +1,75 @@
+"""Tests for stage metrics and query tracing."""
+import pytest
+from unittest.mock import Mock, patch
+from logician import metrics
+from logician.metrics import fallback, render_prometheus, span, trace
+from logician.rag import RagOrchestrator
+
+
+class TestSpans:
+    """Test spans, counters and the Prometheus export"""
+
+    def test_span_records_histogram_and_trace(self):
+        """Test a span feeds the histogram and the active trace"""
+        with trace() as t:
+            with span("embed"):
+                pass
+            with span("embed"):
+                pass
+        assert [stage for stage, _, _ in t.spans] == ["embed", "embed"]
+        assert list(t.stages()) == ["embed"]
+        text = render_prometheus()
+        assert 'logician_stage_seconds_count{stage="embed"} 2' in text
+        assert 'logician_stage_seconds_bucket{stage="embed",le="+Inf"} 2' in text
+        assert "# TYPE logician_stage_seconds histogram" in text
+
+    def test_span_counts_errors(self):
+        """Test an exception inside a span is counted and re-raised"""
+        with trace() as t:
+            with pytest.raises(ValueError):
+                with span("search"):
+                    raise ValueError("boom")
+        assert metrics.registry.counter("logician_errors_total", stage="search") == 1
+        assert t.spans_with_errors() == [("search", "ValueError")]
+        assert "error in search: ValueError" in t.format()
+
+    def test_fallback_counter(self):
+        """Test fallbacks are counted and listed on the trace"""
+        with trace() as t:
+            fallback("llm", ConnectionError())
+        fallback("llm", "outside a trace")
+        assert metrics.registry.counter("logician_fallbacks_total", stage="llm") == 2
+        assert t.fallbacks == [("llm", "ConnectionError")]
+        assert 'logician_fallbacks_total{stage="llm"} 2' in render_prometheus()
+
+    def test_no_trace_outside_context(self):
+        """Test spans outside trace() only update the registry"""
+        with span("llm"):
+            pass
+        assert metrics._current.get() is None
+        assert render_prometheus().count("_count") == 1
+
+
+class TestPipelineInstrumentation:
+    """Test the orchestrator reports stages and silent fallbacks"""
+
+    @patch('logician.rag.http_client.post', side_effect=ConnectionError("refused"))
+    def test_answer_trace_and_llm_fallback(self, mock_post):
+        """Test a broken LLM endpoint shows up as a fallback, not just a fast answer"""
+        rag = RagOrchestrator()
+        rag.answer_cache = None
+        rag.llm_endpoint = "http://llm"
+        with trace() as t:
+            answer = rag.answer("disk full on db")
+        assert answer.startswith("[LLM placeholder]")
+        assert {"embed", "search", "lexical", "context", "llm"} <= set(t.stages())
+        assert ("llm", "ConnectionError") in t.fallbacks
+        assert ("llm", "ConnectionError") in t.spans_with_errors()
+
+    @patch.dict('os.environ', {"LLM_ENDPOINT": "http://embed"})
+    @patch('logician.embedder.http_client.post', side_effect=TimeoutError())
+    def test_embedding_fallback_counted(self, mock_post):
+        """Test falling back to local embeddings is counted"""
+        from logician.embedder import get_embedding
+        get_embedding("hello")
+        assert metrics.registry.counter("logician_fallbacks_total", stage="embed") == 1
@@ -0,0 +1,147 @@
+"""Tests for time-partitioned collections and retention."""
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from logician.ingest import ingest_files, upsert_points
+from logician.local_index import LocalIndex
+from logician.partitions import (
+    apply_retention,
+    partition_name,
+    partition_start,
+    route,
+    select_partitions,
+    time_range,
+)
+from logician.qdrant_wrapper import QdrantWrapper
+from logician.rag import RagOrchestrator
+from logician.rerank import boost
+
+DAY = 86400.0
+NOW = 1700000000.0  # 2023-11-14 22:13:20 UTC
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    LocalIndex._shared.pop(str(tmp_path), None)
+    with patch('logician.qdrant_wrapper._HAS_QDRANT', False):
+        yield QdrantWrapper()
+
+
+class TestNaming:
+    """Test partition names, ranges and routing"""
+
+    def test_name_and_start_round_trip(self):
+        """Test a partition name maps back to the start of its day or hour"""
+        assert partition_name("logs", NOW) == "logs__20231114"
+        assert partition_name("logs", NOW, "hour") == "logs__2023111422"
+        assert partition_start("logs", "logs__20231114") == NOW - (NOW % DAY)
+        assert partition_start("logs", "logs__templates") is None
+        assert partition_start("logs", "other__20231114") is None
+
+    def test_select_overlapping(self):
+        """Test only partitions overlapping the time range are selected"""
+        partitions = [("p3", 3 * DAY), ("p2", 2 * DAY), ("p1", DAY)]
+        assert select_partitions(partitions, "day", since=2.5 * DAY) == ["p3", "p2"]
+        assert select_partitions(partitions, "day", since=DAY, until=1.5 * DAY) == ["p1"]
+        assert time_range({"timestamp": {"gt": 1.0, "lte": 2.0}}) == (1.0, 2.0)
+        assert time_range({"service": "api"}) == (None, None)
+
+    def test_route_by_timestamp(self):
+        """Test lines are grouped by partition and undated ones go to now's"""
+        groups = route("logs", [{"timestamp": NOW - DAY}, {}, {"timestamp": NOW}], now=NOW)
+        assert groups == {"logs__20231113": [0], "logs__20231114": [1, 2]}
+
+
+class TestPartitionedIngest:
+    """Test writes into partitions"""
+
+    def test_upsert_points_splits_batch(self):
+        """Test each partition gets its own rows and is created on demand"""
+        qdrant = MagicMock()
+        vectors = np.eye(3, dtype=np.float32)
+        payloads = [{"timestamp": NOW}, {"timestamp": NOW - DAY}, {"timestamp": NOW}]
+        upsert_points(qdrant, "logs", ["a", "b", "c"], vectors, payloads, partition="day")
+        calls = {c[0][0]: c[0][1] for c in qdrant.upsert.call_args_list}
+        assert calls == {"logs__20231114": ["a", "c"], "logs__20231113": ["b"]}
+        assert qdrant.ensure_collection.call_count == 2
+
+    def test_ingest_quantizes_partitions_and_shards(self, tmp_path, local):
+        """Test partitions and shards created by ingest get the requested quantization"""
+        (tmp_path / "api.log").write_text("2023-11-13T10:00:00Z ERROR disk full\n"
+                                          "2023-11-14T10:00:00Z INFO request ok\n")
+        (tmp_path / "db.log").write_text("2023-11-14T11:00:00Z WARN slow query\n")
+        ingest_files([str(tmp_path / "*.log")], collection="qnt", qdrant=local, partition="day",
+                     shard_key="service", quantization="int8")
+        names = [n for n in local.list_collections() if n.startswith("qnt")]
+        assert len(names) == 3
+        assert all(local.local.get(name).quantization == "int8" for name in names)
+
+
+class TestRetention:
+    """Test dropping and compacting old partitions"""
+
+    def test_drop_and_compact(self, local):
+        """Test expired partitions are dropped and older kept ones quantized"""
+        for days in (0, 3, 10):
+            name = partition_name("ret", NOW - days * DAY)
+            local.create_collection(name, vector_size=2)
+            local.upsert(name, ["a"], [[1.0, 0.0]], [{"text": "disk full"}])
+        local.create_collection("ret_other", vector_size=2)
+
+        result = apply_retention(local, "ret", keep_days=7, compact_days=1, now=NOW)
+
+        assert result == {"dropped": ["ret__20231104"], "compacted": ["ret__20231111"]}
+        assert local.list_collections() == ["ret__20231111", "ret__20231114", "ret_other"]
+        assert local.search("ret__20231111", [1.0, 0.0])[0]["id"] == "a"
+
+
+class TestPartitionedRetrieval:
+    """Test the orchestrator only searches the partitions a query needs"""
+
+    def _rag(self, local):
+        with patch.dict('os.environ', {'RAG_PARTITION': 'day', 'RAG_PARTITION_DAYS': '7'}):
+            rag = RagOrchestrator(collection="prt")
+        rag.qdrant = local
+        rag.lexical_weight = 0
+        return rag
+
+    def _ingest(self, local, now):
+        vectors = np.array([[1.0, 0.0], [0.9, 0.1]], dtype=np.float32)
+        payloads = [{"text": "old", "timestamp": now - 30 * DAY}, {"text": "new", "timestamp": now - DAY}]
+        upsert_points(local, "prt", ["old", "new"], vectors, payloads, partition="day")
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_default_window_prunes_old_partitions(self, mock_embedding, local):
+        """Test an unfiltered query only searches the last RAG_PARTITION_DAYS"""
+        self._ingest(local, time.time())
+        rag = self._rag(local)
+        assert len(rag.search_collections()) == 1
+        assert [h["id"] for h in rag.retrieve("q", top_k=5)] == ["new"]
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_time_filter_widens_search(self, mock_embedding, local):
+        """Test a timestamp filter selects the partitions it overlaps and hits are merged"""
+        now = time.time()
+        self._ingest(local, now)
+        rag = self._rag(local)
+        hits = rag.retrieve("q", top_k=5, filters={"timestamp": {"gte": now - 40 * DAY}})
+        assert {h["id"] for h in hits} == {"old", "new"}
+
+    def test_unpartitioned_searches_collection(self):
+        """Test without RAG_PARTITION the single collection is searched"""
+        rag = RagOrchestrator(collection="plain")
+        assert rag.search_collections({"timestamp": {"gte": 0}}) == ["plain"]
+
+
+class TestBoost:
+    """Test merging partition hits with recency and severity boosts"""
+
+    def test_boost_breaks_ties(self):
+        """Test a recent error outranks an equally similar old info line"""
+        hits = [{"id": "old", "score": 0.8, "payload": {"level": "INFO", "timestamp": NOW - 10 * DAY}},
+                {"id": "new", "score": 0.8, "payload": {"level": "ERROR", "timestamp": NOW}}]
+        ranked = boost(hits, top_k=1, now=NOW)
+        assert [h["id"] for h in ranked] == ["new"]
+        assert ranked[0]["score"] == pytest.approx(0.8 + 0.1 * 0.8 + 0.1)
@@ -1,5 +1,6 @@
 """Comprehensive tests for QdrantWrapper."""
 import pytest
+import numpy as np
 from unittest.mock import patch, Mock, MagicMock
 from logician.qdrant_wrapper import QdrantWrapper
 
@@ -87,3 +88,254 @@ class TestQdrantWrapper:
         call_args = mock_client.search.call_args
         assert call_args[1]["collection_name"] == "test"
         assert call_args[1]["limit"] == 3
+
+
+class TestLocalBackend:
+    """Test the NumPy fallback when qdrant-client is missing"""
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_upsert_then_search(self):
+        """Test vectors upserted locally are searchable"""
+        wrapper = QdrantWrapper()
+        wrapper.upsert("logs", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]], [{"text": "a"}, {"text": "b"}])
+        results = wrapper.search("logs", [0.9, 0.1], top_k=1)
+        assert results[0]["payload"] == {"text": "a"}
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_ndarray_batches(self):
+        """Test float32 ndarray vectors and queries work on the local backend"""
+        wrapper = QdrantWrapper()
+        vectors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        wrapper.upsert("logs", ["a", "b"], vectors, [{"text": "a"}, {"text": "b"}])
+        results = wrapper.search("logs", np.array([0.1, 0.9], dtype=np.float32), top_k=1)
+        assert results[0]["id"] == "b"
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_ndarray_converted_at_wire_boundary(self, mock_client_class):
+        """Test ndarray vectors become plain lists for qdrant-client"""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        wrapper = QdrantWrapper()
+        wrapper.upsert("test", ["a"], np.ones((1, 4), dtype=np.float32), [{}])
+        wrapper.search("test", np.ones(4, dtype=np.float32))
+        assert mock_client.upsert.call_args[1]["points"][0]["vector"] == [1.0] * 4
+        assert mock_client.search.call_args[1]["query_vector"] == [1.0] * 4
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_create_collection_resets(self):
+        """Test create_collection recreates the local collection"""
+        wrapper = QdrantWrapper()
+        wrapper.upsert("logs", ["a"], [[1.0, 0.0]], [{}])
+        wrapper.create_collection("logs", vector_size=2)
+        assert wrapper.search("logs", [1.0, 0.0]) == []
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_with_vectors_returns_full_precision(self):
+        """Test with_vectors attaches stored unit vectors, also from a quantized collection"""
+        wrapper = QdrantWrapper()
+        wrapper.create_collection("vec_logs", vector_size=2, quantization="int8")
+        wrapper.upsert("vec_logs", ["a", "b"], [[3.0, 4.0], [0.0, 1.0]], [{}, {}])
+        hits = wrapper.search("vec_logs", [0.6, 0.8], top_k=1, with_vectors=True)
+        assert np.allclose(hits[0]["vector"], [0.6, 0.8])
+        batch = wrapper.search_batch("vec_logs", np.array([[0.0, 1.0]]), top_k=1, with_vectors=True)
+        assert np.allclose(batch[0][0]["vector"], [0.0, 1.0])
+        assert "vector" not in wrapper.search("vec_logs", [0.6, 0.8], top_k=1)[0]
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_ensure_collection_keeps_existing(self):
+        """Test ensure_collection creates a missing collection but never wipes one"""
+        wrapper = QdrantWrapper()
+        assert wrapper.ensure_collection("ensure_logs", vector_size=2) is True
+        wrapper.upsert("ensure_logs", ["a"], [[1.0, 0.0]], [{}])
+        assert wrapper.ensure_collection("ensure_logs", vector_size=2) is False
+        assert wrapper.search("ensure_logs", [1.0, 0.0])[0]["id"] == "a"
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_ensure_collection_skips_recreate(self, mock_client_class):
+        """Test ensure_collection doesn't call recreate_collection on an existing Qdrant collection"""
+        mock_client = MagicMock()
+        mock_client.collection_exists.return_value = True
+        mock_client_class.return_value = mock_client
+        assert QdrantWrapper().ensure_collection("logs") is False
+        mock_client.recreate_collection.assert_not_called()
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_persists_under_local_path(self, tmp_path, monkeypatch):
+        """Test QDRANT_LOCAL_PATH persists the index across processes"""
+        monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+        wrapper = QdrantWrapper()
+        wrapper.upsert("logs", ["a"], [[1.0, 0.0]], [{"text": "a"}])
+        wrapper.flush()
+
+        from logician.local_index import LocalIndex
+        LocalIndex._shared.clear()
+        assert QdrantWrapper().search("logs", [1.0, 0.0])[0]["payload"] == {"text": "a"}
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.SearchParams', create=True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_search_params_passed_to_qdrant(self, mock_client_class, mock_params):
+        """Test hnsw_ef and exact map to Qdrant search params"""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        QdrantWrapper().search("test", [0.1] * 4, hnsw_ef=128)
+
+        mock_params.assert_called_once_with(hnsw_ef=128, exact=False, quantization=None)
+        assert "search_params" in mock_client.search.call_args[1]
+
+
+class TestGenerations:
+    """Test collection generations are stored with the collection"""
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_local_generation_survives_restart(self, tmp_path, monkeypatch):
+        """Test a persisted local index keeps its generation in a sidecar file"""
+        monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+        wrapper = QdrantWrapper()
+        assert wrapper.generations(["logs", "other"]) == [0, 0]
+        wrapper.create_collection("logs", vector_size=4)
+        wrapper.invalidate("logs")
+        assert (tmp_path / "logs.generation").read_text() == "2"
+
+        from logician.local_index import LocalIndex
+        LocalIndex._shared.clear()
+        assert QdrantWrapper().generations(["logs", "other"]) == [2, 0]
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.VectorParams', create=True)
+    @patch('logician.qdrant_wrapper.Distance', create=True)
+    @patch('logician.qdrant_wrapper.QdrantClient', create=True)
+    def test_qdrant_generation_marker(self, mock_client_class, *models):
+        """Test Qdrant generations live in a marker collection other processes can read"""
+        client = mock_client_class.return_value
+        client.collection_exists.return_value = False
+        wrapper = QdrantWrapper()
+        assert wrapper.generations(["logs"]) == [0]
+        client.retrieve.assert_not_called()
+
+        wrapper.invalidate("logs")
+        assert client.create_collection.call_args[1]["collection_name"] == "logician_generations"
+        point = client.upsert.call_args[1]["points"][0]
+        assert point["payload"] == {"collection": "logs", "generation": 1}
+
+        client.retrieve.return_value = [Mock(payload=point["payload"])]
+        assert wrapper.generations(["other", "logs"]) == [0, 1]
+        assert client.retrieve.call_args[1]["ids"][1] == point["id"]
+        client.get_collections.return_value.collections = [Mock(), Mock()]
+        client.get_collections.return_value.collections[0].name = "logs"
+        client.get_collections.return_value.collections[1].name = "logician_generations"
+        assert wrapper.list_collections() == ["logs"]
+
+
+class TestQuantizationConfig:
+    """Test quantization settings for both backends"""
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.PayloadSchemaType', create=True)
+    @patch('logician.qdrant_wrapper.ScalarQuantization', create=True)
+    @patch('logician.qdrant_wrapper.ScalarQuantizationConfig', create=True)
+    @patch('logician.qdrant_wrapper.ScalarType', create=True)
+    @patch('logician.qdrant_wrapper.VectorParams', create=True)
+    @patch('logician.qdrant_wrapper.Distance', create=True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_int8_maps_to_scalar_quantization(self, mock_client_class, *models):
+        """Test int8 becomes Qdrant's scalar quantization config"""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        QdrantWrapper().create_collection("logs", vector_size=64, quantization="int8")
+
+        assert "quantization_config" in mock_client.recreate_collection.call_args[1]
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.PayloadSchemaType', create=True)
+    @patch('logician.qdrant_wrapper.Datatype', create=True)
+    @patch('logician.qdrant_wrapper.VectorParams', create=True)
+    @patch('logician.qdrant_wrapper.Distance', create=True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_float16_falls_back_without_datatype(self, mock_client_class, mock_distance, mock_params,
+                                                 mock_datatype, mock_schema, caplog):
+        """Test a qdrant-client without Datatype.FLOAT16 stores float32 with a warning"""
+        del mock_datatype.FLOAT16
+        QdrantWrapper().create_collection("logs", vector_size=64, quantization="float16")
+        assert "datatype" not in mock_params.call_args[1]
+        assert "float16" in caplog.text
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_local_collection_quantized(self):
+        """Test the local backend stores the requested quantization"""
+        wrapper = QdrantWrapper()
+        wrapper.create_collection("logs", vector_size=4, quantization="float16")
+        assert wrapper.local.get("logs").quantization == "float16"
+        wrapper.upsert("logs", ["a"], [[1.0, 0.0, 0.0, 0.0]], [{"text": "a"}])
+        assert wrapper.local.get("logs").quantization == "float16"
+
+
+class TestPayloadFilters:
+    """Test filter pushdown and payload indexes"""
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.to_qdrant_filter')
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_filters_pushed_to_qdrant(self, mock_client_class, mock_to_filter):
+        """Test filters become Qdrant's query_filter"""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        filters = {"service": "api", "timestamp": {"gte": 100.0}}
+        QdrantWrapper().search("logs", [0.1] * 4, filters=filters)
+        mock_to_filter.assert_called_once_with(filters)
+        assert mock_client.search.call_args[1]["query_filter"] is mock_to_filter.return_value
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.PayloadSchemaType', create=True)
+    @patch('logician.qdrant_wrapper.VectorParams', create=True)
+    @patch('logician.qdrant_wrapper.Distance', create=True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_create_collection_indexes_payload(self, mock_client_class, *models):
+        """Test create_collection creates the filterable payload indexes"""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        QdrantWrapper().create_collection("logs", vector_size=4)
+        fields = {c[1]["field_name"] for c in mock_client.create_payload_index.call_args_list}
+        assert {"service", "host", "level", "timestamp"} <= fields
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_local_filters(self):
+        """Test the local backend only returns matching payloads"""
+        wrapper = QdrantWrapper()
+        payloads = [
+            {"text": "a", "service": "api", "level": "ERROR", "timestamp": 100.0},
+            {"text": "b", "service": "api", "level": "INFO", "timestamp": 200.0},
+            {"text": "c", "service": "db", "level": "ERROR", "timestamp": 300.0},
+        ]
+        wrapper.upsert("logs", ["a", "b", "c"], np.ones((3, 2), dtype=np.float32), payloads)
+        ids = lambda f: sorted(h["id"] for h in wrapper.search("logs", [1.0, 1.0], top_k=5, filters=f))
+        assert ids({"service": "api"}) == ["a", "b"]
+        assert ids({"level": ["ERROR", "FATAL"], "timestamp": {"gte": 150.0}}) == ["c"]
+        assert ids({"service": "web"}) == []
+        assert ids({"text": "b"}) == ["b"]
+        assert sorted(h["id"] for h in wrapper.lexical_search("logs", "a b c", filters={"service": "db"})) == ["c"]
+
+
+class TestSearchBatch:
+    """Test batched search"""
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', True)
+    @patch('logician.qdrant_wrapper.SearchRequest', create=True)
+    @patch('logician.qdrant_wrapper.QdrantClient')
+    def test_single_search_batch_call(self, mock_client_class, mock_request):
+        """Test queries go to Qdrant in one search_batch request"""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        QdrantWrapper().search_batch("logs", np.ones((3, 4), dtype=np.float32), top_k=2)
+        mock_client.search_batch.assert_called_once()
+        assert len(mock_client.search_batch.call_args[1]["requests"]) == 3
+        assert mock_request.call_args[1]["limit"] == 2
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_local_missing_collection(self):
+        """Test a missing local collection gives one empty list per query"""
+        assert QdrantWrapper().search_batch("nope", np.ones((2, 4))) == [[], []]
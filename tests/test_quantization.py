@@ -0,0 +1,104 @@
+"""Tests for quantized vector storage."""
+import numpy as np
+import pytest
+from logician.ann import clustered_vectors
+from logician.local_index import LocalCollection, LocalIndex, normalize
+from logician.quantization import make_quantizer
+
+
+def _unit(n, dim=32, seed=0):
+    return normalize(clustered_vectors(n, dim, clusters=40, seed=seed))
+
+
+class TestQuantizers:
+    """Test encode/decode and scoring"""
+
+    @pytest.mark.parametrize("kind,tol", [("float16", 1e-3), ("int8", 2e-2)])
+    def test_scalar_scores_close_to_float32(self, kind, tol):
+        """Test scalar quantized scores track float32 dot products"""
+        x = _unit(200)
+        q = x[0]
+        quantizer = make_quantizer(kind, 32)
+        codes = quantizer.encode(x)
+        assert codes.dtype == quantizer.dtype
+        np.testing.assert_allclose(quantizer.scores(codes, q), x @ q, atol=tol)
+
+    def test_pq_compresses_and_ranks(self):
+        """Test PQ codes are one byte per subspace and keep the nearest neighbour on top"""
+        x = _unit(3000)
+        quantizer = make_quantizer("pq", 32, m=8)
+        quantizer.fit(x)
+        codes = quantizer.encode(x)
+        assert codes.shape == (3000, 8)
+        assert codes.dtype == np.uint8
+        top = np.argsort(-quantizer.scores(codes, x[5]))[:5]
+        assert 5 in top
+
+    def test_pq_rejects_indivisible_dim(self):
+        """Test PQ needs dim divisible by m"""
+        with pytest.raises(ValueError):
+            make_quantizer("pq", 30, m=8)
+
+    def test_unknown_kind(self):
+        """Test unknown quantization names are rejected"""
+        with pytest.raises(ValueError):
+            make_quantizer("int4", 32)
+
+
+class TestQuantizedCollection:
+    """Test local collections with quantization"""
+
+    @pytest.mark.parametrize("kind", ["float16", "int8"])
+    def test_memory_shrinks_without_rescore(self, kind):
+        """Test quantized storage is smaller than float32"""
+        x = _unit(1000)
+        plain = LocalCollection(32, ann_threshold=0)
+        plain.upsert(list(range(1000)), x, [{}] * 1000)
+        compact = LocalCollection(32, ann_threshold=0, quantization=kind, rescore=False)
+        compact.upsert(list(range(1000)), x, [{}] * 1000)
+        ratio = {"float16": 2, "int8": 4}[kind]
+        assert compact.memory_bytes() * ratio == plain.memory_bytes()
+        assert compact.search(x[3], top_k=1)[0]["id"] == 3
+
+    def test_rescore_returns_exact_scores(self):
+        """Test rescoring reports full-precision scores"""
+        x = _unit(1000)
+        coll = LocalCollection(32, ann_threshold=0, quantization="int8", rescore=True)
+        coll.upsert(list(range(1000)), x, [{}] * 1000)
+        hits = coll.search(x[7], top_k=3)
+        assert hits[0]["id"] == 7
+        assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+    def test_pq_trains_after_enough_vectors(self):
+        """Test PQ collections train once pq_train_size vectors arrive"""
+        x = _unit(600)
+        coll = LocalCollection(32, ann_threshold=0, quantization="pq", rescore=False, pq_train_size=500)
+        coll.upsert(list(range(300)), x[:300], [{}] * 300)
+        assert coll._codes is None
+        coll.upsert(list(range(300, 600)), x[300:], [{}] * 300)
+        assert coll._codes is not None and coll._vectors is None
+        assert coll.memory_bytes() == 600 * 16
+        assert 9 in [h["id"] for h in coll.search(x[9], top_k=5)]
+
+    def test_quantize_existing_collection_with_ann(self):
+        """Test quantizing after ingest works with the IVF index"""
+        x = _unit(2000)
+        coll = LocalCollection(32, ann_threshold=0)
+        coll.upsert(list(range(2000)), x, [{}] * 2000)
+        coll.build_ann(nlist=16, nprobe=4)
+        coll.quantize("int8")
+        assert coll.search(x[11], top_k=1)[0]["id"] == 11
+
+    def test_persist_quantized(self, tmp_path):
+        """Test codes and quantizer state survive flush and reload"""
+        x = _unit(600)
+        index = LocalIndex(str(tmp_path))
+        coll = index.create_collection("logs", 32, ann_threshold=0, quantization="pq", rescore=False,
+                                       pq_train_size=500)
+        coll.upsert(list(range(600)), x, [{}] * 600)
+        index.flush()
+
+        reloaded = LocalIndex(str(tmp_path)).get("logs")
+        assert reloaded.quantization == "pq"
+        assert reloaded._vectors is None
+        assert 4 in [h["id"] for h in reloaded.search(x[4], top_k=5)]
@@ -1,7 +1,14 @@
 """Comprehensive tests for RAG orchestrator."""
+import os
+import subprocess
+import sys
 import pytest
 from unittest.mock import patch, Mock, MagicMock
+import numpy as np
+from logician.answer_cache import SemanticAnswerCache
+from logician.embedder import get_embeddings
 from logician.rag import RagOrchestrator
+from logician.rerank import Reranker
 
 
 class TestRagOrchestrator:
@@ -19,8 +26,8 @@ class TestRagOrchestrator:
         assert rag.collection == "custom_logs"
     
     @patch('logician.rag.get_embedding')
-    @patch.object(RagOrchestrator, '__init__', lambda self, collection="log_entries": setattr(self, 'collection', collection) or setattr(self, 'qdrant', MagicMock()) or setattr(self, 'llm_endpoint', None) or setattr(self, 'llm_api_key', None))
-    def test_retrieve_no_hits(self, mock_embedding):
+    @patch('logician.rag.QdrantWrapper')
+    def test_retrieve_no_hits(self, mock_wrapper, mock_embedding):
         """Test retrieve with no search hits"""
         mock_embedding.return_value = [0.1] * 128
         
@@ -31,8 +38,8 @@ class TestRagOrchestrator:
         assert hits == []
     
     @patch('logician.rag.get_embedding')
-    @patch.object(RagOrchestrator, '__init__', lambda self, collection="log_entries": setattr(self, 'collection', collection) or setattr(self, 'qdrant', MagicMock()) or setattr(self, 'llm_endpoint', None) or setattr(self, 'llm_api_key', None))
-    def test_retrieve_with_hits(self, mock_embedding):
+    @patch('logician.rag.QdrantWrapper')
+    def test_retrieve_with_hits(self, mock_wrapper, mock_embedding):
         """Test retrieve with search hits"""
         mock_embedding.return_value = [0.1] * 128
         mock_hits = [
@@ -56,7 +63,7 @@ class TestRagOrchestrator:
         assert "test prompt" in result or "test prompt"[:200] in result
     
     @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
-    @patch('logician.rag.requests.post')
+    @patch('logician.http_client.requests.Session.post')
     def test_call_llm_with_endpoint_success(self, mock_post):
         """Test call_llm with successful LLM endpoint"""
         mock_response = Mock()
@@ -71,7 +78,7 @@ class TestRagOrchestrator:
         mock_post.assert_called_once()
     
     @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080', 'LLM_API_KEY': 'test-key'})
-    @patch('logician.rag.requests.post')
+    @patch('logician.http_client.requests.Session.post')
     def test_call_llm_with_api_key(self, mock_post):
         """Test call_llm with API key"""
         mock_response = Mock()
@@ -86,7 +93,7 @@ class TestRagOrchestrator:
         assert "Authorization" in call_kwargs["headers"]
     
     @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
-    @patch('logician.rag.requests.post')
+    @patch('logician.http_client.requests.Session.post')
     def test_call_llm_with_endpoint_failure(self, mock_post):
         """Test call_llm fallback when endpoint fails"""
         mock_post.side_effect = Exception("Connection failed")
@@ -97,8 +104,8 @@ class TestRagOrchestrator:
         assert "[LLM placeholder]" in result
     
     @patch('logician.rag.get_embedding')
-    @patch.object(RagOrchestrator, '__init__', lambda self, collection="log_entries": setattr(self, 'collection', collection) or setattr(self, 'qdrant', MagicMock()) or setattr(self, 'llm_endpoint', None) or setattr(self, 'llm_api_key', None))
-    def test_answer_integration(self, mock_embedding):
+    @patch('logician.rag.QdrantWrapper')
+    def test_answer_integration(self, mock_wrapper, mock_embedding):
         """Test answer method integration"""
         mock_embedding.return_value = [0.1] * 128
         mock_hits = [{"payload": {"text": "context 1"}}]
@@ -112,8 +119,8 @@ class TestRagOrchestrator:
         assert len(answer) > 0
     
     @patch('logician.rag.get_embedding')
-    @patch.object(RagOrchestrator, '__init__', lambda self, collection="log_entries": setattr(self, 'collection', collection) or setattr(self, 'qdrant', MagicMock()) or setattr(self, 'llm_endpoint', None) or setattr(self, 'llm_api_key', None))
-    def test_answer_with_dict_hits(self, mock_embedding):
+    @patch('logician.rag.QdrantWrapper')
+    def test_answer_with_dict_hits(self, mock_wrapper, mock_embedding):
         """Test answer with dictionary hits"""
         mock_embedding.return_value = [0.1] * 128
         mock_hits = [
@@ -128,8 +135,8 @@ class TestRagOrchestrator:
         assert "[LLM placeholder]" in answer
     
     @patch('logician.rag.get_embedding')
-    @patch.object(RagOrchestrator, '__init__', lambda self, collection="log_entries": setattr(self, 'collection', collection) or setattr(self, 'qdrant', MagicMock()) or setattr(self, 'llm_endpoint', None) or setattr(self, 'llm_api_key', None))
-    def test_answer_with_empty_hits(self, mock_embedding):
+    @patch('logician.rag.QdrantWrapper')
+    def test_answer_with_empty_hits(self, mock_wrapper, mock_embedding):
         """Test answer with no hits"""
         mock_embedding.return_value = [0.1] * 128
         
@@ -138,3 +145,291 @@ class TestRagOrchestrator:
         
         answer = rag.answer("test query")
         assert isinstance(answer, str)
+
+
+class TestStreaming:
+    """Test streamed generation"""
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_stream_llm_yields_ndjson_tokens(self, mock_post):
+        """Test tokens are yielded from NDJSON chunks until done"""
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = [
+            b'{"response": "Hel", "done": false}',
+            b'',
+            b'{"response": "lo", "done": false}',
+            b'{"response": "", "done": true}',
+            b'{"response": "ignored"}',
+        ]
+        mock_post.return_value = mock_response
+
+        rag = RagOrchestrator()
+        tokens = list(rag.stream_llm("prompt"))
+
+        assert tokens == ["Hel", "lo"]
+        call_kwargs = mock_post.call_args[1]
+        assert call_kwargs["stream"] is True
+        assert call_kwargs["json"]["stream"] is True
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_stream_llm_failure_fallback(self, mock_post):
+        """Test the placeholder is streamed when the endpoint fails"""
+        mock_post.side_effect = Exception("Connection failed")
+
+        rag = RagOrchestrator()
+        tokens = list(rag.stream_llm("prompt"))
+
+        assert len(tokens) == 1
+        assert "[LLM placeholder]" in tokens[0]
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    def test_stream_llm_midstream_failure_stops(self, mock_post):
+        """Test a failure after the first token ends the stream without a placeholder"""
+        def lines():
+            yield b'{"response": "partial"}'
+            raise ConnectionError("reset")
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = lines()
+        mock_post.return_value = mock_response
+
+        rag = RagOrchestrator()
+        assert list(rag.stream_llm("prompt")) == ["partial"]
+
+    @patch('logician.rag.get_embedding')
+    @patch('logician.rag.QdrantWrapper')
+    def test_stream_answer(self, mock_wrapper, mock_embedding):
+        """Test stream_answer retrieves then streams"""
+        mock_embedding.return_value = [0.1] * 128
+        rag = RagOrchestrator()
+        rag.qdrant.search = Mock(return_value=[{"payload": {"text": "ctx"}}])
+
+        assert "ctx" in "".join(rag.stream_answer("query"))
+
+
+class TestAnswerMany:
+    """Test batched multi-query answering"""
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    @patch('logician.rag.get_embeddings')
+    def test_one_embed_batch_and_search_batch(self, mock_embeddings):
+        """Test all queries share one embedding call and one batch search, in order"""
+        import numpy as np
+        mock_embeddings.return_value = np.eye(3, dtype=np.float32)
+        rag = RagOrchestrator()
+        rag.qdrant.upsert(rag.collection, ["a", "b", "c"], np.eye(3, dtype=np.float32),
+                          [{"text": "alpha"}, {"text": "beta"}, {"text": "gamma"}])
+        rag.qdrant.search = Mock(side_effect=AssertionError("searched one by one"))
+
+        answers = rag.answer_many(["q0", "q1", "q2"])
+
+        mock_embeddings.assert_called_once()
+        assert ["alpha" in answers[0], "beta" in answers[1], "gamma" in answers[2]] == [True] * 3
+
+    def test_failures_isolated_and_concurrency_bounded(self):
+        """Test one failing query doesn't affect the rest and calls stay under the limit"""
+        import threading
+        import time
+        rag = RagOrchestrator()
+        rag.retrieve_many = Mock(return_value=[[]] * 6)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def call_llm(prompt):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            if "q3" in prompt:
+                raise RuntimeError("boom")
+            return prompt.split("\n")[1]
+
+        rag.call_llm = call_llm
+        answers = rag.answer_many([f"q{i}" for i in range(6)], max_concurrency=2)
+
+        assert answers[:3] == ["q0", "q1", "q2"] and answers[4:] == ["q4", "q5"]
+        assert isinstance(answers[3], RuntimeError)
+        assert peak[0] <= 2
+
+    def test_batch_retrieval_failure_falls_back(self):
+        """Test a failed batch retrieval retries each query alone"""
+        rag = RagOrchestrator()
+        rag.retrieve_many = Mock(side_effect=RuntimeError("down"))
+        rag.retrieve = Mock(return_value=[])
+        assert len(rag.answer_many(["a", "b"])) == 2
+        assert rag.retrieve.call_count == 2
+
+
+class TestAnswerCache:
+    """Test the semantic answer cache in answer/stream_answer"""
+
+    def make_rag(self):
+        rag = RagOrchestrator(collection="cache_test")
+        rag.answer_cache = SemanticAnswerCache()
+        rag.retrieve = Mock(return_value=[{"id": "1", "payload": {"text": "disk full"}}])
+        return rag
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_repeated_query_skips_retrieval_and_llm(self, mock_embedding):
+        """Test a repeated question is answered from the cache"""
+        rag = self.make_rag()
+        rag.call_llm = Mock(return_value="the disk is full")
+        assert rag.answer("why did api fail") == "the disk is full"
+        assert rag.answer("why did api fail") == "the disk is full"
+        assert rag.call_llm.call_count == 1
+        assert rag.retrieve.call_count == 1
+        assert rag.answer_cache.stats()["hits"] == 1
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_reingest_invalidates(self, mock_embedding):
+        """Test recreating the collection makes cached answers stale"""
+        rag = self.make_rag()
+        rag.call_llm = Mock(side_effect=["first", "second"])
+        rag.answer("why did api fail")
+        rag.qdrant.invalidate("cache_test")
+        assert rag.answer("why did api fail") == "second"
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_reingest_in_another_process_invalidates(self, mock_embedding, tmp_path, monkeypatch):
+        """Test an ingest in a separate process makes a persisted collection's cached answers stale"""
+        monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+        rag = self.make_rag()
+        rag.call_llm = Mock(side_effect=["first", "second"])
+        rag.answer("why did api fail")
+        code = "from logician.qdrant_wrapper import QdrantWrapper; QdrantWrapper().invalidate('cache_test')"
+        subprocess.run([sys.executable, "-c", code], env=dict(os.environ, QDRANT_BACKEND="local"), check=True)
+        assert rag.answer("why did api fail") == "second"
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_placeholder_not_cached_and_stream_uses_cache(self, mock_embedding):
+        """Test fallback answers aren't cached and streamed answers are"""
+        rag = self.make_rag()
+        rag.call_llm = Mock(return_value="[LLM placeholder] nothing")
+        rag.answer("q")
+        assert len(rag.answer_cache) == 0
+
+        def stream(prompt, status=None):
+            yield "disk "
+            yield "full"
+            status["complete"] = True
+
+        rag.stream_llm = Mock(side_effect=stream)
+        assert list(rag.stream_answer("q")) == ["disk ", "full"]
+        assert list(rag.stream_answer("q")) == ["disk full"]
+        assert rag.stream_llm.call_count == 1
+
+    @patch.dict('os.environ', {'LLM_ENDPOINT': 'http://localhost:8080'})
+    @patch('logician.http_client.requests.Session.post')
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_cut_off_stream_not_cached(self, mock_embedding, mock_post):
+        """Test a stream that fails midway isn't served later as the full answer"""
+        def lines():
+            yield b'{"response": "The checkout "}'
+            raise ConnectionError("reset")
+        mock_post.return_value = MagicMock(iter_lines=MagicMock(side_effect=lambda: lines()))
+        rag = self.make_rag()
+        assert list(rag.stream_answer("why did checkout fail")) == ["The checkout "]
+        assert len(rag.answer_cache) == 0
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_query_embedded_once(self, mock_embedding):
+        """Test the cache lookup's embedding is reused for retrieval"""
+        rag = RagOrchestrator(collection="cache_test")
+        rag.answer_cache = SemanticAnswerCache()
+        rag.lexical_weight = 0
+        rag.qdrant = MagicMock()
+        rag.qdrant.search.return_value = []
+        rag.answer("why did api fail")
+        assert mock_embedding.call_count == 1
+        assert rag.qdrant.search.call_args[0][1] is mock_embedding.return_value
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_numbers_must_match(self, mock_embedding):
+        """Test queries that differ only in a number don't share answers"""
+        rag = self.make_rag()
+        rag.call_llm = Mock(side_effect=["about 500s", "about 404s"])
+        assert rag.answer("why are we getting 500s") == "about 500s"
+        assert rag.answer("why are we getting 404s") == "about 404s"
+        assert rag.answer("why are we getting 500s") == "about 500s"
+
+    @patch('logician.rag.get_embeddings', return_value=np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32))
+    def test_answer_many_uses_cache(self, mock_embeddings):
+        """Test answer_many serves cached answers and caches the rest"""
+        rag = self.make_rag()
+        rag.retrieve_many = Mock(return_value=[[]])
+        rag.call_llm = Mock(return_value="fresh")
+        name, generation = rag.cache_scope()
+        rag.answer_cache.put(np.array([1.0, 0.0]), "cached", name, generation=generation)
+        assert rag.answer_many(["a", "b"]) == ["cached", "fresh"]
+        assert rag.retrieve_many.call_args[0][0] == ["b"]
+        np.testing.assert_array_equal(rag.retrieve_many.call_args[0][3], [[0.0, 1.0]])
+        assert len(rag.answer_cache) == 2
+
+    @patch('logician.rag.get_embeddings', return_value=np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32))
+    def test_answer_many_embeds_once(self, mock_embeddings):
+        """Test retrieval for cache misses reuses the lookup's embeddings"""
+        rag = self.make_rag()
+        rag.lexical_weight = 0
+        rag.qdrant = MagicMock()
+        rag.qdrant.search_batch.return_value = [[], []]
+        rag.call_llm = Mock(return_value="fresh")
+        assert rag.answer_many(["a", "b"]) == ["fresh", "fresh"]
+        assert mock_embeddings.call_count == 1
+
+
+class TestBuildPrompt:
+    """Test budgeted prompt context"""
+
+    def test_large_payloads_fit_budget(self):
+        """Test big payloads are compacted and cut to context_tokens"""
+        rag = RagOrchestrator()
+        rag.context_tokens = 50
+        hits = [{"payload": {"text": "oom killed worker " + "x" * 4000, "samples": list(range(500))}},
+                {"payload": {"text": "unrelated"}}]
+        prompt = rag.build_prompt("why", hits)
+        assert "samples" not in prompt
+        assert len(prompt) < 400
+        assert "oom killed worker" in prompt
+
+
+class TestTwoStageRetrieval:
+    """Test over-fetch plus local re-ranking"""
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_overfetches_with_vectors_and_keeps_top_k(self, mock_embedding):
+        """Test the first stage over-fetches without rescoring and only top_k go forward"""
+        rag = RagOrchestrator()
+        rag.reranker = Reranker(fetch=100, lexical=0, recency=0, severity=0)
+        rag.lexical_weight = 0
+        rag.qdrant = MagicMock()
+        rag.qdrant.search.return_value = [
+            {"id": str(i), "score": 1.0 - i / 10, "payload": {"text": str(i)}, "vector": [1.0 - i / 10, i / 10]}
+            for i in range(10)
+        ][::-1]
+
+        hits = rag.retrieve("why", top_k=3)
+
+        kwargs = rag.qdrant.search.call_args[1]
+        assert kwargs["top_k"] == 100
+        assert kwargs["with_vectors"] is True and kwargs["rescore"] is False
+        assert [h["id"] for h in hits] == ["0", "1", "2"]
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_lexical_hits_join_candidates_and_batch_matches(self):
+        """Test BM25 hits are re-ranked with the dense ones, in retrieve and retrieve_many alike"""
+        rag = RagOrchestrator(collection="rerank_test")
+        rag.reranker = Reranker(fetch=20)
+        texts = ["ERROR payment gateway timeout", "INFO request served", "WARN slow query",
+                 "INFO cache warmed", "ERROR disk full on db-1"]
+        rag.qdrant.create_collection("rerank_test", vector_size=128)
+        rag.qdrant.upsert("rerank_test", [str(i) for i in range(len(texts))],
+                          get_embeddings(texts, as_array=True), [{"text": t} for t in texts])
+
+        hits = rag.retrieve("payment timeout", top_k=2)
+        assert hits[0]["payload"]["text"] == "ERROR payment gateway timeout"
+        assert len(hits) == 2
+        assert rag.retrieve_many(["payment timeout"], top_k=2) == [hits]
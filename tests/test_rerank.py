@@ -0,0 +1,98 @@
+"""Tests for the second-stage re-ranker."""
+import numpy as np
+import pytest
+from unittest.mock import patch
+from logician import metrics
+from logician.rerank import (
+    Reranker,
+    cosine_scores,
+    from_env,
+    lexical_overlap,
+    recency_scores,
+    severity_scores,
+)
+
+
+def _hit(pid, vector=None, score=0.0, **payload):
+    hit = {"id": pid, "score": score, "payload": payload}
+    if vector is not None:
+        hit["vector"] = np.asarray(vector, dtype=np.float32)
+    return hit
+
+
+class TestFeatures:
+    """Test the vectorised feature functions"""
+
+    def test_cosine_marks_missing_vectors(self):
+        """Test candidates without a (matching) vector score NaN"""
+        scores = cosine_scores([1.0, 0.0], [[2.0, 0.0], None, [0.0, 3.0], [1.0, 0.0, 0.0]])
+        assert scores[0] == 1.0 and scores[2] == 0.0
+        assert np.isnan(scores[1]) and np.isnan(scores[3])
+
+    def test_lexical_overlap(self):
+        """Test overlap is the share of distinct query tokens in each text"""
+        overlap = lexical_overlap("disk full disk", ["Disk is FULL", "disk ok", "nothing"])
+        assert overlap.tolist() == [1.0, 0.5, 0.0]
+
+    def test_recency_halves_per_half_life(self):
+        """Test recency decays by half each half-life and is 0 when unknown"""
+        scores = recency_scores(np.array([100.0, 90.0, np.nan, 200.0]), now=100.0, half_life=10.0)
+        assert scores.tolist() == [1.0, 0.5, 0.0, 1.0]
+
+    def test_severity(self):
+        """Test level weights, case-insensitive, with unknown levels at 0"""
+        assert severity_scores(["FATAL", "error", None, "chatty"]).tolist() == pytest.approx([1.0, 0.8, 0.0, 0.0])
+
+
+class TestReranker:
+    """Test candidate re-ranking"""
+
+    def test_exact_cosine_reorders_first_stage(self):
+        """Test exact vectors override the (quantized) first-stage order"""
+        reranker = Reranker(lexical=0, recency=0, severity=0)
+        candidates = [_hit("a", [0.6, 0.8], score=0.99), _hit("b", [1.0, 0.0], score=0.5)]
+        ranked = reranker.rerank("q", [1.0, 0.0], candidates, top_k=1)
+        assert [h["id"] for h in ranked] == ["b"]
+        assert ranked[0]["score"] == 1.0
+
+    def test_boosts_break_near_ties(self):
+        """Test severity, recency and lexical overlap lift the better line"""
+        reranker = Reranker(lexical=0.3, recency=0.1, severity=0.1, half_life=60)
+        candidates = [
+            _hit("old-info", [1.0, 0.0], text="request ok", level="INFO", timestamp=0.0),
+            _hit("new-error", [0.99, 0.1], text="payment timeout", level="ERROR", timestamp=1000.0),
+        ]
+        ranked = reranker.rerank("payment timeout", [1.0, 0.0], candidates, top_k=2, now=1000.0)
+        assert [h["id"] for h in ranked] == ["new-error", "old-info"]
+        assert "vector" not in ranked[0]
+
+    def test_lexical_only_candidates_get_lowest_cosine(self):
+        """Test a candidate without a vector is placed by its other features"""
+        reranker = Reranker(lexical=1.5, recency=0, severity=0)
+        candidates = [_hit("a", [1.0, 0.0], text="x"), _hit("b", [0.0, 1.0], text="y"),
+                      _hit("lex", None, text="disk full")]
+        ranked = reranker.rerank("disk full", [1.0, 0.0], candidates, top_k=3)
+        assert [h["id"] for h in ranked] == ["lex", "a", "b"]
+        assert ranked[0]["score"] == 1.5
+
+    def test_no_vectors_uses_first_stage_scores(self):
+        """Test the first-stage score is the dense feature when no vectors came back"""
+        reranker = Reranker(lexical=0, recency=0, severity=0)
+        ranked = reranker.rerank("q", [1.0, 0.0], [_hit("a", score=0.2), _hit("b", score=0.9)], top_k=2)
+        assert [h["id"] for h in ranked] == ["b", "a"]
+
+    def test_budget_skips_remaining_features(self):
+        """Test an exhausted budget falls back to cosine order and is counted"""
+        reranker = Reranker(lexical=10.0, recency=0, severity=0, budget_ms=0)
+        candidates = [_hit("a", [1.0, 0.0], text="x"), _hit("b", [0.9, 0.1], text="disk full")]
+        ranked = reranker.rerank("disk full", [1.0, 0.0], candidates, top_k=2)
+        assert [h["id"] for h in ranked] == ["a", "b"]
+        assert metrics.registry.counter("logician_fallbacks_total", stage="rerank") == 1
+
+    def test_from_env(self):
+        """Test RAG_RERANK_FETCH enables the re-ranker"""
+        assert from_env() is None
+        with patch.dict('os.environ', {'RAG_RERANK_FETCH': '50', 'RAG_SEVERITY_WEIGHT': '0.5'}):
+            reranker = from_env()
+        assert reranker.fetch == 50
+        assert reranker.weights["severity"] == 0.5
@@ -0,0 +1,129 @@
+"""Tests for the serve daemon and its thin client."""
+import threading
+import pytest
+from unittest.mock import Mock
+from logician.cli import main
+from logician.client import LogicianClient, ServerError
+from logician.metrics import span
+from logician.server import LogicianServer
+
+
+def fake_orchestrator():
+    def answer(query, filters=None):
+        with span("llm"):
+            return f"answer to {query} {filters or ''}".strip()
+
+    def answer_many(queries, filters=None, max_concurrency=None):
+        return [f"answer to {q}" for q in queries]
+
+    return Mock(collection="logs", answer_cache=None, answer=Mock(side_effect=answer),
+                stream_answer=Mock(side_effect=lambda q, filters=None: iter(["a", "b"])),
+                answer_many=Mock(side_effect=answer_many))
+
+
+@pytest.fixture
+def running():
+    started = []
+
+    def start(socket_path=None, **kwargs):
+        server = LogicianServer(fake_orchestrator(), **kwargs)
+        httpd = server.make_server("127.0.0.1", 0, socket_path=socket_path)
+        server._httpd = httpd
+        threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+        started.append(httpd)
+        address = f"unix:{socket_path}" if socket_path else "http://127.0.0.1:%d" % httpd.server_address[1]
+        return server, address
+
+    yield start
+    for httpd in started:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+class TestServer:
+    """Test the JSON endpoints"""
+
+    def test_answer_health_stats_metrics(self, running):
+        """Test answers over one kept-alive connection plus the status endpoints"""
+        server, address = running()
+        client = LogicianClient(address)
+        assert client.health() == {"status": "ok"}
+        assert client.answer("why")["answer"] == "answer to why"
+        assert client.answer("why", service="api")["answer"] == "answer to why {'service': 'api'}"
+        assert client.answer_many(["a", "b"]) == ["answer to a", "answer to b"]
+        assert client.stats()["collection"] == "logs"
+        client.close()
+        metrics_text = LogicianClient(address)._request("GET", "/metrics").read().decode()
+        assert 'logician_stage_seconds_count{stage="llm"}' in metrics_text
+
+    def test_stream_and_trace(self, running):
+        """Test streamed tokens and a returned trace"""
+        server, address = running()
+        chunks = list(LogicianClient(address).stream_answer("why", trace=True))
+        assert [c["token"] for c in chunks if "token" in c] == ["a", "b"]
+        assert chunks[-1]["done"] is True and "total" in chunks[-1]["trace"]
+        assert "llm" in LogicianClient(address).answer("why", trace=True)["trace"]
+
+    def test_bad_requests(self, running):
+        """Test invalid requests get 4xx errors"""
+        server, address = running()
+        client = LogicianClient(address)
+        with pytest.raises(ServerError, match="400: missing query"):
+            client.answer("")
+        with pytest.raises(ServerError, match="400: invalid duration"):
+            client.answer("why", since="soon")
+        with pytest.raises(ServerError, match="400: queries must be"):
+            client._json("POST", "/answer_many", {"queries": "not a list"})
+
+    def test_concurrency_limit(self, running):
+        """Test requests beyond max_concurrency get 503 after the queue timeout"""
+        server, address = running(max_concurrency=1, queue_timeout=0.05)
+        release = threading.Event()
+        server.orchestrator.answer = Mock(side_effect=lambda q, filters=None: release.wait(5) and "slow")
+        first = threading.Thread(target=lambda: LogicianClient(address).answer("slow"))
+        first.start()
+        while server._slots._value:
+            pass
+        with pytest.raises(ServerError, match="503"):
+            LogicianClient(address).answer("fast")
+        release.set()
+        first.join()
+
+    def test_batch_fan_out_holds_slots(self, running):
+        """Test a batch runs on at most the free slots and holds them while it runs"""
+        server, address = running(max_concurrency=3, queue_timeout=0.05)
+        seen = []
+        server.orchestrator.answer_many.side_effect = lambda qs, filters=None, max_concurrency=None: (
+            seen.append((max_concurrency, server._slots._value)) or ["x"] * len(qs))
+        assert LogicianClient(address).answer_many(["a", "b"]) == ["x", "x"]
+        assert LogicianClient(address).answer_many(["a", "b", "c", "d"]) == ["x"] * 4
+        assert seen == [(2, 1), (3, 0)]
+        assert server._slots._value == 3
+
+    def test_unix_socket(self, running, tmp_path):
+        """Test serving over a Unix socket"""
+        server, address = running(socket_path=str(tmp_path / "logician.sock"))
+        assert LogicianClient(address).answer("why")["answer"] == "answer to why"
+
+
+class TestThinClientCLI:
+    """Test `logician --server`"""
+
+    def test_cli_uses_server(self, running, capsys):
+        """Test the CLI prints the server's answer and trace"""
+        server, address = running()
+        assert main(["why", "--server", address, "--level", "error", "--trace"]) == 0
+        out = capsys.readouterr()
+        assert out.out.strip() == "answer to why {'level': 'ERROR'}"
+        assert "llm" in out.err
+
+    def test_cli_stream_via_server(self, running, capsys):
+        """Test --stream prints tokens from the server"""
+        server, address = running()
+        main(["why", "--server", address, "--stream"])
+        assert capsys.readouterr().out == "ab\n"
+
+    def test_cli_server_down(self, capsys):
+        """Test an unreachable server is reported, not a traceback"""
+        assert main(["why", "--server", "http://127.0.0.1:1"]) == 1
+        assert "server http://127.0.0.1:1" in capsys.readouterr().err
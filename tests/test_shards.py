@@ -0,0 +1,134 @@
+"""Tests for key-sharded collections and scatter-gather search."""
+import threading
+import time
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from logician import metrics
+from logician.ingest import upsert_points
+from logician.local_index import LocalIndex
+from logician.qdrant_wrapper import QdrantWrapper
+from logician.rag import RagOrchestrator
+from logician.shards import route_by_key, scatter, select_shards, shard_name, shard_of
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    LocalIndex._shared.pop(str(tmp_path), None)
+    with patch('logician.qdrant_wrapper._HAS_QDRANT', False):
+        yield QdrantWrapper()
+
+
+class TestNaming:
+    """Test shard names, selection and routing"""
+
+    def test_shard_name_and_owner(self):
+        """Test values are made name-safe and partitions map back to their shard"""
+        assert shard_name("logs", "service", "api gw/v2") == "logs__service-api-gw-v2"
+        assert shard_of("logs", "service", "logs__service-api__20240101") == "logs__service-api"
+        assert shard_of("logs", "service", "logs__20240101") is None
+
+    def test_select_by_filter(self):
+        """Test a filter on the key narrows to existing shards; otherwise all plus the base"""
+        names = ["logs", "logs__service-api", "logs__service-db", "other__service-api"]
+        assert select_shards(names, "logs", "service") == ["logs", "logs__service-api", "logs__service-db"]
+        assert select_shards(names, "logs", "service", {"service": "db"}) == ["logs__service-db"]
+        assert select_shards(names, "logs", "service", {"service": ["api", "web"]}) == ["logs__service-api"]
+
+    def test_route_by_key(self):
+        """Test payloads are grouped by value and keyless ones go to the collection"""
+        groups = route_by_key("logs", "service", [{"service": "api"}, {}, {"service": "api"}])
+        assert groups == {"logs__service-api": [0, 2], "logs": [1]}
+
+
+class TestScatter:
+    """Test concurrent fan-out with per-shard timeouts"""
+
+    def test_runs_concurrently_in_order(self):
+        """Test shards are searched at once and results keep the shard order"""
+        def search(name):
+            time.sleep(0.1)
+            return name
+
+        start = time.perf_counter()
+        assert scatter(search, ["a", "b", "c"], timeout_ms=1000) == ["a", "b", "c"]
+        assert time.perf_counter() - start < 0.25
+
+    def test_slow_and_failing_shards_are_dropped(self):
+        """Test shards that time out or raise are left out and counted"""
+        def search(name):
+            if name == "slow":
+                time.sleep(0.5)
+            if name == "broken":
+                raise RuntimeError("down")
+            return name
+
+        assert scatter(search, ["ok", "slow", "broken"], timeout_ms=50) == ["ok"]
+        assert metrics.registry.counter("logician_fallbacks_total", stage="shard") == 2
+
+    def test_single_shard_errors_raise_and_timeouts_apply(self):
+        """Test a lone shard raises like an unsharded search but is still bounded by the timeout"""
+        with pytest.raises(RuntimeError):
+            scatter(MagicMock(side_effect=RuntimeError("down")), ["only"])
+        assert scatter(lambda name: time.sleep(0.5), ["only"], timeout_ms=50) == []
+        assert scatter(lambda name: name, ["only"], timeout_ms=None) == ["only"]
+
+    def test_concurrent_queries_do_not_starve_shards(self):
+        """Test healthy shards answer for every query when several queries scatter at once"""
+        def search(name):
+            time.sleep(0.1)
+            return name
+
+        names = [f"s{i}" for i in range(12)]
+        answered = []
+        threads = [threading.Thread(target=lambda: answered.append(len(scatter(search, names, timeout_ms=500))))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert answered == [12] * 8
+        assert metrics.registry.counter("logician_fallbacks_total", stage="shard") == 0
+
+
+class TestShardedRetrieval:
+    """Test ingest routing and sharded search through the orchestrator"""
+
+    def _rag(self, local):
+        with patch.dict('os.environ', {'RAG_SHARD_KEY': 'service'}):
+            rag = RagOrchestrator(collection="shd")
+        rag.qdrant = local
+        rag.lexical_weight = 0
+        return rag
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_filter_searches_one_shard(self, mock_embedding, local):
+        """Test lines land in per-service shards and a service filter only searches its own"""
+        vectors = np.array([[1.0, 0.0], [0.9, 0.1], [0.8, 0.2]], dtype=np.float32)
+        payloads = [{"service": "api"}, {"service": "db"}, {}]
+        upsert_points(local, "shd", ["a", "d", "n"], vectors, payloads, shard_key="service")
+        rag = self._rag(local)
+
+        assert rag.search_collections() == ["shd", "shd__service-api", "shd__service-db"]
+        assert [h["id"] for h in rag.retrieve("q", top_k=3)] == ["a", "d", "n"]
+
+        local.search = MagicMock(wraps=local.search)
+        assert [h["id"] for h in rag.retrieve("q", top_k=3, filters={"service": "db"})] == ["d"]
+        assert [c[0][0] for c in local.search.call_args_list] == ["shd__service-db"]
+
+    @patch('logician.rag.get_embedding', return_value=np.array([1.0, 0.0], dtype=np.float32))
+    def test_slow_shard_degrades_results(self, mock_embedding):
+        """Test a slow collection is left out of the merged top-k"""
+        rag = RagOrchestrator(collections=["fast", "slow"])
+        rag.lexical_weight = 0
+        rag.shard_timeout_ms = 50
+        rag.qdrant = MagicMock()
+
+        def search(name, vec, top_k=3, **kwargs):
+            if name == "slow":
+                time.sleep(0.5)
+            return [{"id": name, "score": 0.5}]
+
+        rag.qdrant.search.side_effect = search
+        assert [h["id"] for h in rag.retrieve("q", top_k=3)] == ["fast"]
@@ -0,0 +1,243 @@
+"""Tests for follow-mode ingestion."""
+import json
+import os
+import threading
+from unittest.mock import MagicMock, patch
+from logician.ingest import point_id
+from logician.qdrant_wrapper import QdrantWrapper
+from logician.tail import Checkpoints, Follower, follow_files, tail_point_id
+
+
+def _append(path, *lines, end="\n"):
+    with open(path, "a") as fh:
+        fh.write("".join(line + end for line in lines))
+
+
+def _upserted(qdrant):
+    return [(pid, p["text"]) for call in qdrant.upsert.call_args_list
+            for pid, p in zip(call[0][1], call[0][3])]
+
+
+def _follower(tmp_path, qdrant, **kwargs):
+    return Follower([str(tmp_path / "app.log")], qdrant=qdrant,
+                    checkpoint=str(tmp_path / "cp.json"), **kwargs)
+
+
+class TestTailing:
+    """Test reading new lines, rotation and truncation"""
+
+    def test_reads_only_new_complete_lines(self, tmp_path):
+        """Test each poll upserts only appended lines and a partial line waits"""
+        log = tmp_path / "app.log"
+        _append(log, "one", "two")
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant)
+        follower.scan()
+        follower.poll()
+        follower.flush()
+        _append(log, "three")
+        _append(log, "fou", end="")
+        follower.poll()
+        follower.flush()
+        assert [t for _, t in _upserted(qdrant)] == ["one", "two", "three"]
+
+        _append(log, "r")
+        follower.poll()
+        follower.flush()
+        assert _upserted(qdrant)[-1][1] == "four"
+
+    def test_generation_zero_ids_match_batch_ingest(self, tmp_path):
+        """Test ids before any rotation equal ingest.point_id for the same lines"""
+        log = tmp_path / "app.log"
+        _append(log, "one", "", "three")
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant)
+        follower.scan()
+        follower.poll()
+        follower.flush()
+        assert [pid for pid, _ in _upserted(qdrant)] == [point_id(str(log), 1), point_id(str(log), 3)]
+
+    def test_rotation_drains_old_file(self, tmp_path):
+        """Test lines written before a rename are read before the new file"""
+        log = tmp_path / "app.log"
+        _append(log, "old 1")
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant)
+        follower.scan()
+        follower.poll()
+        _append(log, "old 2")
+        os.rename(log, tmp_path / "app.log.1")
+        _append(log, "new 1")
+        follower.poll()
+        follower.flush()
+
+        upserted = _upserted(qdrant)
+        assert [t for _, t in upserted] == ["old 1", "old 2", "new 1"]
+        assert upserted[-1][0] == tail_point_id(str(log), 1, 1)
+        assert len({pid for pid, _ in upserted}) == 3
+        assert follower.files[str(log)].generation == 1
+
+    def test_truncation_restarts_from_top(self, tmp_path):
+        """Test a copytruncate-style truncation is read from offset 0 under new ids"""
+        log = tmp_path / "app.log"
+        _append(log, "a long first line", "another long line")
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant)
+        follower.scan()
+        follower.poll()
+        log.write_text("short\n")
+        follower.poll()
+        follower.flush()
+
+        upserted = _upserted(qdrant)
+        assert upserted[-1] == (tail_point_id(str(log), 1, 1), "short")
+
+    def test_rotated_siblings_not_followed(self, tmp_path):
+        """Test globs skip rotated and gzip siblings"""
+        for name in ["app.log", "app.log.1", "app.log.2.gz"]:
+            (tmp_path / name).write_text("x\n")
+        follower = Follower([str(tmp_path / "app.log*")], qdrant=MagicMock())
+        follower.scan()
+        assert list(follower.files) == [str(tmp_path / "app.log")]
+
+
+class TestMicroBatching:
+    """Test the size and time flush triggers"""
+
+    def test_flushes_on_batch_size(self, tmp_path):
+        """Test a full batch is upserted without waiting for the interval"""
+        _append(tmp_path / "app.log", *[f"line {i}" for i in range(5)])
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant, batch_size=2, flush_interval=60)
+        follower.scan()
+        follower.poll()
+        assert [len(call[0][1]) for call in qdrant.upsert.call_args_list] == [2, 2]
+        assert len(follower.pending) == 1
+
+    def test_flushes_on_interval(self, tmp_path):
+        """Test pending lines are upserted once the oldest is flush_interval old"""
+        _append(tmp_path / "app.log", "one")
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant, batch_size=100, flush_interval=60)
+        follower.scan()
+        follower.poll()
+        qdrant.upsert.assert_not_called()
+
+        follower.flush_interval = 0
+        follower.poll()
+        assert _upserted(qdrant) == [(point_id(str(tmp_path / "app.log"), 1), "one")]
+        qdrant.ensure_collection.assert_called_once()
+        qdrant.create_collection.assert_not_called()
+
+
+class TestCheckpoints:
+    """Test resuming from persisted offsets"""
+
+    def test_resume_skips_flushed_lines(self, tmp_path):
+        """Test a restarted follower only upserts lines written after its last flush"""
+        log = tmp_path / "app.log"
+        _append(log, "one", "two")
+        first = MagicMock()
+        _follower(tmp_path, first).run(stop=_stopped())
+        _append(log, "three")
+
+        second = MagicMock()
+        _follower(tmp_path, second).run(stop=_stopped())
+        assert [t for _, t in _upserted(first)] == ["one", "two"]
+        assert _upserted(second) == [(point_id(str(log), 3), "three")]
+
+    def test_unflushed_lines_are_replayed(self, tmp_path):
+        """Test lines read but not flushed before a crash are read again"""
+        log = tmp_path / "app.log"
+        _append(log, "one")
+        crashed = _follower(tmp_path, MagicMock(), flush_interval=60)
+        crashed.scan()
+        crashed.poll()
+
+        qdrant = MagicMock()
+        _follower(tmp_path, qdrant).run(stop=_stopped())
+        assert [t for _, t in _upserted(qdrant)] == ["one"]
+
+    def test_resume_after_rotation_while_stopped(self, tmp_path):
+        """Test the rest of a file rotated while stopped is read from its new name"""
+        log = tmp_path / "app.log"
+        _append(log, "one")
+        _follower(tmp_path, MagicMock()).run(stop=_stopped())
+        _append(log, "two")
+        os.rename(log, tmp_path / "app.log.1")
+        _append(log, "three")
+
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant)
+        follower.run(stop=_stopped())
+        assert [t for _, t in _upserted(qdrant)] == ["two", "three"]
+        state = json.loads((tmp_path / "cp.json").read_text())["files"][str(log)]
+        assert state["generation"] == 1
+        assert state["offset"] == len("three\n")
+
+    def test_checkpoint_waits_for_persist(self, tmp_path):
+        """Test flushes upsert without writing to disk; offsets are checkpointed only after a persist"""
+        _append(tmp_path / "app.log", "one")
+        qdrant = MagicMock()
+        follower = _follower(tmp_path, qdrant, persist_interval=60)
+        follower.scan()
+        follower.poll()
+        follower.flush()
+        assert [t for _, t in _upserted(qdrant)] == ["one"]
+        qdrant.flush.assert_not_called()
+        assert not (tmp_path / "cp.json").exists()
+
+        follower.persist_interval = 0
+        follower.poll()
+        qdrant.flush.assert_called_once()
+        state = json.loads((tmp_path / "cp.json").read_text())["files"][str(tmp_path / "app.log")]
+        assert state["offset"] == len("one\n")
+        follower.poll()
+        qdrant.flush.assert_called_once()
+
+    def test_restart_while_stopped_flushes_pending_lines(self, tmp_path):
+        """Test lines pending from other files are upserted before a file restarts and is checkpointed"""
+        app, other = tmp_path / "app.log", tmp_path / "other.log"
+        _append(app, "one")
+        _append(other, "x")
+        paths = [str(tmp_path / "*.log")]
+        Follower(paths, qdrant=MagicMock(), checkpoint=str(tmp_path / "cp.json")).run(stop=_stopped())
+        # Moved out of the rotation scheme rather than deleted, so the new file can't reuse its inode.
+        os.rename(other, tmp_path / "other.old")
+        _append(app, "two")
+
+        second = MagicMock()
+        follower = Follower(paths, qdrant=second, checkpoint=str(tmp_path / "cp.json"), flush_interval=60,
+                            persist_interval=0)
+        follower.scan()
+        _append(other, "y")
+        follower.poll()
+        third = MagicMock()
+        Follower(paths, qdrant=third, checkpoint=str(tmp_path / "cp.json")).run(stop=_stopped())
+        assert [t for _, t in _upserted(second) + _upserted(third)] == ["two", "y"]
+
+    def test_unreadable_checkpoint_starts_fresh(self, tmp_path):
+        """Test a corrupt checkpoint file is ignored"""
+        (tmp_path / "cp.json").write_text("{not json")
+        assert Checkpoints(str(tmp_path / "cp.json")).files == {}
+
+    @patch('logician.qdrant_wrapper._HAS_QDRANT', False)
+    def test_replay_is_idempotent_on_local_backend(self, tmp_path, monkeypatch):
+        """Test replaying lines overwrites their points instead of duplicating them"""
+        monkeypatch.setenv("BM25_ENABLED", "0")
+        log = tmp_path / "app.log"
+        _append(log, "ERROR disk full", "INFO ok")
+        qdrant = QdrantWrapper()
+        follow_files([str(log)], collection="tail_replay", qdrant=qdrant,
+                     checkpoint=str(tmp_path / "cp.json"), stop=_stopped())
+        os.remove(tmp_path / "cp.json")
+        follow_files([str(log)], collection="tail_replay", qdrant=qdrant,
+                     checkpoint=str(tmp_path / "cp.json"), stop=_stopped())
+        assert len(qdrant.local.get("tail_replay")) == 2
+
+
+def _stopped():
+    """A stop event that is already set: run() polls once and flushes."""
+    stop = threading.Event()
+    stop.set()
+    return stop
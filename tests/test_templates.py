@@ -0,0 +1,78 @@
+"""Tests for log template mining."""
+import pytest
+from logician.templates import TemplateMiner, WILDCARD, merge_payloads
+
+
+class TestTemplateMiner:
+    """Test Drain-style clustering"""
+
+    def test_masks_variable_tokens(self):
+        """Test timestamps, IPs, uuids, hex ids and numbers are masked"""
+        miner = TemplateMiner()
+        masked = miner.mask(
+            "2024-05-01T12:00:00Z req 3f2b8c1e-1111-2222-3333-444455556666 from 10.1.2.3:8080 "
+            "addr 0xdeadbeef took 45ms retries 3"
+        )
+        assert masked == "<*> req <*> from <*> addr <*> took <*> retries <*>"
+
+    def test_lines_with_different_ids_share_template(self):
+        """Test lines differing only in variables collapse into one cluster"""
+        miner = TemplateMiner()
+        miner.add("user 42 logged in from 10.0.0.1")
+        miner.add("user 7 logged in from 10.0.0.9")
+        assert len(miner.clusters) == 1
+        assert miner.clusters[0].template == "user <*> logged in from <*>"
+        assert miner.clusters[0].count == 2
+
+    def test_differing_tokens_become_wildcards(self):
+        """Test unmasked differing tokens are generalised on merge"""
+        miner = TemplateMiner()
+        miner.add("cache miss for key orders")
+        miner.add("cache miss for key users")
+        assert miner.clusters[0].tokens[-1] == WILDCARD
+
+    def test_dissimilar_lines_split(self):
+        """Test lines below the similarity threshold start new clusters"""
+        miner = TemplateMiner()
+        miner.add("disk full on volume data")
+        miner.add("disk quota ok for tenant main")
+        miner.add("connection refused")
+        assert len(miner.clusters) == 3
+
+    def test_tracks_time_range_and_samples(self):
+        """Test counts, time range and bounded sample references"""
+        miner = TemplateMiner(max_samples=2)
+        for i, ts in enumerate([30.0, 10.0, 20.0]):
+            miner.add(f"job {i} done", source="a.log", lineno=i + 1, timestamp=ts)
+        payload = miner.clusters[0].payload()
+        assert payload["count"] == 3
+        assert payload["first_seen"] == 10.0
+        assert payload["last_seen"] == 30.0
+        assert payload["samples"] == [{"source": "a.log", "line": 1}, {"source": "a.log", "line": 2}]
+
+    def test_dominant_fields_and_merge(self):
+        """Test the most common level/service is recorded and merging adds up statistics"""
+        miner = TemplateMiner()
+        for level, ts in (("ERROR", 20.0), ("ERROR", 30.0), ("WARN", 25.0)):
+            miner.add("connection refused", timestamp=ts, fields={"level": level, "service": "api"})
+        payload = miner.clusters[0].payload()
+        assert (payload["level"], payload["service"]) == ("ERROR", "api")
+
+        later = TemplateMiner()
+        for i in range(4):
+            later.add("connection refused", source="b.log", lineno=i + 1, timestamp=40.0, fields={"level": "WARN"})
+        merged = merge_payloads(payload, later.clusters[0].payload())
+        assert merged["count"] == 7
+        assert (merged["first_seen"], merged["last_seen"], merged["timestamp"]) == (20.0, 40.0, 40.0)
+        assert merged["level"] == "WARN" and merged["field_counts"]["level"] == {"ERROR": 2, "WARN": 5}
+        assert merged["samples"] == [{"source": "b.log", "line": i} for i in (1, 2, 3)]
+
+    def test_cluster_ids_are_stable(self):
+        """Test the same input yields the same cluster ids"""
+        a, b = TemplateMiner(), TemplateMiner()
+        assert a.add("service started").cluster_id == b.add("service started").cluster_id
+
+    def test_empty_line(self):
+        """Test an empty line is handled"""
+        miner = TemplateMiner()
+        assert miner.add("").count == 1
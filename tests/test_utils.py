@@ -19,3 +19,35 @@ class TestUtils:
         # Verify logger exists after configuration
         logger = logging.getLogger()
         assert logger is not None
+
+
+class TestParseTimestamp:
+    """Test timestamp extraction from log lines"""
+
+    def test_utc_and_offsets(self):
+        """Test Z, numeric offsets and naive timestamps"""
+        from logician.utils import parse_timestamp
+        assert parse_timestamp("2024-01-01T00:00:00Z boot") == 1704067200.0
+        assert parse_timestamp("2024-01-01 01:00:00+0100 boot") == 1704067200.0
+        assert parse_timestamp("x 2024-01-01T00:00:00.5 boot") == 1704067200.5
+
+    def test_no_timestamp(self):
+        """Test lines without a timestamp return None"""
+        from logician.utils import parse_timestamp
+        assert parse_timestamp("no time here") is None
+
+
+class TestParseFields:
+    """Test level/service/host extraction from log lines"""
+
+    def test_level_and_pairs(self):
+        """Test upper-case levels, level= and key=value pairs"""
+        from logician.utils import parse_fields
+        assert parse_fields("WARNING service=checkout host=web-1 retry") == {
+            "level": "WARN", "service": "checkout", "host": "web-1"}
+        assert parse_fields('level=err app=api msg="x"') == {"level": "ERROR", "service": "api"}
+
+    def test_lowercase_words_ignored(self):
+        """Test prose like 'an error occurred' is not taken as a level"""
+        from logician.utils import parse_fields
+        assert parse_fields("an error occurred") == {}